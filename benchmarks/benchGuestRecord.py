@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Guest representation benchmark
+Compares the legacy conversion churn of a backfill (fetcher dict -> 18-slot array ->
+flattened dict -> sheet row -> regrouped array -> contact document) with passing one
+GuestRecord from fetcher to both sinks. Reports wall time and tracemalloc peak.
+
+Usage: python3 benchmarks/benchGuestRecord.py [--rows N] [--json PATH]
+"""
+
+import os
+import sys
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ingestion'))
+from guestRecord import GuestRecord, GUEST_FIELDS, ENHANCED_FIELDS
+from showDate import extract_show_time, parse_show_date
+
+VENUES = ["Palace", "RabbitBox", "Stowaway", "Church"]
+SHOW_DATES = ["Friday April 25th 8pm", "Saturday April 26th 7:30pm", "Thursday May 1st 9pm", "Saturday May 3rd 8pm"]
+
+def build_fetched_rows(rows, seed=11):
+    """Raw per-order values as a fetcher sees them"""
+    rng = random.Random(seed)
+    fetched = []
+    for i in range(rows):
+        fetched.append({
+            "venue": rng.choice(VENUES),
+            "show_date": rng.choice(SHOW_DATES),
+            "email": f"guest{i}@example.com",
+            "source": "Squarespace",
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "tickets": rng.randint(1, 4),
+            "ticket_type": "GA",
+            "phone": "+15555550100",
+            "total_price": 25.0,
+            "order_id": f"SS{i}",
+            "transaction_id": f"tx{i}",
+            "customer_id": f"guest{i}@example.com",
+            "payment_method": "Squarespace",
+            "entry_code": f"SS_{i}",
+            "notes": None,
+        })
+    return fetched
+
+def _legacy_contact_doc(contact, show_name):
+    now = datetime.utcnow()
+    show_date = parse_show_date(contact[1])
+    doc = {
+        "venue": contact[0], "show_date": contact[1],
+        "show_datetime": show_date.local_datetime if show_date else None,
+        "email": contact[2], "source": contact[3], "show_time": contact[4], "ticket_type": contact[5],
+        "first_name": contact[6], "last_name": contact[7], "tickets": contact[8],
+        "phone": contact[9] if len(contact) > 9 else None, "show_name": show_name,
+        "added_to_mailerlite": False, "mailerlite_added_date": None, "created_at": now, "updated_at": now,
+    }
+    for i, field_name in enumerate(ENHANCED_FIELDS, start=10):
+        if len(contact) > i and contact[i] is not None:
+            doc[field_name] = contact[i]
+    return doc
+
+def run_legacy(fetched):
+    """Shape changes of the pre-GuestRecord Bucketlist/Fever path through both sinks"""
+    batch_data = {}
+    for row in fetched:
+        guest_array = [row.get(field) for field in GUEST_FIELDS]
+        guest_array[4] = extract_show_time(row["show_date"])
+        batch_data.setdefault(row["venue"], []).append(guest_array)
+
+    # insert_data_into_google_sheet: arrays back to dictionaries
+    guest_dicts = []
+    for guests in batch_data.values():
+        for guest in guests:
+            guest_dicts.append({field: guest[i] for i, field in enumerate(GUEST_FIELDS)})
+
+    # Sheet rows
+    rows = [[g['venue'], g['show_date'], g['email'], g['source'], extract_show_time(g['show_date']),
+             g['ticket_type'], g['first_name'], g['last_name'], g['tickets']] for g in guest_dicts]
+
+    # save_comprehensive_data_to_mongodb: dictionaries back to arrays, then documents
+    mongo_batch = {}
+    for g in guest_dicts:
+        mongo_batch.setdefault(f"{g['venue']} - {g['show_date']}", []).append(
+            [g.get(field) for field in GUEST_FIELDS])
+    docs = [_legacy_contact_doc(c, show) for show, contacts in mongo_batch.items() for c in contacts]
+    return rows, docs
+
+def run_guest_record(fetched):
+    """One GuestRecord per guest from fetcher to both sinks"""
+    records = [GuestRecord(**row) for row in fetched]
+    rows = [record.to_sheet_row() for record in records]
+    mongo_batch = {}
+    for record in records:
+        mongo_batch.setdefault(record.show_key, []).append(record)
+    docs = [record.to_mongo_doc(show) for show, guests in mongo_batch.items() for record in guests]
+    return rows, docs
+
+def measure(func, fetched):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(fetched)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+def main():
+    rows = 50000
+    json_path = None
+    for i, arg in enumerate(sys.argv):
+        if arg == '--rows' and i + 1 < len(sys.argv):
+            rows = int(sys.argv[i + 1])
+        if arg == '--json' and i + 1 < len(sys.argv):
+            json_path = sys.argv[i + 1]
+
+    fetched = build_fetched_rows(rows)
+    # Warm the show date caches so both runs measure representation cost only
+    run_guest_record(fetched[:100])
+
+    legacy_seconds, legacy_peak = measure(run_legacy, fetched)
+    record_seconds, record_peak = measure(run_guest_record, fetched)
+
+    results = {
+        "rows": rows,
+        "legacy_seconds": round(legacy_seconds, 3),
+        "guest_record_seconds": round(record_seconds, 3),
+        "speedup": round(legacy_seconds / record_seconds, 2) if record_seconds else None,
+        "legacy_peak_mb": round(legacy_peak / 1e6, 1),
+        "guest_record_peak_mb": round(record_peak / 1e6, 1),
+    }
+    print(json.dumps(results, indent=2))
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
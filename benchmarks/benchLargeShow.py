@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Large show write benchmark
+Runs the Sheets writer for one synthetic show (2,000 guests by default) against
+in-memory stand-ins for the worksheet and the Sheets API, for a new worksheet and
+for an existing 100-row worksheet that has to grow. Reports Sheets API calls,
+grid resizes, request payload size and the writer's own time, and checks that the
+totals formulas cover every guest row (the old fixed I2:I100 ranges stopped at 99 guests).
+
+Usage: python3 benchmarks/benchLargeShow.py [--guests N] [--repeat N] [--json PATH]
+"""
+
+import os
+import re
+import io
+import sys
+import json
+import random
+import logging
+import time
+import contextlib
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ingestion'))
+import insertIntoGoogleSheet
+from gspread.exceptions import WorksheetNotFound
+from guestRecord import GuestRecord
+from worksheetSnapshot import WORKSHEET_HEADERS
+
+VENUE = "Palace"
+SHOW_DATE = "Friday August 15th 8pm"
+SOURCES = ["Squarespace", "Eventbrite", "Bucketlist", "Guest List"]
+LEGACY_FORMULA_LAST_ROW = 100
+
+def build_guests(count, seed=5):
+    rng = random.Random(seed)
+    return [GuestRecord(venue=VENUE, show_date=SHOW_DATE, email=f"guest{i}@example.com",
+                        source=rng.choice(SOURCES), first_name=f"first{i}", last_name=f"Last{i}",
+                        tickets=rng.randint(1, 4), ticket_type="GA") for i in range(count)]
+
+class BenchWorksheet:
+    def __init__(self, title, rows, values=None):
+        self.id = 1
+        self.title = title
+        self.index = 0
+        self.row_count = rows
+        self.col_count = 20
+        self.values = values or []
+        self.reads = 0
+
+    def get_all_values(self):
+        self.reads += 1
+        return [list(row) for row in self.values]
+
+class BenchSpreadsheet:
+    def __init__(self, existing=None):
+        self.id = "bench-spreadsheet"
+        self.existing = existing
+        self.created = None
+
+    def add_worksheet(self, title, rows, cols):
+        self.created = BenchWorksheet(title, rows)
+        return self.created
+
+class BenchDirectory:
+    """Stands in for SheetDirectory: one spreadsheet, optionally one existing worksheet"""
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self.gc = None
+
+    def open(self, title):
+        return self.sheet
+
+    def worksheet(self, sheet_title, sheet, worksheet_title):
+        if sheet.existing is None:
+            raise WorksheetNotFound(worksheet_title)
+        return sheet.existing
+
+    def remember_spreadsheet(self, *args):
+        pass
+
+    def remember_worksheet(self, *args):
+        pass
+
+    def forget_worksheet(self, *args):
+        pass
+
+class BenchService:
+    """Records spreadsheets.batchUpdate bodies"""
+    def __init__(self):
+        self.bodies = []
+
+    def spreadsheets(self):
+        return self
+
+    def batchUpdate(self, spreadsheetId, body):
+        self.bodies.append(body)
+        return self
+
+    def execute(self):
+        return {}
+
+def existing_worksheet(guest_count):
+    """A 100-row worksheet already holding guest_count guests"""
+    rows = [WORKSHEET_HEADERS] + [guest.to_sheet_row() + [False] for guest in build_guests(guest_count, seed=9)]
+    for i, row in enumerate(rows[1:]):
+        row[2] = f"earlier{i}@example.com"
+    return BenchWorksheet("Friday August 15th 8pm 2025", 100, rows)
+
+def formula_ranges_cover(bodies, last_row):
+    """True if every range in the written formulas reaches last_row (or is open-ended)"""
+    for body in bodies:
+        for request in body["requests"]:
+            for row in request.get("updateCells", {}).get("rows", []):
+                for cell in row["values"]:
+                    formula = cell.get("userEnteredValue", {}).get("formulaValue", "")
+                    for end in re.findall(r'[A-Z]2:[A-Z](\d*)', formula):
+                        if end and int(end) < last_row:
+                            return False
+    return True
+
+def run_scenario(name, guests, existing_rows, repeat):
+    timings = []
+    for _ in range(repeat):
+        existing = existing_worksheet(existing_rows) if existing_rows else None
+        sheet = BenchSpreadsheet(existing)
+        service = BenchService()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            insertIntoGoogleSheet._process_venue_show_efficient(BenchDirectory(sheet), service, VENUE, SHOW_DATE, guests)
+        timings.append(time.perf_counter() - started)
+
+    worksheet = existing or sheet.created
+    requests = [request for body in service.bodies for request in body["requests"]]
+    grid_rows = worksheet.row_count + sum(request["appendDimension"]["length"] for request in requests
+                                          if "appendDimension" in request)
+    guest_rows = len(guests) + existing_rows
+    return {
+        "scenario": name,
+        "guests_written": len(guests),
+        "guests_in_worksheet": guest_rows,
+        "worksheet_reads": worksheet.reads,
+        "batch_updates": len(service.bodies),
+        "requests": len(requests),
+        "grid_resizes": sum(1 for request in requests if "appendDimension" in request),
+        "grid_rows": grid_rows,
+        "payload_kb": round(sum(len(json.dumps(body)) for body in service.bodies) / 1024, 1),
+        "writer_ms_median": round(sorted(timings)[len(timings) // 2] * 1000, 1),
+        "formulas_cover_all_rows": formula_ranges_cover(service.bodies, guest_rows + 1),
+        "legacy_range_missed_guests": max(0, guest_rows - (LEGACY_FORMULA_LAST_ROW - 1)),
+        "tickets_written": sum(guest.tickets for guest in guests),
+    }
+
+def main():
+    logging.disable(logging.WARNING)
+    guest_count = 2000
+    repeat = 5
+    json_path = None
+    for i, arg in enumerate(sys.argv):
+        if arg == '--guests' and i + 1 < len(sys.argv):
+            guest_count = int(sys.argv[i + 1])
+        if arg == '--repeat' and i + 1 < len(sys.argv):
+            repeat = int(sys.argv[i + 1])
+        if arg == '--json' and i + 1 < len(sys.argv):
+            json_path = sys.argv[i + 1]
+
+    # The writer only needs the Drive folder when it creates a spreadsheet, which never happens here
+    if insertIntoGoogleSheet.config is None:
+        insertIntoGoogleSheet.config = {"guest_list_folder_id": None}
+
+    guests = build_guests(guest_count)
+    results = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "runs": [
+            run_scenario("new worksheet", guests, 0, repeat),
+            run_scenario("existing 100-row worksheet", guests, 80, repeat),
+        ],
+    }
+    print(json.dumps(results, indent=2))
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+MongoDB sink throughput benchmark
+Feeds synthetic contacts for every source through save_comprehensive_data_to_mongodb
+(and so batch_add_contacts_to_mongodb) in cron-sized batches, with the overlap a
+polling script really sees: re-sent orders that are unchanged and re-sent orders
+whose ticket counts changed. Reports contacts/sec, database round trips and
+p50/p99 per-batch latency for each size.
+
+Runs against a local mongod with --uri (a throwaway database is created and dropped),
+or against mongomock in-process when no --uri is given. mongomock evaluates every
+query by scanning, so its timings are only useful for round trip counts; use a
+real mongod for throughput and latency comparisons, especially at 100k.
+
+Usage: python3 benchmarks/benchMongoSink.py [--uri mongodb://localhost:27017] [--sizes 1000,10000,100000]
+                                            [--batch-size N] [--json PATH]
+"""
+
+import os
+import io
+import sys
+import json
+import random
+import logging
+import time
+import contextlib
+from datetime import datetime, timedelta
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ingestion'))
+import mongoIndexes
+import showRollups
+import peopleIndex
+from addContactsToMongoDB import save_comprehensive_data_to_mongodb
+from guestRecord import GuestRecord
+from showDate import format_date_label, format_show_time
+
+BENCH_DB = "guest_list_contacts_bench"
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Share of each batch that re-sends already written contacts, and the share of
+# those re-sends that carry a changed ticket count (overlapping cron windows)
+RESEND_RATIO = 0.3
+CHANGED_RATIO = 0.1
+
+SOURCES = ["Eventbrite", "Squarespace", "Bucketlist", "Nudge", "Fever", "DoMORE"]
+VENUES = ["Palace", "RabbitBox", "Stowaway", "Church", "CitySessions"]
+
+def make_contact(rng, source, serial, shows):
+    """One synthetic guest shaped like the given source's fetcher output"""
+    first_name, last_name = f"First{serial}", f"Last{serial % 997}"
+    email = f"buyer{serial % 40000}@example.com"
+    guest = GuestRecord(
+        venue=rng.choice(VENUES),
+        show_date=rng.choice(shows),
+        email=email if source not in ("Fever", "DoMORE") else "",
+        source=source,
+        first_name=first_name,
+        last_name=last_name,
+        tickets=rng.randint(1, 4),
+        phone=f"415555{serial % 10000:04d}" if source in ("Squarespace", "Bucketlist", "Nudge") else "",
+        total_price=round(rng.uniform(0, 120), 2) if source != "DoMORE" else 0.0,
+        payment_method=source,
+    )
+    if source == "Nudge":
+        guest.order_id = f"NUDGE-{serial}"
+    else:
+        guest.transaction_id = f"{source[:2].upper()}-{serial}"
+    return guest
+
+def build_batches(total, batch_size, seed=3):
+    """Split total contact writes into batches, RESEND_RATIO of each re-sending earlier contacts"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 3, 20)
+    shows = [f"{format_date_label(day)} {format_show_time(day.hour, day.minute)} {day.year}"
+             for day in (start + timedelta(days=i) for i in range(120))]
+
+    written = []
+    batches = []
+    serial = 0
+    remaining = total
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        batch = []
+        for _ in range(size):
+            if written and rng.random() < RESEND_RATIO:
+                guest = rng.choice(written).copy()
+                if rng.random() < CHANGED_RATIO:
+                    guest.tickets += 1
+            else:
+                guest = make_contact(rng, rng.choice(SOURCES), serial, shows)
+                serial += 1
+                written.append(guest)
+            batch.append(guest)
+        batches.append(batch)
+        remaining -= size
+    return batches
+
+class RoundTripCounter(monitoring.CommandListener):
+    """CommandListener counting commands sent to a real mongod"""
+    def __init__(self):
+        self.commands = 0
+
+    def started(self, event):
+        self.commands += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+class CountingCollection:
+    """Wraps a mongomock collection and counts calls that would be round trips to a server"""
+    ROUND_TRIP_METHODS = {"find", "find_one", "bulk_write", "create_index", "replace_one",
+                          "update_one", "insert_many", "delete_many", "count_documents"}
+
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in self.ROUND_TRIP_METHODS:
+            def counted(*args, **kwargs):
+                self._counter.commands += 1
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+class CountingDatabase:
+    def __init__(self, db, counter):
+        self._db = db
+        self._counter = counter
+
+    def __getitem__(self, name):
+        return CountingCollection(self._db[name], self._counter)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+def open_database(uri):
+    """Return (client, db, round trip counter) for a real mongod or mongomock"""
+    counter = RoundTripCounter()
+    if uri:
+        from pymongo import MongoClient
+        client = MongoClient(uri, event_listeners=[counter])
+        return client, client[BENCH_DB], counter
+    try:
+        import mongomock
+    except ImportError:
+        print("Error: mongomock is not installed; pass --uri to benchmark against a local mongod")
+        sys.exit(1)
+    client = mongomock.MongoClient()
+    return client, CountingDatabase(client[BENCH_DB], counter), counter
+
+def reset_process_state():
+    """Forget indexes ensured by a previous size so each run starts from an empty database"""
+    mongoIndexes._ensured_collections.clear()
+    showRollups._rollup_indexes_ensured = False
+    peopleIndex._people_indexes_ensured = False
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def run_size(uri, total, batch_size):
+    client, db, counter = open_database(uri)
+    client.drop_database(BENCH_DB)
+    reset_process_state()
+    batches = build_batches(total, batch_size)
+
+    latencies = []
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0, "failed": 0, "collapsed": 0}
+    counter.commands = 0
+    started = time.perf_counter()
+    for batch in batches:
+        batch_started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = save_comprehensive_data_to_mongodb(batch, db)
+        latencies.append(time.perf_counter() - batch_started)
+        for counts in results.values():
+            for name in totals:
+                totals[name] += counts[name]
+    elapsed = time.perf_counter() - started
+    assert sum(totals.values()) == total, f"counts {totals} do not add up to {total} records"
+
+    client.drop_database(BENCH_DB)
+    return {
+        "records": total,
+        "batches": len(batches),
+        "seconds": round(elapsed, 3),
+        "contacts_per_sec": round(total / elapsed, 1) if elapsed else None,
+        "round_trips": counter.commands,
+        "round_trips_per_batch": round(counter.commands / len(batches), 1),
+        "batch_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "batch_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        **totals,
+    }
+
+def main():
+    logging.disable(logging.WARNING)
+    uri = None
+    sizes = DEFAULT_SIZES
+    batch_size = 500
+    json_path = None
+    for i, arg in enumerate(sys.argv):
+        if arg == '--uri' and i + 1 < len(sys.argv):
+            uri = sys.argv[i + 1]
+        if arg == '--sizes' and i + 1 < len(sys.argv):
+            sizes = [int(size) for size in sys.argv[i + 1].split(',')]
+        if arg == '--batch-size' and i + 1 < len(sys.argv):
+            batch_size = int(sys.argv[i + 1])
+        if arg == '--json' and i + 1 < len(sys.argv):
+            json_path = sys.argv[i + 1]
+
+    results = {
+        "backend": "mongod" if uri else "mongomock",
+        "batch_size": batch_size,
+        "resend_ratio": RESEND_RATIO,
+        "changed_ratio": CHANGED_RATIO,
+        "timestamp": datetime.utcnow().isoformat(),
+        "runs": [run_size(uri, size, batch_size) for size in sizes],
+    }
+    print(json.dumps(results, indent=2))
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Show date parsing microbenchmark
+Compares the per-guest cost of the legacy ad hoc parsers (dateutil fuzzy parsing
+plus regex scans on every call) with the cached ShowDate parser on a synthetic corpus.
+
+Usage: python3 benchmarks/benchShowDate.py [--rows N] [--json PATH]
+"""
+
+import os
+import re
+import sys
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from dateutil import parser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ingestion'))
+from showDate import parse_show_date, extract_show_time, format_date_label, format_show_time, _parse_show_date_cached
+
+MONTH_MAP = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4,
+    'may': 5, 'june': 6, 'july': 7, 'august': 8,
+    'september': 9, 'october': 10, 'november': 11, 'december': 12
+}
+
+def legacy_append_year(show_date):
+    """Pre-ShowDate append_year_to_show_date"""
+    if re.search(r'\b\d{4}\b', show_date):
+        return show_date
+    today = datetime.now(ZoneInfo("America/Los_Angeles")).date()
+    date_obj = parser.parse(show_date, fuzzy=True, dayfirst=False)
+    show_month_day = date_obj.date().replace(year=today.year)
+    year = today.year if show_month_day >= today else today.year + 1
+    return f"{show_date} {year}"
+
+def legacy_parse_with_year(date_string):
+    """Pre-ShowDate parse_show_date_with_year"""
+    year_match = re.search(r'\b(\d{4})\b', date_string)
+    year = int(year_match.group(1)) if year_match else datetime.now().year
+    date_match = re.search(r'(\w+)\s+(\d+)', date_string.lower())
+    time_match = re.search(r'(\d+(?:\:\d+)?)\s*(pm|am)', date_string.lower())
+    if not date_match or date_match.group(1) not in MONTH_MAP:
+        return None
+    hour, minute = 21, 0
+    if time_match:
+        parts = time_match.group(1).split(':')
+        hour = int(parts[0])
+        minute = int(parts[1]) if len(parts) > 1 else 0
+        if time_match.group(2) == 'pm' and hour != 12:
+            hour += 12
+        elif time_match.group(2) == 'am' and hour == 12:
+            hour = 0
+    return datetime(year, MONTH_MAP[date_match.group(1)], int(date_match.group(2)), hour, minute)
+
+def legacy_extract_time(show_date):
+    """Pre-ShowDate _extract_time_from_date"""
+    for pattern in [r'(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm))', r'(\d{1,2}(?:AM|PM|am|pm))', r'(\d{2}:\d{2})']:
+        match = re.search(pattern, show_date)
+        if match:
+            return match.group(1)
+    return ''
+
+def build_corpus(rows, seed=7):
+    """Guest-level show date strings: a few hundred shows with many guests each"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 3, 20, 0)
+    shows = []
+    for i in range(max(1, rows // 40)):
+        show = start + timedelta(days=rng.randint(0, 365), minutes=rng.choice([0, 30, 60, 90]))
+        label = f"{format_date_label(show)} {format_show_time(show.hour, show.minute)}"
+        shows.append(label if rng.random() < 0.7 else f"{label} {show.year}")
+    return [rng.choice(shows) for _ in range(rows)]
+
+def run_legacy(corpus):
+    for show_date in corpus:
+        legacy_append_year(show_date)
+        legacy_parse_with_year(show_date)
+        legacy_parse_with_year(show_date)  # was called twice per updated contact
+        legacy_extract_time(show_date)
+
+def run_show_date(corpus):
+    for show_date in corpus:
+        parsed = parse_show_date(show_date)
+        parsed.sheet_title
+        parsed.local_datetime
+        extract_show_time(show_date)
+
+def timed(func, corpus):
+    started = time.perf_counter()
+    func(corpus)
+    return time.perf_counter() - started
+
+def main():
+    rows = 10000
+    json_path = None
+    for i, arg in enumerate(sys.argv):
+        if arg == '--rows' and i + 1 < len(sys.argv):
+            rows = int(sys.argv[i + 1])
+        if arg == '--json' and i + 1 < len(sys.argv):
+            json_path = sys.argv[i + 1]
+
+    corpus = build_corpus(rows)
+    _parse_show_date_cached.cache_clear()
+    extract_show_time.cache_clear()
+
+    legacy_seconds = timed(run_legacy, corpus)
+    show_date_seconds = timed(run_show_date, corpus)
+
+    results = {
+        "rows": rows,
+        "distinct_show_dates": len(set(corpus)),
+        "legacy_us_per_guest": round(legacy_seconds / rows * 1e6, 2),
+        "show_date_us_per_guest": round(show_date_seconds / rows * 1e6, 2),
+        "speedup": round(legacy_seconds / show_date_seconds, 1) if show_date_seconds else None,
+        "cache": str(_parse_show_date_cached.cache_info()),
+    }
+    print(json.dumps(results, indent=2))
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
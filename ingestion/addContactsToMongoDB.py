@@ -1,9 +1,15 @@
 import json
 import logging
-import re
 from datetime import datetime
-from pymongo import MongoClient
-from shared_config import get_mongo_config
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from shared_config import get_mongo_config, get_mongo_client
+from showDate import parse_show_date
+from guestRecord import GuestRecord, ENHANCED_FIELDS
+from mongoIndexes import ensure_contact_indexes, DUPLICATE_KEY_ERROR
+from showRollups import add_contact_delta, apply_rollup_deltas
+from peopleIndex import add_person_ref, apply_people_refs
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -13,100 +19,233 @@ from typing import Optional
 def parse_show_date_with_year(date_string: str) -> Optional[datetime]:
     """
     Parse show date string into datetime object.
-    If year is present, use it. If not, apply future-show logic.
+    If year is present, use it. If not, assume the current year.
     """
-    try:
-        if not date_string:
-            return None
-        
-        # Month mapping
-        month_map = {
-            'january': 1, 'february': 2, 'march': 3, 'april': 4, 
-            'may': 5, 'june': 6, 'july': 7, 'august': 8, 
-            'september': 9, 'october': 10, 'november': 11, 'december': 12
-        }
-        
-        # Check if year is already present using regex
-        if re.search(r'\b\d{4}\b', date_string):
-            # Year is present, extract year, month, and day
-            year_match = re.search(r'\b(\d{4})\b', date_string)
-            if year_match:
-                year = int(year_match.group(1))
-            else:
-                logger.warning(f"Could not extract year from: {date_string}")
-                return None
-        else:
-            # No year present, assume current year (2025) for all existing data
-            # This is simpler and more reliable than trying to guess future vs past
-            year = datetime.now().year
-        
-        # Extract month and day using regex
-        date_match = re.search(r'(\w+)\s+(\d+)', date_string.lower())
-        time_match = re.search(r'(\d+(?:\:\d+)?)\s*(pm|am)', date_string.lower())
-        
-        if not date_match:
+    show_date = parse_show_date(date_string)
+    if show_date is None or not show_date.date_found:
+        if date_string:
             logger.warning(f"Could not parse date from: {date_string}")
-            return None
-            
-        month_name = date_match.group(1)
-        day_num = int(date_match.group(2))
-        
-        if month_name not in month_map:
-            logger.warning(f"Unknown month: {month_name}")
-            return None
-        
-        # Parse time (default to 9pm if no time found)
-        hour = 21  # 9pm default
-        minute = 0
-        
-        if time_match:
-            time_part = time_match.group(1)
-            am_pm = time_match.group(2)
-            
-            if ':' in time_part:
-                time_hours, time_minutes = time_part.split(':')
-                hour = int(time_hours)
-                minute = int(time_minutes)
-            else:
-                hour = int(time_part)
-                minute = 0
-            
-            # Convert to 24-hour format
-            if am_pm == 'pm' and hour != 12:
-                hour += 12
-            elif am_pm == 'am' and hour == 12:
-                hour = 0
-        
-        # Create datetime object
-        show_datetime = datetime(year, month_map[month_name], day_num, hour, minute)
-        return show_datetime
-        
-    except Exception as e:
-        logger.error(f"Error parsing date '{date_string}': {e}")
         return None
+    return show_date.local_datetime
+
+# Contact fields beyond the core guest fields, stored only when present
+ENHANCED_FIELD_NAMES = list(ENHANCED_FIELDS)
+
+# Fields refreshed on an existing contact when it is seen again
+UPDATE_FIELD_NAMES = [
+    "show_datetime", "tickets", "phone", "source", "show_time",
+    "ticket_type", "first_name", "last_name", "row_hash"
+]
+
+# Number of contacts looked up and written per bulk_write round trip
+BULK_WRITE_CHUNK_SIZE = 500
+
+def _get_duplicate_key(contact_doc):
+    """
+    Return (field, value) identifying a contact, following the duplicate rules:
+    transaction_id and show first, then order_id, then email/show/name.
+    """
+    if contact_doc.get("transaction_id"):
+        return "transaction_id", (contact_doc["transaction_id"], contact_doc.get("show_name"))
+    if contact_doc.get("order_id"):
+        return "order_id", contact_doc["order_id"]
+    return "name", (
+        contact_doc["email"],
+        contact_doc["show_date"],
+        contact_doc["venue"],
+        contact_doc["first_name"],
+        contact_doc["last_name"]
+    )
+
+def _duplicate_query_from_key(key):
+    """Build the MongoDB filter for a duplicate key"""
+    field, value = key
+    if field == "transaction_id":
+        transaction_id, show_name = value
+        return {"transaction_id": transaction_id, "show_name": show_name}
+    if field != "name":
+        return {field: value}
+    email, show_date, venue, first_name, last_name = value
+    return {
+        "email": email,
+        "show_date": show_date,
+        "venue": venue,
+        "first_name": first_name,
+        "last_name": last_name
+    }
+
+def _get_update_fields(contact_doc):
+    """Fields to $set on an existing contact (enhanced fields only when present)"""
+    update_fields = {field: contact_doc[field] for field in UPDATE_FIELD_NAMES}
+    for field in ENHANCED_FIELD_NAMES:
+        if field in contact_doc and contact_doc[field] is not None:
+            update_fields[field] = contact_doc[field]
+    return update_fields
+
+def _fetch_existing_contacts(collection, keys):
+    """
+    Look up every existing contact matching a chunk of duplicate keys in one query.
+    Returns dict mapping duplicate key -> first matching document.
+    """
+    transaction_ids = list({value[0] for field, value in keys if field == "transaction_id"})
+    order_ids = [value for field, value in keys if field == "order_id"]
+    name_queries = [_duplicate_query_from_key(key) for key in keys if key[0] == "name"]
+
+    clauses = []
+    if transaction_ids:
+        clauses.append({"transaction_id": {"$in": transaction_ids}})
+    if order_ids:
+        clauses.append({"order_id": {"$in": order_ids}})
+    clauses.extend(name_queries)
+    if not clauses:
+        return {}
+
+    wanted = set(keys)
+    existing = {}
+    for doc in collection.find({"$or": clauses}):
+        candidates = [
+            ("transaction_id", (doc.get("transaction_id"), doc.get("show_name"))),
+            ("order_id", doc.get("order_id")),
+            ("name", (doc.get("email"), doc.get("show_date"), doc.get("venue"),
+                      doc.get("first_name"), doc.get("last_name")))
+        ]
+        for key in candidates:
+            if key in wanted and key not in existing:
+                existing[key] = doc
+    return existing
+
+def _is_stored(collection, key, update_fields):
+    """True if the contact for key is stored with exactly these field values"""
+    stored = collection.find_one(_duplicate_query_from_key(key))
+    return stored is not None and all(stored.get(k) == v for k, v in update_fields.items())
 
-def batch_add_contacts_to_mongodb(batch_data):
+def _bulk_upsert_contacts(collection, contact_docs, on_written=None):
+    """
+    Upsert contact documents with unordered bulk writes, one lookup and one
+    bulk_write per chunk. Contacts whose stored fields already match are skipped.
+
+    :param on_written: Optional callback(stored_doc, previous_doc) for each successful
+                       insert (previous_doc None) or update
+    :return: Dictionary with inserted, updated, unchanged, failed and collapsed counts
+             (collapsed: repeats of a contact earlier in the same batch), summing to len(contact_docs)
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "failed": 0, "collapsed": 0}
+
+    # Collapse repeats of the same contact within the batch (last one wins)
+    pending = {}
+    for contact_doc in contact_docs:
+        key = _get_duplicate_key(contact_doc)
+        if key in pending:
+            pending[key].update(_get_update_fields(contact_doc))
+            counts["collapsed"] += 1
+        else:
+            pending[key] = contact_doc
+
+    keys = list(pending.keys())
+    for start in range(0, len(keys), BULK_WRITE_CHUNK_SIZE):
+        chunk_keys = keys[start:start + BULK_WRITE_CHUNK_SIZE]
+        existing_contacts = _fetch_existing_contacts(collection, chunk_keys)
+
+        operations = []
+        written_docs = []  # (stored doc after write, stored doc before write) per operation
+        operation_keys = []  # (duplicate key, fields set) per operation
+        for key in chunk_keys:
+            contact_doc = pending[key]
+            update_fields = _get_update_fields(contact_doc)
+            existing_contact = existing_contacts.get(key)
+
+            if existing_contact is None:
+                # Assign the _id client-side so references to the contact are known before the write
+                contact_doc["_id"] = ObjectId()
+                insert_only_fields = {k: v for k, v in contact_doc.items() if k not in update_fields}
+                operations.append(UpdateOne(
+                    _duplicate_query_from_key(key),
+                    {"$set": update_fields, "$setOnInsert": insert_only_fields},
+                    upsert=True
+                ))
+                written_docs.append((contact_doc, None))
+                operation_keys.append((key, update_fields))
+                counts["inserted"] += 1
+                logger.debug(f"New contact: {contact_doc['email']} for {contact_doc['venue']} on {contact_doc['show_date']} in collection {collection.name}")
+            elif all(existing_contact.get(k) == v for k, v in update_fields.items()):
+                counts["unchanged"] += 1
+            else:
+                update_fields["updated_at"] = contact_doc["updated_at"]
+                operations.append(UpdateOne(
+                    _duplicate_query_from_key(key),
+                    {"$set": update_fields},
+                    upsert=True
+                ))
+                written_docs.append(({**existing_contact, **update_fields}, existing_contact))
+                operation_keys.append((key, update_fields))
+                counts["updated"] += 1
+                logger.debug(f"Updating existing contact: {contact_doc['email']} (found via {key[0]}) in collection {collection.name}")
+
+        if operations:
+            failed_indexes = set()
+            try:
+                collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                write_errors = e.details.get("writeErrors", [])
+                failed_indexes = {err.get("index") for err in write_errors}
+                # A duplicate key is harmless only when a concurrent run already stored this same
+                # contact; anything else the unique index rejected was not written
+                duplicate_errors = [err for err in write_errors if err.get("code") == DUPLICATE_KEY_ERROR]
+                other_errors = [err for err in write_errors if err.get("code") != DUPLICATE_KEY_ERROR]
+                for err in duplicate_errors:
+                    key, update_fields = operation_keys[err["index"]]
+                    counts["inserted" if written_docs[err["index"]][1] is None else "updated"] -= 1
+                    if _is_stored(collection, key, update_fields):
+                        counts["unchanged"] += 1
+                    else:
+                        other_errors.append(err)
+                if duplicate_errors:
+                    logger.info(f"Unique index rejected {len(duplicate_errors)} contacts in '{collection.name}'")
+                if other_errors:
+                    counts["failed"] += len(other_errors)
+                    logger.error(f"Bulk write to '{collection.name}' had {len(other_errors)} errors: {other_errors[:3]}")
+
+            if on_written is not None:
+                for index, (stored_doc, previous_doc) in enumerate(written_docs):
+                    if index not in failed_indexes:
+                        on_written(stored_doc, previous_doc)
+
+    return counts
+
+def batch_add_contacts_to_mongodb(batch_data, db=None, raise_on_error=False):
     """
     Batch adds contact data to MongoDB instead of MailerLite.
+    Contacts are upserted per source collection through chunked bulk writes.
     
-    :param batch_data: Dictionary with show names as keys and contact lists as values
+    :param batch_data: Dictionary with show names as keys and lists of GuestRecords
+                       (or legacy guest arrays) as values
+    :param db: Optional guest_list_contacts Database to write to (defaults to the configured MongoDB)
+    :param raise_on_error: Raise instead of only logging if any contact was not written
+    :return: Dictionary mapping collection name to inserted/updated/unchanged/failed/collapsed counts
     """
-    # Load MongoDB configuration
-    mongo_config = get_mongo_config()
-    if not mongo_config:
-        print("Error: Could not load MongoDB configuration from environment")
-        return
-        
-    MONGO_URI = mongo_config["mongo_uri"]
-    if not MONGO_URI:
-        print("Error: MONGO_URI not found in configuration")
-        return
+    results = {}
+    if db is None:
+        # Load MongoDB configuration
+        mongo_config = get_mongo_config()
+        if not mongo_config:
+            print("Error: Could not load MongoDB configuration from environment")
+            if raise_on_error:
+                raise RuntimeError("MongoDB configuration not found")
+            return {}
+            
+        MONGO_URI = mongo_config["mongo_uri"]
+        if not MONGO_URI:
+            print("Error: MONGO_URI not found in configuration")
+            if raise_on_error:
+                raise RuntimeError("MONGO_URI not found in configuration")
+            return {}
     
     # MongoDB configuration
     MONGO_DB = "guest_list_contacts"
     try:
-        client = MongoClient(MONGO_URI)
-        db = client[MONGO_DB]
+        if db is None:
+            client = get_mongo_client(MONGO_URI)
+            db = client[MONGO_DB]
 
         # Group contacts by source
         contacts_by_source = {}
@@ -114,149 +253,78 @@ def batch_add_contacts_to_mongodb(batch_data):
         # Process each show in batch_data
         for show_name, contact_list in batch_data.items():
             for contact in contact_list:
-                if len(contact) >= 9:
-                    contact_doc = {
-                        "venue": contact[0],
-                        "show_date": contact[1],
-                        "show_datetime": parse_show_date_with_year(contact[1]),
-                        "email": contact[2],
-                        "source": contact[3],
-                        "show_time": contact[4],
-                        "ticket_type": contact[5],
-                        "first_name": contact[6],
-                        "last_name": contact[7],
-                        "tickets": contact[8],
-                        "phone": contact[9] if len(contact) > 9 else None,
-                        "show_name": show_name,
-                        "added_to_mailerlite": False,
-                        "mailerlite_added_date": None,
-                        "created_at": datetime.utcnow(),
-                        "updated_at": datetime.utcnow()
-                    }
-
-                    enhanced_field_names = [
-                        "discount_code", "total_price", "order_id", "transaction_id",
-                        "customer_id", "payment_method", "entry_code", "notes"
-                    ]
-                    for i, field_name in enumerate(enhanced_field_names, start=10):
-                        if len(contact) > i and contact[i] is not None:
-                            contact_doc[field_name] = contact[i]
-
-                    # Determine collection name
-                    source_name = contact_doc["source"] if contact_doc["source"] else "contacts"
-                    if not isinstance(source_name, str) or not source_name.strip():
-                        source_name = "contacts"
-                    source_name = source_name.strip()
-
-                    if source_name not in contacts_by_source:
-                        contacts_by_source[source_name] = []
-                    contacts_by_source[source_name].append(contact_doc)
-
-        # Insert contacts by source
+                record = GuestRecord.coerce(contact)
+                if record is None:
+                    continue
+                contact_doc = record.to_mongo_doc(show_name)
+
+                # Determine collection name
+                source_name = contact_doc["source"] if contact_doc["source"] else "contacts"
+                if not isinstance(source_name, str) or not source_name.strip():
+                    source_name = "contacts"
+                source_name = source_name.strip()
+
+                if source_name not in contacts_by_source:
+                    contacts_by_source[source_name] = []
+                contacts_by_source[source_name].append(contact_doc)
+
+        # Upsert contacts by source, collecting per-show rollup deltas and buyer references
+        rollup_deltas = {}
+        people_refs = {}
         for source_name, contacts_to_insert in contacts_by_source.items():
-            collection = db[source_name]
-            inserted_count = 0
-            for contact_doc in contacts_to_insert:
-                # Build duplicate query
-                duplicate_query = {}
-                if "transaction_id" in contact_doc and contact_doc["transaction_id"]:
-                    duplicate_query["transaction_id"] = contact_doc["transaction_id"]
-                elif "order_id" in contact_doc and contact_doc["order_id"]:
-                    duplicate_query["order_id"] = contact_doc["order_id"]
-                else:
-                    duplicate_query = {
-                        "email": contact_doc["email"],
-                        "show_date": contact_doc["show_date"],
-                        "venue": contact_doc["venue"],
-                        "first_name": contact_doc["first_name"],
-                        "last_name": contact_doc["last_name"]
-                    }
-                existing_contact = collection.find_one(duplicate_query)
-                if not existing_contact:
-                    collection.insert_one(contact_doc)
-                    inserted_count += 1
-                    logger.debug(f"New contact: {contact_doc['email']} for {contact_doc['venue']} on {contact_doc['show_date']} in collection {source_name}")
-                else:
-                    logger.debug(f"Updating existing contact: {contact_doc['email']} (found via {list(duplicate_query.keys())[0]}) in collection {source_name}")
-                    update_fields = {
-                        "updated_at": datetime.utcnow(),
-                        "show_datetime": parse_show_date_with_year(contact_doc["show_date"]),
-                        "tickets": contact_doc["tickets"],
-                        "phone": contact_doc["phone"],
-                        "source": contact_doc["source"],
-                        "show_time": contact_doc["show_time"],
-                        "ticket_type": contact_doc["ticket_type"],
-                        "first_name": contact_doc["first_name"],
-                        "last_name": contact_doc["last_name"]
-                    }
-                    enhanced_fields = ["discount_code", "total_price", "order_id", "transaction_id", 
-                                     "customer_id", "payment_method", "entry_code", "notes"]
-                    for field in enhanced_fields:
-                        if field in contact_doc and contact_doc[field] is not None:
-                            update_fields[field] = contact_doc[field]
-                    collection.update_one(
-                        duplicate_query,
-                        {"$set": update_fields}
-                    )
-            if inserted_count:
-                print(f"Successfully inserted {inserted_count} new contacts to MongoDB collection '{source_name}'")
+            def on_written(stored_doc, previous_doc, source_name=source_name):
+                add_contact_delta(rollup_deltas, stored_doc, previous_doc)
+                add_person_ref(people_refs, stored_doc, source_name)
+
+            ensure_contact_indexes(db[source_name])
+            counts = _bulk_upsert_contacts(db[source_name], contacts_to_insert, on_written)
+            results[source_name] = counts
+            if counts["inserted"]:
+                print(f"Successfully inserted {counts['inserted']} new contacts to MongoDB collection '{source_name}'")
             else:
                 print(f"No new contacts to insert for collection '{source_name}'")
+            logger.info(f"Collection '{source_name}': {counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged")
+
+        try:
+            updated_shows = apply_rollup_deltas(db, rollup_deltas)
+            logger.info(f"Updated {updated_shows} show rollups")
+        except Exception as e:
+            # Rollups can always be recomputed with showRollups.py --rebuild
+            logger.error(f"Error updating show rollups: {e}")
+
+        try:
+            updated_people = apply_people_refs(db, people_refs)
+            logger.info(f"Updated {updated_people} people")
+        except Exception as e:
+            # The people index can always be recomputed with peopleIndex.py --rebuild
+            logger.error(f"Error updating people: {e}")
     except Exception as e:
         print(f"Error adding contacts to MongoDB: {str(e)}")
-    finally:
-        if 'client' in locals():
-            client.close()
+        if raise_on_error:
+            raise
 
-def save_comprehensive_data_to_mongodb(guest_data):
+    failed = sum(counts.get("failed", 0) for counts in results.values())
+    if failed and raise_on_error:
+        raise RuntimeError(f"{failed} contacts could not be written to MongoDB")
+    return results
+
+def save_comprehensive_data_to_mongodb(guest_data, db=None, raise_on_error=False):
     """Public wrapper moved from insertIntoGoogleSheet to centralize Mongo save logic."""
     logger.info(f"=== DEBUG: Starting MongoDB save for {len(guest_data)} guests ===")
     try:
         batch_data = {}
         for guest in guest_data:
-            venue = guest.get('venue', '')
-            show_date = guest.get('show_date', '')
-            show_key = f"{venue} - {show_date}"
-            if show_key not in batch_data:
-                batch_data[show_key] = []
-            guest_array = [
-                venue,
-                show_date,
-                guest.get('email', ''),
-                guest.get('source', ''),
-                # Time extraction kept lightweight here to avoid dependency loop
-                _extract_time_from_date(show_date) if isinstance(show_date, str) else '',
-                guest.get('ticket_type', 'GA'),
-                guest.get('first_name', ''),
-                guest.get('last_name', ''),
-                guest.get('tickets', 1),
-                guest.get('phone', ''),
-                guest.get('discount_code'),
-                guest.get('total_price'),
-                guest.get('order_id'),
-                guest.get('transaction_id'),
-                guest.get('customer_id'),
-                guest.get('payment_method'),
-                guest.get('entry_code'),
-                guest.get('notes')
-            ]
-            batch_data[show_key].append(guest_array)
-        logger.info(f"Converted to {len(batch_data)} show groupings")
-        batch_add_contacts_to_mongodb(batch_data)
+            record = GuestRecord.coerce(guest)
+            if record is None:
+                logger.warning(f"Skipping malformed guest: {guest}")
+                continue
+            if record.show_key not in batch_data:
+                batch_data[record.show_key] = []
+            batch_data[record.show_key].append(record)
+        logger.info(f"Grouped into {len(batch_data)} show groupings")
+        results = batch_add_contacts_to_mongodb(batch_data, db, raise_on_error)
         logger.info("=== DEBUG: batch_add_contacts_to_mongodb completed successfully ===")
+        return results
     except Exception as e:
         logger.error(f"=== DEBUG: MongoDB save operation FAILED: {e} ===")
         raise
-
-def _extract_time_from_date(show_date):
-    import re
-    time_patterns = [
-        r'(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm))',
-        r'(\d{1,2}(?:AM|PM|am|pm))',
-        r'(\d{2}:\d{2})'
-    ]
-    for pattern in time_patterns:
-        m = re.search(pattern, show_date)
-        if m:
-            return m.group(1)
-    return ''
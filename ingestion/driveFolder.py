@@ -0,0 +1,37 @@
+"""
+Drive folder listing shared by the spreadsheet maintenance and sync scripts
+Follows nextPageToken so folders larger than one page are listed in full, asks
+only for the file fields the callers use, and can list just the files modified
+since a watermark.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+SPREADSHEET_MIME_TYPE = "application/vnd.google-apps.spreadsheet"
+PAGE_SIZE = 1000
+
+def list_folder_spreadsheets(drive_service, folder_id, modified_after=None):
+    """
+    Every spreadsheet in the folder as {"id", "name", "modifiedTime"}, or only
+    those modified after modified_after (a naive UTC datetime) if given
+    """
+    query = f"'{folder_id}' in parents and mimeType='{SPREADSHEET_MIME_TYPE}' and trashed=false"
+    if modified_after is not None:
+        query += f" and modifiedTime > '{modified_after.strftime('%Y-%m-%dT%H:%M:%S')}'"
+    files = []
+    page_token = None
+    while True:
+        response = drive_service.files().list(
+            q=query,
+            spaces='drive',
+            fields='nextPageToken, files(id, name, modifiedTime)',
+            pageSize=PAGE_SIZE,
+            pageToken=page_token
+        ).execute()
+        files.extend(response.get('files', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            logger.info(f"Found {len(files)} spreadsheets in folder {folder_id}")
+            return files
@@ -0,0 +1,204 @@
+"""
+EventbriteCache - two-level cache for Eventbrite event details and attendee lists
+Within a run every event is fetched at most once (in-memory memo). Across runs
+event details are kept on disk for EVENTBRITE_EVENT_TTL_HOURS, and attendee lists
+until the event's "changed" timestamp moves or an order being processed changed
+after the list was fetched. The event's timestamp comes from the cached details,
+so an event-level change is only noticed once those details expire; order changes
+are noticed immediately. The file holds at most EVENTBRITE_CACHE_MAX_EVENTS
+events; the least recently used are evicted first. Processes sharing the file
+(the poller and the webhook receiver) each replace it whole: the last save wins.
+"""
+
+import os
+import json
+import tempfile
+import logging
+from datetime import datetime, timedelta
+from shared_config import load_project_config, get_project_root
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENT_TTL_HOURS = 24
+DEFAULT_MAX_EVENTS = 500
+CACHE_VERSION = 1
+
+# Attendee fields extract_guest_data_from_order uses; the rest is not stored
+ATTENDEE_FIELDS = ('order_id', 'ticket_class_name', 'quantity', 'barcodes', 'status', 'checked_in')
+
+def _utc_timestamp():
+    """Now in Eventbrite's timestamp format, e.g. 2025-08-01T19:30:00Z"""
+    return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _trim_attendees(attendees_data):
+    return {"attendees": [{field: attendee[field] for field in ATTENDEE_FIELDS if field in attendee}
+                          for attendee in attendees_data.get('attendees', [])]}
+
+class EventbriteCache:
+    """Per-run memo over a JSON file; create one per run and call save() at the end"""
+
+    def __init__(self, fetch_details, fetch_attendees, path=None, ttl_hours=None, max_events=None):
+        config = load_project_config()
+        if path is None:
+            path = config['eventbrite_cache_file'] if config else os.path.join('cache', 'eventbrite_cache.json')
+        self.path = path if os.path.isabs(path) else os.path.join(get_project_root(), path)
+        if ttl_hours is None:
+            ttl_hours = config['eventbrite_event_ttl_hours'] if config else DEFAULT_EVENT_TTL_HOURS
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_events = max_events or (config['eventbrite_cache_max_events'] if config else DEFAULT_MAX_EVENTS)
+        self._fetch_details = fetch_details
+        self._fetch_attendees = fetch_attendees
+        self._details = {}              # event_id -> details fetched or loaded this run
+        self._attendees = {}            # event_id -> attendees fetched this run
+        self._entries = self._load()
+        self._dirty = False
+        self.stats = {"details_fetched": 0, "details_cached": 0, "attendees_fetched": 0, "attendees_cached": 0}
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (IOError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable Eventbrite cache {self.path}: {e}")
+            return {}
+        if data.get('version') != CACHE_VERSION:
+            return {}
+        return data.get('events', {})
+
+    def _entry(self, event_id):
+        entry = self._entries.setdefault(str(event_id), {})
+        entry['used_at'] = _utc_timestamp()
+        self._dirty = True
+        return entry
+
+    def _cached_details(self, event_id):
+        """Details from this run or a fresh disk entry, else None"""
+        if event_id in self._details:
+            return self._details[event_id]
+        entry = self._entries.get(str(event_id), {})
+        fetched_at = entry.get('details_fetched_at')
+        if entry.get('details') and fetched_at and \
+                datetime.utcnow() - datetime.strptime(fetched_at, "%Y-%m-%dT%H:%M:%SZ") < self.ttl:
+            self._entry(event_id)
+            self.stats["details_cached"] += 1
+            self._details[event_id] = entry['details']
+            return entry['details']
+        return None
+
+    def _store_details(self, event_id, details):
+        self.stats["details_fetched"] += 1
+        if details:
+            entry = self._entry(event_id)
+            entry['details'] = details
+            entry['details_fetched_at'] = _utc_timestamp()
+        self._details[event_id] = details
+        return details
+
+    def event_details(self, event_id):
+        """Event details from this run, the disk cache if fresh, or the API"""
+        if event_id in self._details:
+            return self._details[event_id]
+        details = self._cached_details(event_id)
+        if details is None:
+            details = self._store_details(event_id, self._fetch_details(event_id))
+        return details
+
+    def _cached_attendees(self, event_id, event_details, order):
+        """Attendees from this run, or from disk while still current for the order, else None"""
+        if event_id in self._attendees:
+            return self._attendees[event_id]
+        entry = self._entries.get(str(event_id), {})
+        event_changed = (event_details or {}).get('changed')
+        order_changed = (order or {}).get('changed', '')
+        if entry.get('attendees') is not None and entry.get('event_changed') == event_changed \
+                and order_changed <= entry.get('attendees_fetched_at', ''):
+            self._entry(event_id)
+            self.stats["attendees_cached"] += 1
+            return entry['attendees']
+        return None
+
+    def _store_attendees(self, event_id, event_details, attendees, fetched_at):
+        self.stats["attendees_fetched"] += 1
+        if attendees:
+            attendees = _trim_attendees(attendees)
+            entry = self._entry(event_id)
+            entry['attendees'] = attendees
+            entry['attendees_fetched_at'] = fetched_at
+            entry['event_changed'] = (event_details or {}).get('changed')
+        self._attendees[event_id] = attendees
+        return attendees
+
+    def event_attendees(self, event_id, event_details=None, order=None):
+        """
+        Attendees for an event: fetched at most once per run, and reused from disk
+        while the event is unchanged (per event_details, which may be up to the
+        details TTL old) and the order is older than the stored list
+        """
+        if event_id in self._attendees:
+            return self._attendees[event_id]
+        attendees = self._cached_attendees(event_id, event_details, order)
+        if attendees is None:
+            fetched_at = _utc_timestamp()
+            attendees = self._store_attendees(event_id, event_details, self._fetch_attendees(event_id), fetched_at)
+        return attendees
+
+    def prefetch(self, orders, fan_out):
+        """
+        Fetch every missing event's details, then every missing attendee list,
+        through fan_out(fn, items) so independent lookups run in parallel. Orders
+        with expanded attendees do not need their event's attendee list.
+        """
+        newest_orders = {}
+        for order in orders:
+            event_id = order.get('event_id')
+            if event_id and order.get('changed', '') >= newest_orders.get(event_id, {}).get('changed', ''):
+                newest_orders[event_id] = order
+
+        missing = [event_id for event_id in newest_orders if self._cached_details(event_id) is None]
+        for event_id, details in zip(missing, fan_out(self._fetch_details, missing)):
+            self._store_details(event_id, details)
+
+        need_attendees = {order.get('event_id') for order in orders
+                          if order.get('event_id') and order.get('attendees') is None}
+        missing = [event_id for event_id in need_attendees
+                   if self._cached_attendees(event_id, self._details.get(event_id), newest_orders[event_id]) is None]
+        fetched_at = _utc_timestamp()
+        for event_id, attendees in zip(missing, fan_out(self._fetch_attendees, missing)):
+            self._store_attendees(event_id, self._details.get(event_id), attendees, fetched_at)
+
+    def _evict(self):
+        """Drop expired details, then the least recently used events over max_events"""
+        cutoff = (datetime.utcnow() - self.ttl).strftime("%Y-%m-%dT%H:%M:%SZ")
+        for entry in self._entries.values():
+            if entry.get('details_fetched_at', '') < cutoff:
+                entry.pop('details', None)
+                entry.pop('details_fetched_at', None)
+        events = {event_id: entry for event_id, entry in self._entries.items()
+                  if entry.get('details') or entry.get('attendees') is not None}
+        if len(events) > self.max_events:
+            keep = sorted(events, key=lambda event_id: events[event_id].get('used_at', ''), reverse=True)
+            events = {event_id: events[event_id] for event_id in keep[:self.max_events]}
+        self._entries = events
+
+    def save(self):
+        """Write the cache file (atomically) if anything changed this run"""
+        if not self._dirty:
+            return
+        self._evict()
+        try:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            # A temp file per writer, so concurrent saves never write into each other's file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({"version": CACHE_VERSION, "events": self._entries}, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._dirty = False
+        except (IOError, OSError) as e:
+            logger.error(f"Error saving Eventbrite cache to {self.path}: {e}")
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Eventbrite webhook receiver for near-real-time order ingestion
+Accepts order.placed / order.updated webhooks, stores each one in a durable
+local queue (SQLite) before answering, and a worker thread dereferences the
+webhook's api_url and sends the orders through the same
+extract_guest_data_from_order -> insert_guest_data_efficient path as the
+poller. A queued webhook is only removed once its guests are in MongoDB and
+Google Sheets; failures are retried with backoff, also after a restart.
+
+getEventbriteOrders.py stays in cron (at a longer interval) as the reconciler
+for anything a webhook missed; this receiver does not move its sync mark.
+"""
+
+import os
+import sys
+import hmac
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from shared_config import load_project_config, get_project_root
+from httpClient import fan_out
+from eventbriteCache import EventbriteCache
+from getEventbriteOrders import fetch_order, fetch_event_details, fetch_event_attendees, extract_guests_from_orders
+from insertIntoGoogleSheet import insert_guest_data_efficient
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_PATH = "/eventbrite"
+ACCEPTED_ACTIONS = {"order.placed", "order.updated"}
+# The receiver fetches api_url with our API token, so only Eventbrite's API host is trusted
+EVENTBRITE_API_HOST = "www.eventbriteapi.com"
+MAX_BODY_BYTES = 64 * 1024
+
+DEFAULT_PORT = 8085
+BATCH_SIZE = 50
+BATCH_DELAY_SECONDS = 2        # let a burst of webhooks collect into one batch
+IDLE_POLL_SECONDS = 30         # check for retries that have come due
+MAX_ATTEMPTS = 8
+BASE_RETRY_SECONDS = 30
+MAX_RETRY_SECONDS = 3600
+
+def _utc_timestamp(moment=None):
+    return (moment or datetime.utcnow()).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+class WebhookQueue:
+    """
+    Webhooks waiting to be processed, in a SQLite file. Entries stay until
+    done() is called for them; retry() reschedules with exponential backoff
+    and parks an entry as 'failed' after MAX_ATTEMPTS. A debug queue lives in
+    its own file next to the real one, so debug runs never consume real webhooks.
+    """
+
+    def __init__(self, path=None, debug=False):
+        if path is None:
+            config = load_project_config()
+            path = config['eventbrite_webhook_queue_file'] if config else os.path.join('cache', 'eventbrite_webhooks.sqlite3')
+            if debug:
+                root, extension = os.path.splitext(path)
+                path = f"{root}.debug{extension}"
+        self.path = path if os.path.isabs(path) else os.path.join(get_project_root(), path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS webhooks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                action TEXT NOT NULL,
+                api_url TEXT NOT NULL,
+                received_at TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TEXT NOT NULL,
+                last_error TEXT
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS webhooks_ready ON webhooks (status, next_attempt_at)")
+        self._db.commit()
+
+    def enqueue(self, action, api_url):
+        """Store a webhook; it is on disk when this returns"""
+        now = _utc_timestamp()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO webhooks (action, api_url, received_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (action, api_url, now, now))
+            self._db.commit()
+        return cursor.lastrowid
+
+    def ready(self, limit=BATCH_SIZE):
+        """Pending webhooks that are due, oldest first, as (id, action, api_url)"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, action, api_url FROM webhooks WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY id LIMIT ?", (_utc_timestamp(), limit)).fetchall()
+
+    def done(self, ids):
+        with self._lock:
+            self._db.executemany("DELETE FROM webhooks WHERE id = ?", [(webhook_id,) for webhook_id in ids])
+            self._db.commit()
+
+    def retry(self, ids, error):
+        """Schedule the next attempt for each webhook, or park it as failed after MAX_ATTEMPTS"""
+        with self._lock:
+            for webhook_id in ids:
+                row = self._db.execute("SELECT attempts FROM webhooks WHERE id = ?", (webhook_id,)).fetchone()
+                if row is None:
+                    continue
+                attempts = row[0] + 1
+                delay = min(MAX_RETRY_SECONDS, BASE_RETRY_SECONDS * 2 ** (attempts - 1))
+                status = 'failed' if attempts >= MAX_ATTEMPTS else 'pending'
+                self._db.execute(
+                    "UPDATE webhooks SET attempts = ?, status = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    (attempts, status, _utc_timestamp(datetime.utcnow() + timedelta(seconds=delay)), error, webhook_id))
+                if status == 'failed':
+                    logger.error(f"Giving up on webhook {webhook_id} after {attempts} attempts: {error}")
+            self._db.commit()
+
+    def counts(self):
+        """Number of webhooks per status"""
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM webhooks GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def is_trusted_api_url(api_url):
+    parts = urlsplit(api_url or '')
+    return parts.scheme == 'https' and parts.netloc == EVENTBRITE_API_HOST and parts.path.startswith('/v3/orders/')
+
+def process_queue(queue, debug_only=False, batch_size=BATCH_SIZE):
+    """
+    Process one batch of due webhooks: fetch each order once, extract its
+    guests and insert them. Webhooks are removed once their guests are
+    committed (or, with debug_only, logged - serve() then uses the separate
+    debug queue); the rest are retried later.
+
+    :return: Number of webhooks taken from the queue
+    """
+    jobs = queue.ready(batch_size)
+    if not jobs:
+        return 0
+
+    # An order is often queued more than once (placed, then updated); its current state covers all of them
+    ids_by_url = {}
+    for webhook_id, action, api_url in jobs:
+        ids_by_url.setdefault(api_url, []).append(webhook_id)
+    urls = list(ids_by_url)
+    logger.info(f"Processing {len(jobs)} webhooks for {len(urls)} orders")
+
+    orders = []
+    url_by_order_id = {}
+    failed_urls = set()
+    for api_url, order in zip(urls, fan_out(fetch_order, urls)):
+        if order:
+            orders.append(order)
+            url_by_order_id[order.get('id')] = api_url
+        else:
+            failed_urls.add(api_url)
+
+    cache = EventbriteCache(fetch_event_details, fetch_event_attendees)
+    guests, failed_order_ids = extract_guests_from_orders(orders, cache)
+    cache.save()
+    failed_urls.update(url_by_order_id[order_id] for order_id in failed_order_ids if order_id in url_by_order_id)
+    succeeded_urls = [api_url for api_url in urls if api_url not in failed_urls]
+
+    error = "order could not be fetched or processed"
+    if guests:
+        if debug_only:
+            for guest in guests:
+                logger.info(f"[debug-only] {guest.show_key}: {guest}")
+        elif not insert_guest_data_efficient(guests):
+            # Rows already written are skipped as duplicates on the next attempt
+            logger.error("Some webhook guests were not written - will retry")
+            failed_urls.update(succeeded_urls)
+            succeeded_urls = []
+            error = "MongoDB or Google Sheets write failed"
+
+    queue.done([webhook_id for api_url in succeeded_urls for webhook_id in ids_by_url[api_url]])
+    queue.retry([webhook_id for api_url in failed_urls for webhook_id in ids_by_url[api_url]], error)
+    logger.info(f"Webhook batch done: {len(succeeded_urls)} orders ingested, {len(failed_urls)} to retry")
+    return len(jobs)
+
+def run_worker(queue, wake, stop, debug_only=False):
+    """Drain the queue whenever a webhook arrives, and periodically for retries"""
+    while not stop.is_set():
+        try:
+            if process_queue(queue, debug_only):
+                continue
+        except Exception as e:
+            logger.error(f"Error processing webhook queue: {e}")
+        if wake.wait(IDLE_POLL_SECONDS) and not stop.is_set():
+            stop.wait(BATCH_DELAY_SECONDS)
+        wake.clear()
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, queue, wake, token=None):
+        super().__init__(address, WebhookHandler)
+        self.queue = queue
+        self.wake = wake
+        self.token = token
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Validates and queues webhooks; all Eventbrite and Sheets work happens on the worker"""
+
+    def _reply(self, status, message):
+        body = json.dumps({"status": message}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        if parts.path.rstrip('/') != WEBHOOK_PATH:
+            return self._reply(404, "not found")
+        token = parse_qs(parts.query).get('token', [''])[0]
+        if self.server.token and not hmac.compare_digest(token, self.server.token):
+            return self._reply(403, "forbidden")
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            return self._reply(413, "payload too large")
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._reply(400, "invalid JSON")
+
+        action = (payload.get('config') or {}).get('action')
+        api_url = payload.get('api_url')
+        if action not in ACCEPTED_ACTIONS:
+            # Includes the "test" ping Eventbrite sends when a webhook is registered
+            logger.info(f"Ignoring webhook action {action}")
+            return self._reply(200, "ignored")
+        if not is_trusted_api_url(api_url):
+            logger.warning(f"Rejecting {action} webhook with api_url {api_url}")
+            return self._reply(400, "invalid api_url")
+
+        try:
+            webhook_id = self.server.queue.enqueue(action, api_url)
+        except sqlite3.Error as e:
+            # Eventbrite retries webhooks that do not get a 2xx
+            logger.error(f"Could not queue {action} webhook for {api_url}: {e}")
+            return self._reply(503, "queue unavailable")
+        logger.info(f"Queued {action} webhook {webhook_id} for {api_url}")
+        self.server.wake.set()
+        return self._reply(200, "queued")
+
+    def do_GET(self):
+        if urlsplit(self.path).path.rstrip('/') != f"{WEBHOOK_PATH}/health":
+            return self._reply(404, "not found")
+        counts = self.server.queue.counts()
+        return self._reply(200, f"ok ({counts.get('pending', 0)} pending, {counts.get('failed', 0)} failed)")
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+def serve(port=None, debug_only=False, queue=None):
+    """Run the receiver and its worker until interrupted"""
+    config = load_project_config()
+    if port is None:
+        port = config['eventbrite_webhook_port'] if config else DEFAULT_PORT
+    token = config['eventbrite_webhook_token'] if config else None
+    if not token:
+        logger.warning("EVENTBRITE_WEBHOOK_TOKEN is not set - accepting webhooks without a token")
+
+    queue = queue or WebhookQueue(debug=debug_only)
+    wake, stop = threading.Event(), threading.Event()
+    worker = threading.Thread(target=run_worker, args=(queue, wake, stop, debug_only), name="webhook-worker", daemon=True)
+    worker.start()
+
+    server = WebhookServer(('0.0.0.0', port), queue, wake, token)
+    logger.info(f"Listening for Eventbrite webhooks on port {port} at {WEBHOOK_PATH}"
+                f"{' (debug-only, nothing is written)' if debug_only else ''}; queue: {queue.path} {queue.counts()}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down webhook receiver")
+    finally:
+        server.server_close()
+        stop.set()
+        wake.set()
+        worker.join()
+        queue.close()
+
+def main():
+    """Start the webhook receiver"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage: python3 eventbriteWebhooks.py [--port=N] [--debug-only]")
+        print("\nOptions:")
+        print("  --port=N       Port to listen on (default: EVENTBRITE_WEBHOOK_PORT or 8085)")
+        print("  --debug-only   Fetch and log the orders' guests without writing MongoDB or Sheets")
+        print("                 (uses a separate .debug queue file, so real pending webhooks are untouched)")
+        print(f"\nRegister http://HOST:PORT{WEBHOOK_PATH}?token=EVENTBRITE_WEBHOOK_TOKEN in Eventbrite for")
+        print("order.placed and order.updated. Keep getEventbriteOrders.py in cron as the reconciler.")
+        print("replayEventbriteWebhooks.py posts recorded payloads to a running receiver.")
+        return
+
+    port = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--port='):
+            try:
+                port = int(arg.split('=', 1)[1])
+            except ValueError:
+                print(f"Error: invalid port {arg}")
+                return
+
+    serve(port=port, debug_only='--debug-only' in sys.argv)
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,9 @@ import os.path
 import base64
 import re
 import logging
-from googleapiclient.discovery import build
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
+from googleApiLimiter import build_service
 from urllib.parse import urlparse, parse_qs, urljoin
 import sys
 import os
@@ -118,7 +118,7 @@ def fetch_verification_code():
                 logger.error(f"Failed to run OAuth flow: {str(e)}")
                 return None
 
-    service = build('gmail', 'v1', credentials=creds)
+    service = build_service('gmail', 'v1', creds)
     
     # Search for emails from noreply@bucketlisters.com
     query = 'from:noreply@bucketlisters.com "Here is your verification code"'
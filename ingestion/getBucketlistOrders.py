@@ -6,10 +6,11 @@ import time
 import urllib.parse
 import sys
 from datetime import datetime, timedelta
-from pymongo import MongoClient
-from insertIntoGoogleSheet import insert_data_into_google_sheet
+from shared_config import get_mongo_client
+from insertIntoGoogleSheet import SheetsSession
 from getVenueAndDate import get_city, append_year_to_show_date, get_venue, convert_date_from_any_format, format_time
 from getBucketlistCookie import load_cookie, get_new_cookie
+from guestRecord import GuestRecord
 import uuid
 
 # Configure logging
@@ -216,14 +217,12 @@ def get_guest_list(session, experience_id, event_id, cookie):
 
 def store_transaction(transaction_data):
     try:
-        client = MongoClient(MONGO_URI)
+        client = get_mongo_client(MONGO_URI)
         db = client[MONGO_DB]
         collection = db[MONGO_SALES_COLLECTION]
         collection.insert_one(transaction_data)
     except Exception as e:
         logger.error(f"Error inserting transaction: {str(e)}")
-    finally:
-        client.close()
 
 def check_mongo_db(event_id, tickets_sold, force_refresh=False):
     """Check MongoDB for event changes. If force_refresh=True, always return True to process all events."""
@@ -233,7 +232,7 @@ def check_mongo_db(event_id, tickets_sold, force_refresh=False):
     
     logger.info(f"Checking MongoDB for event {event_id}")
     try:
-        client = MongoClient(MONGO_URI)
+        client = get_mongo_client(MONGO_URI)
         db = client[MONGO_DB]
         collection = db[MONGO_COLLECTION]
         event_record = collection.find_one({"eventId": event_id})
@@ -250,8 +249,6 @@ def check_mongo_db(event_id, tickets_sold, force_refresh=False):
     except Exception as e:
         logger.error(f"Error checking MongoDB for event {event_id}: {str(e)}")
         return False, 0
-    finally:
-        client.close()
 
 def is_new_transaction(event_id, transaction_id, customer_email, force_refresh=False):
     """Check if transaction is new. If force_refresh=True, always return True to process all transactions."""
@@ -259,7 +256,7 @@ def is_new_transaction(event_id, transaction_id, customer_email, force_refresh=F
         return True
     
     try:
-        client = MongoClient(MONGO_URI)
+        client = get_mongo_client(MONGO_URI)
         db = client[MONGO_DB]
         collection = db[MONGO_SALES_COLLECTION]
         exists = collection.find_one({
@@ -271,8 +268,6 @@ def is_new_transaction(event_id, transaction_id, customer_email, force_refresh=F
     except Exception as e:
         logger.error(f"Error checking transactionId: {str(e)}")
         return False
-    finally:
-        client.close()
 
 def main():
     # Check for help flag first
@@ -388,30 +383,28 @@ def main():
                     
                     logger.debug(f"Guest {guest['customerName']}: {ticket_type} x{guest['quantity']} = ${total_price:.2f}")
 
-                    # Create guest data array
-                    guest_array = [
-                        venue,
-                        show_date_with_time,
-                        guest["customerEmail"],
-                        "Bucketlist",
-                        show_time,
-                        ticket_type,
-                        first_name,
-                        last_name,
-                        ticket_quantity,
-                        guest.get("customerPhone", ""),
+                    # Create guest record
+                    guest_record = GuestRecord(
+                        venue=venue,
+                        show_date=show_date_with_time,
+                        email=guest["customerEmail"],
+                        source="Bucketlist",
+                        show_time=show_time,
+                        ticket_type=ticket_type,
+                        first_name=first_name,
+                        last_name=last_name,
+                        tickets=ticket_quantity,
+                        phone=guest.get("customerPhone", ""),
                         # Enhanced fields for MongoDB consistency
-                        None,  # discount_code
-                        total_price,  # total_price
-                        None,  # order_id
-                        transaction_id,  # transaction_id
-                        guest["customerEmail"],  # customer_id
-                        "Bucketlist",  # payment_method
-                        transaction_id,  # entry_code
-                        f"Ticket Type: {ticket_type}; PurchaseTime: {guest.get('purchaseTime') or 'N/A'}"  # notes with purchase time
-                    ]
-
-                    batch_data[venue][show_date_with_time].append(guest_array)
+                        total_price=total_price,
+                        transaction_id=transaction_id,
+                        customer_id=guest["customerEmail"],
+                        payment_method="Bucketlist",
+                        entry_code=transaction_id,
+                        notes=f"Ticket Type: {ticket_type}; PurchaseTime: {guest.get('purchaseTime') or 'N/A'}"  # notes with purchase time
+                    )
+
+                    batch_data[venue][show_date_with_time].append(guest_record)
                     
                     # Store transaction data for tracking
                     if not force_refresh:  # Only store if not in force refresh mode to avoid duplicates
@@ -436,9 +429,10 @@ def main():
 
     if batch_data:
         logger.info(f"Processing {total_guests_processed} total guests from {total_events_processed} events via unified pipeline")
-        for venue in batch_data:
-            for date in batch_data[venue]:
-                insert_data_into_google_sheet({venue: batch_data[venue][date]})
+        # One session: each worksheet is written and formatted once for the whole run
+        with SheetsSession() as session:
+            for venue in batch_data:
+                session.add_shows(batch_data[venue])
         logger.info("Successfully processed all Bucketlist orders")
     else:
         logger.info("No new sales to update.")
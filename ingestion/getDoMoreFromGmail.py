@@ -1,21 +1,22 @@
 import json
 import logging
 import os
-import time
 import sys
 import csv
 import pickle
 import base64
 import requests
 from datetime import datetime, timedelta
-from googleapiclient.discovery import build
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
+from googleApiLimiter import build_service
 from bs4 import BeautifulSoup
-from pymongo import MongoClient
+from shared_config import get_mongo_client
 from insertIntoGoogleSheet import insert_data_into_google_sheet
 from addContactsToMongoDB import batch_add_contacts_to_mongodb
 from getVenueAndDate import get_venue, extract_time_from_subject, extract_date_from_subject, convert_date_from_any_format
+from guestRecord import GuestRecord
+from syncState import SyncState, epoch_seconds, from_epoch_millis
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -90,11 +91,11 @@ DESCRIPTION:
     --force-refresh: Ignores existing email processing records.
                     Useful for reprocessing emails or fixing data inconsistencies.
     
-    --days=N: Search emails from the last N days instead of default 1 hour interval.
+    --days=N: Search emails from the last N days instead of since the last successful sync.
              For beginning of year: use --days=365 or --days=250
 
 NOTES:
-    - Default behavior searches last 1 hour (for cronjob)
+    - Default behavior searches from the last successful sync (first run: last hour)
     - Requires Gmail API credentials and DoMORE email access
     - Automatically clicks "I RECEIVED THIS LIST" button in emails
     - Processes CSV attachments with guest names and ticket counts
@@ -121,7 +122,7 @@ def check_debug_only_flag():
 def batch_add_contacts_to_mongodb(batch_data):
     """
     Add contacts to MongoDB in batch format compatible with mongo-only mode.
-    batch_data format: {"venue - date": [guest_arrays]}
+    batch_data format: {"venue - date": [GuestRecords]}
     """
     try:
         from addContactsToMongoDB import batch_add_contacts_to_mongodb as mongo_batch_add
@@ -142,7 +143,7 @@ def is_processed_email(message_id, csv_filename, force_refresh=False):
         return False
     
     try:
-        client = MongoClient(MONGO_URI)
+        client = get_mongo_client(MONGO_URI)
         db = client[MONGO_DB]
         collection = db[MONGO_COLLECTION]
         exists = collection.find_one({
@@ -153,9 +154,6 @@ def is_processed_email(message_id, csv_filename, force_refresh=False):
     except Exception as e:
         logger.error(f"Error checking message processing status: {str(e)}")
         return False
-    finally:
-        if 'client' in locals():
-            client.close()
 
 
 def extract_button_url(html_content):
@@ -214,24 +212,32 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
         with open(config.GMAIL_TOKEN_PATH, 'wb') as token:
             pickle.dump(creds, token)
 
-    service = build('gmail', 'v1', credentials=creds)
+    service = build_service('gmail', 'v1', creds)
 
-    # Calculate time range for search
+    # Calculate time range for search: from the last successful sync unless days are given
+    sync_state = SyncState("domore")
+    window_start = None if days else sync_state.fetch_from()
     if days:
         # Use specified days
-        days_ago = int(time.time()) - (days * 24 * 60 * 60)
-        search_query = f"after:{days_ago} subject:'MORE Guest List'"
+        window_start = datetime.utcnow() - timedelta(days=days)
         logger.info(f"Searching emails from last {days} days")
+    elif window_start:
+        logger.info(f"Searching emails since the last successful sync ({sync_state.mark()} UTC)")
     else:
-        # Use default interval from config (for cronjob)
-        current_time_epoch = int(time.time())
-        last_run = current_time_epoch - (config.GMAIL_SCRIPT_INTERVAL_HOURS * 60 * 60)
-        search_query = f"after:{last_run} subject:'MORE Guest List'"
+        # First run: use default interval from config
+        window_start = datetime.utcnow() - timedelta(hours=config.GMAIL_SCRIPT_INTERVAL_HOURS)
         logger.info(f"Searching emails from last {config.GMAIL_SCRIPT_INTERVAL_HOURS} hours")
+    search_query = f"after:{epoch_seconds(window_start)} subject:'MORE Guest List'"
 
     try:
-        result = service.users().messages().list(userId='me', q=search_query).execute()
-        messages = result.get('messages', [])
+        messages = []
+        page_token = None
+        while True:
+            result = service.users().messages().list(userId='me', q=search_query, pageToken=page_token).execute()
+            messages.extend(result.get('messages', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                break
     except Exception as e:
         logger.error(f"Error fetching messages: {e}")
         return
@@ -245,6 +251,8 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
     batch_data = {}
     total_processed = 0
     total_skipped = 0
+    failed_messages = 0
+    high_water = None      # newest internalDate among the messages read
 
     for msg in messages:
         try:
@@ -252,6 +260,9 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
             
             # Fetch the full message
             full_message = service.users().messages().get(userId='me', id=msg_id).execute()
+            if full_message.get('internalDate'):
+                received = from_epoch_millis(full_message['internalDate'])
+                high_water = max(high_water, received) if high_water else received
             headers = full_message['payload']['headers']
             subject = next((header['value'] for header in headers if header['name'] == 'Subject'), "Subject not found")
 
@@ -282,6 +293,7 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
                             logger.info(f"Successfully extracted CSV: {csv_filename}")
                         except Exception as e:
                             logger.error(f"Error extracting CSV attachment {csv_filename}: {e}")
+                            failed_messages += 1
                             continue
 
             # Handle button clicking
@@ -347,40 +359,38 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
                             # Create unique transaction ID
                             transaction_id = f"{msg_id}_{csv_filename}_{csv_guests_processed}"
                             
-                            # Create 18-field guest data array
-                            guest_array = [
-                                venue_name,                     # 0: venue
-                                show_date_with_time,           # 1: show_date_with_time
-                                "",                            # 2: email (empty)
-                                "DoMORE",                      # 3: source
-                                time_of_show,                  # 4: show_time
-                                "GA",                          # 5: ticket_type
-                                first_name,                    # 6: first_name
-                                last_name,                     # 7: last_name
-                                num_tickets,                   # 8: quantity
-                                "",                            # 9: phone (empty)
-                                None,                          # 10: discount_code
-                                0.0,                           # 11: total_price (free tickets)
-                                None,                          # 12: order_id
-                                transaction_id,                # 13: transaction_id
-                                "",                            # 14: customer_id (empty)
-                                "DoMORE",                      # 15: payment_method
-                                transaction_id,                # 16: entry_code
-                                f"DoMORE Guest List - {csv_filename}"  # 17: notes
-                            ]
+                            # Create guest record
+                            guest_record = GuestRecord(
+                                venue=venue_name,
+                                show_date=show_date_with_time,
+                                email="",
+                                source="DoMORE",
+                                show_time=time_of_show,
+                                ticket_type="GA",
+                                first_name=first_name,
+                                last_name=last_name,
+                                tickets=num_tickets,
+                                phone="",
+                                total_price=0.0,               # Free tickets
+                                transaction_id=transaction_id,
+                                customer_id="",
+                                payment_method="DoMORE",
+                                entry_code=transaction_id,
+                                notes=f"DoMORE Guest List - {csv_filename}"
+                            )
 
                             # Add to batch data
                             if mongo_only:
                                 show_key = f"{venue_name} - {show_date_with_time}"
                                 if show_key not in batch_data:
                                     batch_data[show_key] = []
-                                batch_data[show_key].append(guest_array)
+                                batch_data[show_key].append(guest_record)
                             else:
                                 # Original structure for Google Sheets
                                 show_name = subject
                                 if show_name not in batch_data:
                                     batch_data[show_name] = []
-                                batch_data[show_name].append(guest_array)
+                                batch_data[show_name].append(guest_record)
 
                             csv_guests_processed += 1
 
@@ -391,13 +401,16 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
 
                 except Exception as e:
                     logger.error(f"Error processing CSV data from {csv_filename}: {e}")
+                    failed_messages += 1
                     continue
 
         except Exception as e:
             logger.error(f"Error processing message {msg.get('id', 'unknown')}: {e}")
+            failed_messages += 1
             continue
 
     # Process batch data
+    committed = not failed_messages and not debug_only and not mongo_only
     if batch_data:
         logger.info(f"Processing {total_processed} total guests from {len(batch_data)} shows")
         
@@ -421,7 +434,7 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
             # Use original Google Sheets process
             logger.info("=== DEBUG: Using default dual-path (Sheets + MongoDB) ===")
             logger.info(f"=== DEBUG: About to call insert_data_into_google_sheet with {len(batch_data)} shows ===")
-            insert_data_into_google_sheet(batch_data)
+            committed = insert_data_into_google_sheet(batch_data) and committed
             logger.info("Successfully processed all DoMORE guest lists")
     else:
         logger.info("No new DoMORE guest lists to process")
@@ -429,6 +442,12 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
     if total_skipped > 0:
         logger.info(f"Skipped {total_skipped} already processed emails")
 
+    # Move the sync mark only once every guest list made it into both MongoDB and Sheets
+    if committed and high_water:
+        sync_state.advance(high_water, window_start)
+    elif high_water and not (debug_only or mongo_only):
+        logger.error("Some DoMORE guest lists were not written - sync mark left unchanged")
+
 def parse_days_parameter():
     """Parse --days=N parameter from command line arguments."""
     for arg in sys.argv:
@@ -1,9 +1,12 @@
-import requests
 import logging
 from datetime import datetime, timedelta
 from insertIntoGoogleSheet import insert_guest_data_efficient
 from addContactsToMongoDB import batch_add_contacts_to_mongodb
 from getVenueAndDate import get_venue, format_time
+from guestRecord import GuestRecord
+from eventbriteCache import EventbriteCache
+from httpClient import get_http_client, fan_out
+from syncState import SyncState
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -33,7 +36,8 @@ Usage: python3 getEventbriteOrders.py [MINUTES] [--mongo-only] [--help]
 
 Arguments:
   MINUTES       Number of minutes to look back for changed orders
-                Default: Value from config.SCRIPT_INTERVAL
+                Default: resume from the last successful sync (config.SCRIPT_INTERVAL
+                on the first run)
                 
 Options:
   --mongo-only  Skip Google Sheets integration, only save to MongoDB
@@ -50,11 +54,8 @@ For historical data import from beginning of year, use:
 """
     print(help_text)
 
-def get_time_interval():
-    """Get the time interval from command line argument or use default"""
-    interval = config.SCRIPT_INTERVAL
-    
-    # Filter out non-numeric arguments (like --mongo-only)
+def _interval_arguments():
+    """Numeric command line arguments (flags like --mongo-only are skipped)"""
     numeric_args = []
     for arg in sys.argv[1:]:
         if not arg.startswith('--') and not arg.startswith('-'):
@@ -62,7 +63,13 @@ def get_time_interval():
                 numeric_args.append(int(arg))
             except ValueError:
                 continue
+    return numeric_args
+
+def get_time_interval():
+    """Get the time interval from command line argument or use default"""
+    interval = config.SCRIPT_INTERVAL
     
+    numeric_args = _interval_arguments()
     if numeric_args:
         interval = numeric_args[0]
         logger.info(f"Using command line interval: {interval} minutes")
@@ -71,20 +78,30 @@ def get_time_interval():
     
     return interval
 
-def calculate_time_range(interval_minutes):
-    """Calculate the time range for API request"""
-    current_date = datetime.now()
-    last_run = current_date - timedelta(minutes=interval_minutes)
-    changed_since = last_run.strftime("%Y-%m-%dT%H:%M:%SZ")
+def calculate_time_range(sync_state, current_date):
+    """
+    Start of the changed_since window (UTC): the stored sync mark, or the look-back
+    interval when one is given on the command line or there is no mark yet
+    """
+    window_start = None if _interval_arguments() else sync_state.fetch_from()
+    if window_start is None:
+        window_start = current_date - timedelta(minutes=get_time_interval())
+    else:
+        logger.info(f"Resuming from the last successful sync at {sync_state.mark()} UTC")
+    changed_since = window_start.strftime("%Y-%m-%dT%H:%M:%SZ")
     current_time = current_date.strftime("%Y-%m-%dT%H:%M:%SZ")
     
     logger.info(f"Fetching Eventbrite orders changed from {changed_since} to {current_time}")
-    return changed_since
+    return window_start, changed_since
 
 def fetch_eventbrite_orders(changed_since):
-    """Fetch orders from Eventbrite API with pagination support"""
+    """
+    Fetch orders from Eventbrite API with pagination support. Orders come back with
+    their attendees expanded, so no per-event attendee requests are needed for them.
+    """
     all_orders = []
     page = 1
+    continuation = None
     has_more_items = True
     
     headers = {
@@ -97,11 +114,15 @@ def fetch_eventbrite_orders(changed_since):
         url = f"https://www.eventbriteapi.com/v3/organizations/{config.EVENTBRITE_ORGANIZATION_ID}/orders"
         params = {
             'changed_since': changed_since,
-            'page': page
+            'expand': 'attendees'
         }
+        if continuation:
+            params['continuation'] = continuation
+        else:
+            params['page'] = page
         
         logger.info(f"Fetching page {page}")
-        response = requests.get(url, headers=headers, params=params)
+        response = get_http_client().get(url, headers=headers, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -114,6 +135,7 @@ def fetch_eventbrite_orders(changed_since):
             # Check if there are more pages
             has_more_items = pagination.get('has_more_items', False)
             if has_more_items:
+                continuation = pagination.get('continuation')
                 page += 1
             else:
                 logger.info("No more pages to fetch")
@@ -125,6 +147,20 @@ def fetch_eventbrite_orders(changed_since):
     logger.info(f"Successfully fetched {len(all_orders)} total orders across {page} pages")
     return {"orders": all_orders}
 
+def fetch_order(api_url):
+    """Fetch one order (with its attendees expanded) from its API URL, e.g. a webhook's api_url"""
+    headers = {
+        'Authorization': f'Bearer {config.EVENTBRITE_PRIVATE_TOKEN}'
+    }
+    
+    response = get_http_client().get(api_url, headers=headers, params={'expand': 'attendees'})
+    
+    if response.status_code == 200:
+        return response.json()
+    else:
+        logger.error(f"Failed to fetch order {api_url}. Status code: {response.status_code}")
+        return None
+
 def fetch_event_details(event_id):
     """Fetch event details from Eventbrite API"""
     url = f"https://www.eventbriteapi.com/v3/events/{event_id}"
@@ -132,7 +168,7 @@ def fetch_event_details(event_id):
         'Authorization': f'Bearer {config.EVENTBRITE_PRIVATE_TOKEN}'
     }
     
-    response = requests.get(url, headers=headers)
+    response = get_http_client().get(url, headers=headers)
     
     if response.status_code == 200:
         return response.json()
@@ -141,19 +177,38 @@ def fetch_event_details(event_id):
         return None
 
 def fetch_event_attendees(event_id):
-    """Fetch attendees for an event from Eventbrite API"""
+    """Fetch all attendees for an event from Eventbrite API, following pagination"""
     url = f"https://www.eventbriteapi.com/v3/events/{event_id}/attendees/"
     headers = {
         'Authorization': f'Bearer {config.EVENTBRITE_PRIVATE_TOKEN}'
     }
     
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code == 200:
-        return response.json()
-    else:
-        logger.error(f"Failed to fetch attendees for event {event_id}. Status code: {response.status_code}")
-        return None
+    attendees = []
+    params = {}
+    while True:
+        response = get_http_client().get(url, headers=headers, params=params)
+        
+        if response.status_code != 200:
+            logger.error(f"Failed to fetch attendees for event {event_id}. Status code: {response.status_code}")
+            return None
+        
+        data = response.json()
+        attendees.extend(data.get('attendees', []))
+        pagination = data.get('pagination', {})
+        if not pagination.get('has_more_items') or not pagination.get('continuation'):
+            break
+        params = {'continuation': pagination['continuation']}
+    
+    logger.debug(f"Fetched {len(attendees)} attendees for event {event_id}")
+    return {"attendees": attendees}
+
+def index_attendees_by_order(attendees_data):
+    """Group an event's attendees by order_id, so each order's lookup is O(1)"""
+    by_order = {}
+    if attendees_data:
+        for attendee in attendees_data.get('attendees', []):
+            by_order.setdefault(attendee.get('order_id'), []).append(attendee)
+    return by_order
 
 def format_date(date_string):
     """Convert datetime string to formatted date (e.g., 'Wednesday July 30th')"""
@@ -170,14 +225,15 @@ def format_date(date_string):
     except ValueError:
         return "Invalid date format"
 
-def extract_guest_data_from_order(order, event_details, attendees_data):
+def extract_guest_data_from_order(order, event_details, attendees_data, attendees_by_order=None):
     """
     Extract guest data from an Eventbrite order with all enhanced fields
     
-    :param order: Single order object from Eventbrite API
+    :param order: Single order object from Eventbrite API (attendees used directly if expanded)
     :param event_details: Event details from Eventbrite API
     :param attendees_data: Attendees data from Eventbrite API
-    :return: Guest dictionary with enhanced fields
+    :param attendees_by_order: Optional index from index_attendees_by_order(attendees_data)
+    :return: GuestRecord with enhanced fields
     """
     order_id = order.get('id', '')
     event_id = order.get('event_id', '')
@@ -205,16 +261,21 @@ def extract_guest_data_from_order(order, event_details, attendees_data):
     total_tickets = 0
     attendee_info = []
     
-    if attendees_data:
-        for attendee in attendees_data.get('attendees', []):
-            if attendee.get('order_id') == order_id:
-                ticket_class = attendee.get('ticket_class_name', 'General Admission')
-                total_tickets += attendee.get('quantity', 1)
-                attendee_info.append({
-                    'barcode': attendee.get('barcodes', [{}])[0].get('barcode', ''),
-                    'status': attendee.get('status', ''),
-                    'checked_in': attendee.get('checked_in', False)
-                })
+    if order.get('attendees') is not None:
+        order_attendees = order['attendees']
+    elif attendees_by_order is not None:
+        order_attendees = attendees_by_order.get(order_id, [])
+    else:
+        order_attendees = index_attendees_by_order(attendees_data).get(order_id, [])
+    
+    for attendee in order_attendees:
+        ticket_class = attendee.get('ticket_class_name', 'General Admission')
+        total_tickets += attendee.get('quantity', 1)
+        attendee_info.append({
+            'barcode': (attendee.get('barcodes') or [{}])[0].get('barcode', ''),
+            'status': attendee.get('status', ''),
+            'checked_in': attendee.get('checked_in', False)
+        })
     
     # Handle special ticket types (e.g., pairs)
     if "pair" in ticket_class.lower():
@@ -237,32 +298,81 @@ def extract_guest_data_from_order(order, event_details, attendees_data):
     # Create entry code from first barcode (for consistency with Squarespace)
     entry_code = attendee_info[0].get('barcode', '') if attendee_info else None
     
-    # Create guest dictionary with enhanced fields
-    guest = {
-        "venue": venue_name,
-        "show_date": f"{event_date} {event_time}",
-        "email": email,
-        "source": "Eventbrite",
-        "first_name": first_name,
-        "last_name": last_name,
-        "tickets": total_tickets,
-        "ticket_type": ticket_class,
-        "phone": "",  # Eventbrite doesn't typically provide phone in order data
+    # Create guest record with enhanced fields
+    guest = GuestRecord(
+        venue=venue_name,
+        show_date=f"{event_date} {event_time}",
+        email=email,
+        source="Eventbrite",
+        first_name=first_name,
+        last_name=last_name,
+        tickets=total_tickets,
+        ticket_type=ticket_class,
+        phone="",  # Eventbrite doesn't typically provide phone in order data
         
         # Enhanced Eventbrite-specific fields (consistent with Squarespace)
-        "discount_code": discount_code,
-        "total_price": float(gross_total) if gross_total else None,
-        "order_id": order_id,
-        "transaction_id": order.get('resource_uri', '').split('/')[-2] if order.get('resource_uri') else order_id,
-        "customer_id": email,  # Using email as customer ID
-        "payment_method": "Eventbrite",
-        "entry_code": entry_code,
-        "notes": f"Base: ${base_price}, EB Fee: ${eventbrite_fee}, Payment Fee: ${payment_fee}, Status: {order.get('status', '')}"
-    }
+        discount_code=discount_code,
+        total_price=float(gross_total) if gross_total else None,
+        order_id=order_id,
+        transaction_id=order.get('resource_uri', '').split('/')[-2] if order.get('resource_uri') else order_id,
+        customer_id=email,  # Using email as customer ID
+        payment_method="Eventbrite",
+        entry_code=entry_code,
+        notes=f"Base: ${base_price}, EB Fee: ${eventbrite_fee}, Payment Fee: ${payment_fee}, Status: {order.get('status', '')}"
+    )
     
     logger.debug(f"Processed Eventbrite guest: {first_name} {last_name} for {venue_name} - {total_tickets} tickets")
     return guest
 
+def extract_guests_from_orders(orders, cache):
+    """
+    Guest records for orders, looking events and attendees up through cache
+    (an EventbriteCache; lookups for all the orders' events run in parallel first).
+
+    :return: (guests, ids of the orders that could not be processed)
+    """
+    cache.prefetch(orders, fan_out)
+    attendee_indexes = {}
+    guests = []
+    failed_order_ids = []
+    
+    # Process each order
+    for order in orders:
+        order_id = order.get('id', 'unknown')
+        try:
+            event_id = order.get('event_id', '')
+            
+            logger.debug(f"Processing order {order_id} for event {event_id}")
+            
+            # Fetch event details
+            event_details = cache.event_details(event_id)
+            if not event_details:
+                logger.warning(f"Skipping order {order_id} - could not fetch event details")
+                failed_order_ids.append(order_id)
+                continue
+            
+            # Orders normally arrive with attendees expanded; otherwise use the event's attendee list
+            attendees_data = attendees_by_order = None
+            if order.get('attendees') is None:
+                attendees_data = cache.event_attendees(event_id, event_details, order)
+                if not attendees_data:
+                    logger.warning(f"Could not fetch attendees for order {order_id}")
+                # Index each attendee list once (the cache may hand back a refreshed list for a newer order)
+                indexed_data, attendees_by_order = attendee_indexes.get(event_id, (None, None))
+                if indexed_data is not attendees_data:
+                    attendees_by_order = index_attendees_by_order(attendees_data)
+                    attendee_indexes[event_id] = (attendees_data, attendees_by_order)
+            
+            # Extract guest data
+            guests.append(extract_guest_data_from_order(order, event_details, attendees_data, attendees_by_order))
+            
+        except Exception as e:
+            logger.error(f"Error processing order {order_id}: {e}")
+            failed_order_ids.append(order_id)
+            continue
+    
+    return guests, failed_order_ids
+
 def process_eventbrite_orders():
     """Main function to process Eventbrite orders"""
     # Check for help flag first
@@ -277,99 +387,61 @@ def process_eventbrite_orders():
     
     logger.info("Starting Eventbrite order processing")
     
-    # Get time interval and fetch orders
-    interval = get_time_interval()
-    changed_since = calculate_time_range(interval)
+    # Fetch orders changed since the last successful sync
+    sync_state = SyncState("eventbrite")
+    run_started = datetime.utcnow()
+    window_start, changed_since = calculate_time_range(sync_state, run_started)
     
     # Fetch orders from Eventbrite
     data = fetch_eventbrite_orders(changed_since)
     
-    if not data or not data.get("orders"):
-        logger.info("No orders found or API request failed")
+    if data is None:
+        logger.info("API request failed - sync mark left unchanged")
+        return
+    if not data.get("orders"):
+        logger.info("No orders found")
+        if not mongo_only:
+            sync_state.advance(run_started, window_start)
         return
     
     orders = data["orders"]
-    all_guests = []
     
-    # Process each order
-    for order in orders:
-        try:
-            order_id = order.get('id', 'unknown')
-            event_id = order.get('event_id', '')
-            
-            logger.debug(f"Processing order {order_id} for event {event_id}")
-            
-            # Fetch event details
-            event_details = fetch_event_details(event_id)
-            if not event_details:
-                logger.warning(f"Skipping order {order_id} - could not fetch event details")
-                continue
-            
-            # Fetch attendees
-            attendees_data = fetch_event_attendees(event_id)
-            if not attendees_data:
-                logger.warning(f"Could not fetch attendees for order {order_id}")
-            
-            # Extract guest data
-            guest = extract_guest_data_from_order(order, event_details, attendees_data)
-            all_guests.append(guest)
-            
-        except Exception as e:
-            logger.error(f"Error processing order {order.get('id', 'unknown')}: {e}")
-            continue
+    # Event details and attendees are fetched once per event, not once per order
+    cache = EventbriteCache(fetch_event_details, fetch_event_attendees)
+    all_guests, failed_order_ids = extract_guests_from_orders(orders, cache)
+    failed_orders = len(failed_order_ids)
+    
+    cache.save()
+    logger.info(f"Eventbrite lookups for {len(orders)} orders: {cache.stats}")
     
     if all_guests:
         logger.info(f"Processing {len(all_guests)} guests total from Eventbrite")
         
         if mongo_only:
-            # Convert guest dictionaries to the array format expected by MongoDB
+            # Group guests by show for the MongoDB batch
             batch_data = {}
             
             for guest in all_guests:
-                venue = guest.get('venue', '')
-                show_date = guest.get('show_date', '')
-                
-                # Create a show key (venue + date for grouping)
-                show_key = f"{venue} - {show_date}"
-                
-                if show_key not in batch_data:
-                    batch_data[show_key] = []
-                
-                # Convert to array format that MongoDB function expects
-                # Array structure: [venue, date, email, source, time, type, firstname, lastname, tickets, phone, ...]
-                guest_array = [
-                    venue,
-                    show_date,
-                    guest.get('email', ''),
-                    guest.get('source', ''),
-                    guest.get('show_time', ''),  # Use show_time directly from guest dict
-                    guest.get('ticket_type', 'GA'),
-                    guest.get('first_name', ''),
-                    guest.get('last_name', ''),
-                    guest.get('tickets', 1),
-                    guest.get('phone', ''),
-                    # Enhanced fields as additional array elements
-                    guest.get('discount_code'),
-                    guest.get('total_price'),
-                    guest.get('order_id'),
-                    guest.get('transaction_id'),
-                    guest.get('customer_id'),
-                    guest.get('payment_method'),
-                    guest.get('entry_code'),
-                    guest.get('notes')
-                ]
-                
-                batch_data[show_key].append(guest_array)
+                batch_data.setdefault(guest.show_key, []).append(guest)
             
-            # Save directly to MongoDB
+            # Save directly to MongoDB; Sheets did not get these orders, so the sync mark stays put
             batch_add_contacts_to_mongodb(batch_data)
             logger.info("Successfully saved data to MongoDB only")
-        else:
-            # Use the normal process with Google Sheets
-            insert_guest_data_efficient(all_guests)
-            logger.info("Successfully processed all Eventbrite orders")
+            return
+        
+        # Use the normal process with Google Sheets
+        committed = insert_guest_data_efficient(all_guests)
+        if not committed:
+            logger.error("Some Eventbrite guests were not written - sync mark left unchanged")
+            return
+        logger.info("Successfully processed all Eventbrite orders")
     else:
         logger.info("No guests to process")
+    
+    if failed_orders:
+        logger.error(f"{failed_orders} orders could not be processed - sync mark left unchanged")
+    elif not mongo_only:
+        sync_state.advance(run_started, window_start)
 
 if __name__ == "__main__":
     print(f"Eventbrite Orders Sync - {datetime.now().isoformat()}")
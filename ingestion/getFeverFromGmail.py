@@ -1,21 +1,25 @@
 import json
 import logging
 import os
-import time
 import sys
 import re
 import pickle
 from datetime import datetime, timedelta
-from googleapiclient.discovery import build
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
+from googleApiLimiter import build_service
 from googleapiclient.errors import HttpError
 from bs4 import BeautifulSoup
 from base64 import urlsafe_b64decode
-from pymongo import MongoClient
-from insertIntoGoogleSheet import insert_data_into_google_sheet
-from addContactsToMongoDB import batch_add_contacts_to_mongodb
+from shared_config import get_mongo_client
+from insertIntoGoogleSheet import SheetsSession
+from addContactsToMongoDB import batch_add_contacts_to_mongodb, _bulk_upsert_contacts
+from mongoIndexes import ensure_contact_indexes
+from showRollups import add_contact_delta, apply_rollup_deltas
+from peopleIndex import add_person_ref, apply_people_refs
 from getVenueAndDate import get_venue, convert_date_from_any_format, format_time
+from guestRecord import GuestRecord
+from syncState import SyncState, epoch_seconds, from_epoch_millis
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -91,9 +95,13 @@ DESCRIPTION:
                     Uses upsert operations to fix existing data (e.g., email fields)
                     without creating duplicates. Safe to run multiple times.
     
-    --days=N: Process emails from last N days instead of default interval.
+    --days=N: Process emails from last N days instead of since the last successful sync.
              For beginning of 2025, use --days=215 (as of August 1, 2025).
 
+    Without --days, emails are fetched from the stored sync mark (less a few
+    minutes of overlap); the first run falls back to the configured interval.
+    The mark only advances once a run's reservations are in MongoDB and Sheets.
+
 NOTES:
     - Uses upsert operations to prevent duplicates and fix existing records
     - Customer emails are empty (Fever doesn't provide customer email addresses)
@@ -123,7 +131,7 @@ def check_debug_only_flag():
 def batch_add_contacts_to_mongodb(batch_data):
     """
     Add contacts to MongoDB in batch format compatible with mongo-only mode.
-    batch_data format: {"venue - date": [guest_arrays]}
+    batch_data format: {"venue - date": [GuestRecords]}
     """
     try:
         from addContactsToMongoDB import batch_add_contacts_to_mongodb as mongo_batch_add
@@ -151,7 +159,7 @@ def is_processed_email(message_id, force_refresh=False):
         return False
     
     try:
-        client = MongoClient(MONGO_URI)
+        client = get_mongo_client(MONGO_URI)
         db = client[MONGO_DB]
         collection = db[MONGO_COLLECTION]
         exists = collection.find_one({"messageId": message_id})
@@ -159,9 +167,6 @@ def is_processed_email(message_id, force_refresh=False):
     except Exception as e:
         logger.error(f"Error checking message ID: {str(e)}")
         return False
-    finally:
-        if 'client' in locals():
-            client.close()
 
 def mark_email_processed(message_data, force_refresh=False):
     """Mark email as processed in MongoDB using upsert to avoid duplicates."""
@@ -169,7 +174,7 @@ def mark_email_processed(message_data, force_refresh=False):
         return
         
     try:
-        client = MongoClient(MONGO_URI)
+        client = get_mongo_client(MONGO_URI)
         db = client[MONGO_DB]
         collection = db[MONGO_COLLECTION]
         
@@ -181,9 +186,6 @@ def mark_email_processed(message_data, force_refresh=False):
             logger.debug(f"Upserted email record for message {message_data['messageId']}")
     except Exception as e:
         logger.error(f"Error marking email as processed: {str(e)}")
-    finally:
-        if 'client' in locals():
-            client.close()
 
 def verify_guest_in_contacts_db(transaction_id):
     """Verify if a guest with the given transaction_id exists in the contacts database."""
@@ -191,7 +193,7 @@ def verify_guest_in_contacts_db(transaction_id):
         return False
     
     try:
-        client = MongoClient(MONGO_URI)
+        client = get_mongo_client(MONGO_URI)
         db = client["guest_list_contacts"]
         collection = db["contacts"]
         exists = collection.find_one({"transaction_id": transaction_id})
@@ -199,9 +201,6 @@ def verify_guest_in_contacts_db(transaction_id):
     except Exception as e:
         logger.error(f"Error verifying guest in contacts DB: {str(e)}")
         return False
-    finally:
-        if 'client' in locals():
-            client.close()
 
 def batch_add_contacts_to_mongodb_upsert(batch_data, force_refresh=False):
     """
@@ -222,62 +221,35 @@ def batch_add_contacts_to_mongodb_upsert(batch_data, force_refresh=False):
             return
             
         # Use upsert logic for force refresh
-        client = MongoClient(MONGO_URI)
+        client = get_mongo_client(MONGO_URI)
         db = client["guest_list_contacts"]
         collection = db["contacts"]
         
-        upsert_count = 0
+        contact_docs = []
         for show_name, contact_list in batch_data.items():
             for contact in contact_list:
-                if len(contact) >= 9:  # Ensure we have required fields
-                    # Create unique identifier for upsert
-                    query = {
-                        "venue": contact[0],
-                        "show_date": contact[1], 
-                        "source": contact[3],
-                        "first_name": contact[6],
-                        "last_name": contact[7]
-                    }
-                    
-                    # Create document to upsert
-                    contact_doc = {
-                        "venue": contact[0],
-                        "show_date": contact[1],
-                        "email": contact[2],  # Now empty string for Fever
-                        "source": contact[3],
-                        "show_time": contact[4],
-                        "ticket_type": contact[5],
-                        "first_name": contact[6],
-                        "last_name": contact[7],
-                        "tickets": contact[8],
-                        "phone": contact[9] if len(contact) > 9 else "",
-                        # Enhanced fields
-                        "discount_code": contact[10] if len(contact) > 10 else None,
-                        "total_price": contact[11] if len(contact) > 11 else None,
-                        "order_id": contact[12] if len(contact) > 12 else None,
-                        "transaction_id": contact[13] if len(contact) > 13 else None,
-                        "customer_id": contact[14] if len(contact) > 14 else None,
-                        "payment_method": contact[15] if len(contact) > 15 else None,
-                        "entry_code": contact[16] if len(contact) > 16 else None,
-                        "notes": contact[17] if len(contact) > 17 else None,
-                        "timestamp": datetime.utcnow(),
-                        "updated_timestamp": datetime.utcnow()
-                    }
-                    
-                    # Perform upsert
-                    result = collection.replace_one(query, contact_doc, upsert=True)
-                    if result.upserted_id or result.modified_count > 0:
-                        upsert_count += 1
+                record = GuestRecord.coerce(contact)
+                if record is not None:  # Ensure we have required fields
+                    contact_docs.append(record.to_mongo_doc(show_name))
+        
+        # Same bulk upsert as the normal path, so show rollups and the people index stay current
+        rollup_deltas = {}
+        people_refs = {}
+        def on_written(stored_doc, previous_doc):
+            add_contact_delta(rollup_deltas, stored_doc, previous_doc)
+            add_person_ref(people_refs, stored_doc, collection.name)
+        
+        ensure_contact_indexes(collection)
+        counts = _bulk_upsert_contacts(collection, contact_docs, on_written)
+        apply_rollup_deltas(db, rollup_deltas)
+        apply_people_refs(db, people_refs)
         
-        logger.info(f"Upserted {upsert_count} contact records in MongoDB")
+        logger.info(f"Upserted contact records in MongoDB: {counts}")
         
     except ImportError as e:
         logger.error(f"Failed to import addContactsToMongoDB: {e}")
     except Exception as e:
         logger.error(f"Error in upsert batch MongoDB operation: {e}")
-    finally:
-        if 'client' in locals():
-            client.close()
 
 def store_fever_transaction(transaction_data, force_refresh=False):
     """Store transaction data for tracking using upsert to avoid duplicates."""
@@ -285,7 +257,7 @@ def store_fever_transaction(transaction_data, force_refresh=False):
         return
         
     try:
-        client = MongoClient(MONGO_URI)
+        client = get_mongo_client(MONGO_URI)
         db = client[MONGO_DB]
         collection = db[MONGO_SALES_COLLECTION]
         
@@ -302,9 +274,6 @@ def store_fever_transaction(transaction_data, force_refresh=False):
             logger.debug(f"Upserted transaction record for reservation {transaction_data['reservationNumber']}")
     except Exception as e:
         logger.error(f"Error storing transaction: {str(e)}")
-    finally:
-        if 'client' in locals():
-            client.close()
 
 def get_email_html(service, user_id, msg_id):
     """Get HTML content from email message."""
@@ -473,24 +442,32 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
         with open(config.GMAIL_TOKEN_PATH, 'wb') as token:
             pickle.dump(creds, token)
 
-    service = build('gmail', 'v1', credentials=creds)
+    service = build_service('gmail', 'v1', creds)
 
-    # Calculate time range for search
+    # Calculate time range for search: from the last successful sync unless days are given
+    sync_state = SyncState("fever")
+    window_start = None if days else sync_state.fetch_from()
     if days:
         # Use specified days
-        days_ago = int(time.time()) - (days * 24 * 60 * 60)
-        search_query = f"after:{days_ago} subject:'New reservation with Fever'"
+        window_start = datetime.utcnow() - timedelta(days=days)
         logger.info(f"Searching emails from last {days} days")
+    elif window_start:
+        logger.info(f"Searching emails since the last successful sync ({sync_state.mark()} UTC)")
     else:
-        # Use default interval from config
-        current_time_epoch = int(time.time())
-        last_run = current_time_epoch - (config.GMAIL_SCRIPT_INTERVAL_MINUTES_FEVER * 60)
-        search_query = f"after:{last_run} subject:'New reservation with Fever'"
+        # First run: use default interval from config
+        window_start = datetime.utcnow() - timedelta(minutes=config.GMAIL_SCRIPT_INTERVAL_MINUTES_FEVER)
         logger.info(f"Searching emails from last {config.GMAIL_SCRIPT_INTERVAL_MINUTES_FEVER} minutes")
+    search_query = f"after:{epoch_seconds(window_start)} subject:'New reservation with Fever'"
 
     try:
-        result = service.users().messages().list(userId='me', q=search_query).execute()
-        messages = result.get('messages', [])
+        messages = []
+        page_token = None
+        while True:
+            result = service.users().messages().list(userId='me', q=search_query, pageToken=page_token).execute()
+            messages.extend(result.get('messages', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                break
     except Exception as e:
         logger.error(f"Error fetching messages: {e}")
         return
@@ -505,6 +482,8 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
     processed_emails = []  # Track successfully processed emails for later marking
     total_processed = 0
     total_skipped = 0
+    failed_messages = 0
+    high_water = None      # newest internalDate among the messages read
 
     for msg in messages:
         try:
@@ -518,6 +497,9 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
 
             # Fetch the full message for subject extraction
             full_message = service.users().messages().get(userId='me', id=msg_id).execute()
+            if full_message.get('internalDate'):
+                received = from_epoch_millis(full_message['internalDate'])
+                high_water = max(high_water, received) if high_water else received
             headers = full_message['payload']['headers']
             subject = next((header['value'] for header in headers if header['name'] == 'Subject'), "Subject not found")
 
@@ -543,41 +525,39 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
 
             logger.info(f"Processing: {first_name} {last_name} - {venue} on {show_date_with_time} - {number_of_tickets} tickets")
 
-            # Create 18-field guest data array matching Bucketlist structure
-            guest_array = [
-                venue,                              # 0: venue
-                show_date_with_time,               # 1: show_date_with_time
-                customer_email,                    # 2: email
-                "Fever",                           # 3: source
-                show_time,                         # 4: show_time
-                "GA",                              # 5: ticket_type (General Admission default)
-                first_name,                        # 6: first_name
-                last_name,                         # 7: last_name
-                number_of_tickets,                 # 8: quantity
-                "",                                # 9: phone (not available from Fever)
-                None,                              # 10: discount_code
-                price,                             # 11: total_price
-                None,                              # 12: order_id
-                msg_id,                            # 13: transaction_id (using message ID)
-                customer_email,                    # 14: customer_id
-                "Fever",                           # 15: payment_method
-                msg_id,                            # 16: entry_code (using message ID)
-                f"Fever reservation - {subject}"   # 17: notes
-            ]
+            # Create guest record matching Bucketlist structure
+            guest_record = GuestRecord(
+                venue=venue,
+                show_date=show_date_with_time,
+                email=customer_email,
+                source="Fever",
+                show_time=show_time,
+                ticket_type="GA",                  # General Admission default
+                first_name=first_name,
+                last_name=last_name,
+                tickets=number_of_tickets,
+                phone="",                          # Not available from Fever
+                total_price=price,
+                transaction_id=msg_id,             # Using message ID
+                customer_id=customer_email,
+                payment_method="Fever",
+                entry_code=msg_id,                 # Using message ID
+                notes=f"Fever reservation - {subject}"
+            )
 
             # Add to batch data
             if mongo_only:
-                show_key = f"{venue} - {show_date_with_time}"
+                show_key = guest_record.show_key
                 if show_key not in batch_data:
                     batch_data[show_key] = []
-                batch_data[show_key].append(guest_array)
+                batch_data[show_key].append(guest_record)
             else:
                 # Original structure for Google Sheets
                 if venue not in batch_data:
                     batch_data[venue] = {}
                 if show_date_with_time not in batch_data[venue]:
                     batch_data[venue][show_date_with_time] = []
-                batch_data[venue][show_date_with_time].append(guest_array)
+                batch_data[venue][show_date_with_time].append(guest_record)
 
             # Store email data for later processing verification
             processed_emails.append({
@@ -608,9 +588,11 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
 
         except Exception as e:
             logger.error(f"Error processing message {msg.get('id', 'unknown')}: {e}")
+            failed_messages += 1
             continue
 
     # Process batch data
+    committed = not failed_messages and not debug_only and not mongo_only
     if batch_data:
         logger.info(f"Processing {total_processed} guests from {len(batch_data)} shows")
         
@@ -641,20 +623,31 @@ def getEmails(days=None, mongo_only=False, force_refresh=False, debug_only=False
                     logger.warning(f"Guest data not found in contacts DB for email {email_data['messageId']}, email will remain unprocessed")
         else:
             # Use original Google Sheets process
-            for venue in batch_data:
-                for date in batch_data[venue]:
-                    insert_data_into_google_sheet({venue: batch_data[venue][date]})
-            logger.info("Successfully processed all Fever reservations")
+            with SheetsSession() as session:
+                for venue in batch_data:
+                    session.add_shows(batch_data[venue])
+            committed = committed and session.committed
             
-            # For Google Sheets mode, mark all emails as processed (original behavior)
-            for email_data in processed_emails:
-                mark_email_processed(email_data, force_refresh)
+            # Only mark emails as processed once MongoDB and Sheets both took every write,
+            # otherwise the next run would skip them as duplicates
+            if session.committed:
+                logger.info("Successfully processed all Fever reservations")
+                for email_data in processed_emails:
+                    mark_email_processed(email_data, force_refresh)
+            else:
+                logger.error("Some Fever reservations were not written - emails left unprocessed for the next run")
     else:
         logger.info("No new Fever reservations to process")
 
     if total_skipped > 0:
         logger.info(f"Skipped {total_skipped} already processed emails")
 
+    # Move the sync mark only once every message made it into both MongoDB and Sheets
+    if committed and high_water:
+        sync_state.advance(high_water, window_start)
+    elif high_water and not (debug_only or mongo_only):
+        logger.error("Some Fever reservations were not written - sync mark left unchanged")
+
 def main():
     """Main entry point with command line argument handling."""
     # Check for help flag first
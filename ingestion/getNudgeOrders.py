@@ -6,13 +6,15 @@ import requests
 import csv
 import logging
 import os
+import re
 import sys
 from io import StringIO
 from datetime import datetime
-from pymongo import MongoClient
 from insertIntoGoogleSheet import insert_guest_data_efficient
 from getVenueAndDate import get_venue, format_time
-from shared_config import get_mongo_config
+from shared_config import get_mongo_config, get_mongo_client
+from guestRecord import GuestRecord
+from mongoIndexes import ensure_contact_indexes
 
 # Ensure we're running from the correct directory
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -32,6 +34,9 @@ logger = logging.getLogger(__name__)
 
 PARTNER_ID = 15
 
+# Ticket codes looked up per $in query during deduplication
+DEDUP_CHUNK_SIZE = 500
+
 def load_cookie():
     """Read Nudge session cookie from file"""
     try:
@@ -41,30 +46,47 @@ def load_cookie():
         logger.error("Cookie file not found: secrets/nudge-session-cookie.txt")
         return None
 
-def get_existing_order_ids():
-    """Fetch existing order_id values from Nudge collection for deduplication"""
+def get_existing_order_ids(ticket_codes):
+    """
+    Return which of ticket_codes are already stored in the Nudge collection.
+    Single-ticket guests are matched exactly with $in (one order_id index
+    lookup per code, chunked), so that part grows with the report, not history.
+
+    Multi-ticket guests are stored with comma-separated order_ids ("a, b"), which
+    exact matches cannot find. Those are fetched by one unanchored regex, which
+    gets no index bounds and scans every order_id key in the collection once per
+    run, but returns only the grouped documents, which are then split.
+    """
     mongo_config = get_mongo_config()
     if not mongo_config:
         logger.warning("No MongoDB config - skipping deduplication")
         return set()
     
+    ticket_codes = sorted({code for code in ticket_codes if code})
+    if not ticket_codes:
+        return set()
+    
     try:
-        client = MongoClient(mongo_config["mongo_uri"])
+        client = get_mongo_client(mongo_config["mongo_uri"])
         db = client["guest_list_contacts"]
         collection = db["Nudge"]
+        ensure_contact_indexes(collection)
+        
+        order_ids = set()
+        for start in range(0, len(ticket_codes), DEDUP_CHUNK_SIZE):
+            chunk = ticket_codes[start:start + DEDUP_CHUNK_SIZE]
+            for doc in collection.find({"order_id": {"$in": chunk}}, {"order_id": 1, "_id": 0}):
+                order_ids.add(doc["order_id"])
         
-        # Get all order_id values
-        existing = collection.find({}, {"order_id": 1})
-        order_ids = {doc["order_id"] for doc in existing if "order_id" in doc}
+        for doc in collection.find({"order_id": re.compile(", ")}, {"order_id": 1, "_id": 0}):
+            order_ids.update(code.strip() for code in doc["order_id"].split(","))
         
-        logger.info(f"Found {len(order_ids)} existing Nudge orders in MongoDB")
-        return order_ids
+        existing = order_ids.intersection(ticket_codes)
+        logger.info(f"Found {len(existing)} of {len(ticket_codes)} reported Nudge tickets already in MongoDB")
+        return existing
     except Exception as e:
         logger.error(f"Error fetching existing orders: {e}")
         return set()
-    finally:
-        if 'client' in locals():
-            client.close()
 
 def fetch_ticket_uuids(session, include_historical=False):
     """Get all ticket UUIDs from Nudge API with event metadata"""
@@ -221,20 +243,20 @@ def transform_purchases(purchases, existing_order_ids, venue_filter=None):
         except (ValueError, AttributeError):
             total_price = 0.0
         
-        guest = {
-            'venue': venue,
-            'show_date': show_date_str,
-            'email': purchase['Email'],
-            'source': 'Nudge',
-            'first_name': purchase['First Name'],
-            'last_name': purchase['Last Name'],
-            'tickets': 1,
-            'ticket_type': purchase.get('Tag', ''),
-            'phone': purchase['Phone Number'],
-            'total_price': total_price,
-            'order_id': ticket_code,
-            'notes': f"Promo: {purchase['Promo Code']}" if purchase.get('Promo Code') else None
-        }
+        guest = GuestRecord(
+            venue=venue,
+            show_date=show_date_str,
+            email=purchase['Email'],
+            source='Nudge',
+            first_name=purchase['First Name'],
+            last_name=purchase['Last Name'],
+            tickets=1,
+            ticket_type=purchase.get('Tag', ''),
+            phone=purchase['Phone Number'],
+            total_price=total_price,
+            order_id=ticket_code,
+            notes=f"Promo: {purchase['Promo Code']}" if purchase.get('Promo Code') else None
+        )
         
         guest_data.append(guest)
         logger.debug(f"Inserted: {ticket_code} - {venue} - {show_date_str}")
@@ -243,15 +265,15 @@ def transform_purchases(purchases, existing_order_ids, venue_filter=None):
     from collections import defaultdict
     aggregated = {}
     for guest in guest_data:
-        key = (guest['email'], guest['show_date'], guest['venue'])
+        key = (guest.email, guest.show_date, guest.venue)
         
         if key not in aggregated:
             aggregated[key] = guest.copy()
         else:
             # Same person, same show - combine tickets
-            aggregated[key]['tickets'] += guest['tickets']
+            aggregated[key].tickets += guest.tickets
             # Keep comma-separated order_ids
-            aggregated[key]['order_id'] += f", {guest['order_id']}"
+            aggregated[key].order_id += f", {guest.order_id}"
     
     guest_data = list(aggregated.values())
     logger.info(f"Summary: {len(guest_data)} unique guests (aggregated from {len(guest_data) + duplicates} total), {duplicates} duplicates skipped")
@@ -293,7 +315,7 @@ def main():
         return
     
     # Get existing orders for deduplication
-    existing_order_ids = get_existing_order_ids()
+    existing_order_ids = get_existing_order_ids(purchase.get('Ticket Code') for purchase in purchases)
     
     # Transform and filter
     guest_data = transform_purchases(purchases, existing_order_ids, venue_filter)
@@ -306,7 +328,7 @@ def main():
     if debug_only:
         logger.info(f"DEBUG: Would insert {len(guest_data)} guests")
         for guest in guest_data[:5]:
-            logger.info(f"  {guest['first_name']} {guest['last_name']} - {guest['email']}")
+            logger.info(f"  {guest.first_name} {guest.last_name} - {guest.email}")
         return
     
     # Insert into MongoDB (and Google Sheets unless mongo_only)
@@ -1,9 +1,12 @@
 import json
-import requests
 import logging
 from datetime import datetime, timedelta
 from insertIntoGoogleSheet import insert_guest_data_efficient
+from addContactsToMongoDB import save_comprehensive_data_to_mongodb
 from getVenueAndDate import get_venue, extract_venue_name, extract_date, extract_time, get_venue_filter, filter_guests_by_venue
+from guestRecord import GuestRecord
+from httpClient import get_http_client
+from syncState import SyncState
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -35,13 +38,27 @@ def check_debug_only_flag():
     """Check if --debug-only flag is present in command line arguments"""
     return '--debug-only' in sys.argv
 
-def calculate_time_range(interval_minutes):
-    """Calculate the time range for API request"""
-    current_time = datetime.utcnow().isoformat()[:-6] + "Z"
-    last_run = (datetime.utcnow() - timedelta(minutes=interval_minutes)).isoformat()[:-6] + "Z"
+def has_interval_argument():
+    """True if a look-back interval was given on the command line"""
+    return len(sys.argv) > 1 and sys.argv[1].isdigit()
+
+def calculate_time_range(sync_state, current_date):
+    """
+    Calculate the time range for API request: from the stored sync mark, or the
+    look-back interval when one is given on the command line or there is no mark yet
+    
+    :return: (window start datetime, modifiedAfter, modifiedBefore)
+    """
+    window_start = None if has_interval_argument() else sync_state.fetch_from()
+    if window_start is None:
+        window_start = current_date - timedelta(minutes=get_time_interval())
+    else:
+        logger.info(f"Resuming from the last successful sync at {sync_state.mark()} UTC")
+    last_run = window_start.strftime("%Y-%m-%dT%H:%M:%SZ")
+    current_time = current_date.strftime("%Y-%m-%dT%H:%M:%SZ")
     
     logger.info(f"Fetching orders from {last_run} to {current_time}")
-    return last_run, current_time
+    return window_start, last_run, current_time
 
 def fetch_squarespace_orders(last_run, current_time):
     """Fetch orders from Squarespace API with pagination support"""
@@ -71,7 +88,7 @@ def fetch_squarespace_orders(last_run, current_time):
             url = f"https://api.squarespace.com/1.0/commerce/orders?modifiedAfter={last_run}&modifiedBefore={current_time}"
         
         logger.info(f"Fetching page {page_count + 1}" + (f" (cursor: {cursor[:20]}...)" if cursor else " (with date filters)"))
-        response = requests.get(url, headers=headers)
+        response = get_http_client().get(url, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
@@ -125,7 +142,7 @@ def extract_guest_data_from_order(order):
     Extract guest data from a single Squarespace order with all enhanced fields
     
     :param order: Single order object from Squarespace API
-    :return: List of guest dictionaries (one per line item)
+    :return: List of GuestRecords (one per line item)
     """
     guests = []
     
@@ -152,33 +169,33 @@ def extract_guest_data_from_order(order):
         show_date = extract_date(show_name)
         show_time = extract_time(show_name)
         
-        # Create guest dictionary with enhanced fields
-        guest = {
-            "venue": venue_name,
-            "show_date": f"{show_date} {show_time}",
-            "email": customer_email,
-            "source": "Squarespace",
-            "first_name": billing_address.get("firstName", ""),
-            "last_name": billing_address.get("lastName", ""),
-            "tickets": item.get("quantity", 1),
-            "ticket_type": "GA",  # Default, could be enhanced if variant info available
-            "phone": billing_address.get("phone", ""),
+        # Create guest record with enhanced fields
+        guest = GuestRecord(
+            venue=venue_name,
+            show_date=f"{show_date} {show_time}",
+            email=customer_email,
+            source="Squarespace",
+            first_name=billing_address.get("firstName", ""),
+            last_name=billing_address.get("lastName", ""),
+            tickets=item.get("quantity", 1),
+            ticket_type="GA",  # Default, could be enhanced if variant info available
+            phone=billing_address.get("phone", ""),
             
             # Enhanced Squarespace-specific fields
-            "discount_code": ", ".join(discount_codes) if discount_codes else None,
-            "total_price": float(grand_total) if grand_total else None,
-            "order_id": order_number,
-            "transaction_id": order_id,
-            "customer_id": customer_email,  # Using email as customer ID
-            "payment_method": "Squarespace",
-            "entry_code": item.get('sku', '') or f"SS_{order_number}_{item.get('variantId', '')}",  # Create consistent entry code
-            "notes": f"Order created: {created_on}, SKU: {item.get('sku', '')}"
-        }
+            discount_code=", ".join(discount_codes) if discount_codes else None,
+            total_price=float(grand_total) if grand_total else None,
+            order_id=order_number,
+            transaction_id=order_id,
+            customer_id=customer_email,  # Using email as customer ID
+            payment_method="Squarespace",
+            entry_code=item.get('sku', '') or f"SS_{order_number}_{item.get('variantId', '')}",  # Create consistent entry code
+            notes=f"Order created: {created_on}, SKU: {item.get('sku', '')}"
+        )
         
         guests.append(guest)
         
         # Log the processed guest
-        logger.debug(f"Processed guest: {guest['first_name']} {guest['last_name']} for {venue_name}")
+        logger.debug(f"Processed guest: {guest.first_name} {guest.last_name} for {venue_name}")
     
     return guests
 
@@ -191,19 +208,32 @@ def process_squarespace_orders():
     if mongo_only:
         logger.info("Running in MONGO-ONLY mode - skipping Google Sheets integration")
     
-    # Get time interval and calculate range
-    interval = get_time_interval()
-    last_run, current_time = calculate_time_range(interval)
+    # Fetch orders modified since the last successful sync (truncated to whole seconds,
+    # so modifiedBefore is exactly the next run's mark)
+    sync_state = SyncState("squarespace")
+    run_started = datetime.utcnow().replace(microsecond=0)
+    window_start, last_run, current_time = calculate_time_range(sync_state, run_started)
+    
+    # Only a full run that wrote to both sinks may move the sync mark
+    venue_filter = get_venue_filter()
+    debug_only = check_debug_only_flag()
+    advance_mark = not (mongo_only or debug_only or venue_filter)
     
     # Fetch orders from Squarespace
     data = fetch_squarespace_orders(last_run, current_time)
     
-    if not data or not data.get("result"):
-        logger.info("No orders found or API request failed")
+    if data is None:
+        logger.info("API request failed - sync mark left unchanged")
+        return
+    if not data.get("result"):
+        logger.info("No orders found")
+        if advance_mark:
+            sync_state.advance(run_started, window_start)
         return
     
     # Process all orders into guest data
     all_guests = []
+    failed_orders = 0
     
     for order in data["result"]:
         try:
@@ -211,55 +241,59 @@ def process_squarespace_orders():
             all_guests.extend(guests)
         except Exception as e:
             logger.error(f"Error processing order {order.get('orderNumber', 'unknown')}: {e}")
+            failed_orders += 1
             continue
     
     if all_guests:
         logger.info(f"Processing {len(all_guests)} guests total")
         
         # Apply venue filter if specified
-        venue_filter = get_venue_filter()
         if venue_filter:
             all_guests = filter_guests_by_venue(all_guests, venue_filter)
         
         # Check for debug-only mode
-        debug_only = check_debug_only_flag()
-        
         if debug_only:
             logger.info("=== DEBUG-ONLY MODE: Showing guest data without insertion ===")
             for i, guest in enumerate(all_guests, 1):
                 print(f"\n--- Guest {i} ---")
-                print(f"Name: {guest.get('first_name')} {guest.get('last_name')}")
-                print(f"Email: {guest.get('email')}")
-                print(f"Venue: {guest.get('venue')}")
-                print(f"Show Date: {guest.get('show_date')}")
-                print(f"Source: {guest.get('source')}")
-                print(f"Order ID: {guest.get('order_id')}")
-                print(f"Tickets: {guest.get('tickets')}")
-                print(f"Total Price: {guest.get('total_price')}")
-                print(f"Phone: {guest.get('phone')}")
+                print(f"Name: {guest.first_name} {guest.last_name}")
+                print(f"Email: {guest.email}")
+                print(f"Venue: {guest.venue}")
+                print(f"Show Date: {guest.show_date}")
+                print(f"Source: {guest.source}")
+                print(f"Order ID: {guest.order_id}")
+                print(f"Tickets: {guest.tickets}")
+                print(f"Total Price: {guest.total_price}")
+                print(f"Phone: {guest.phone}")
             logger.info("=== END DEBUG DATA ===")
             return
         
         if mongo_only:
             # Only save to MongoDB, skip Google Sheets
-            from insertIntoGoogleSheet import _save_comprehensive_data_to_mongodb
-            _save_comprehensive_data_to_mongodb(all_guests)
+            save_comprehensive_data_to_mongodb(all_guests)
             logger.info("Successfully saved data to MongoDB only")
         else:
             # Use the full efficient insert function (MongoDB + Google Sheets)
             logger.info("=== DEBUG: Using Squarespace dual-path (Sheets + MongoDB) ===")
             logger.info(f"=== DEBUG: About to call insert_guest_data_efficient with {len(all_guests)} guests ===")
-            insert_guest_data_efficient(all_guests)
+            if not insert_guest_data_efficient(all_guests):
+                logger.error("Some Squarespace guests were not written - sync mark left unchanged")
+                return
             logger.info("Successfully processed all Squarespace orders")
     else:
         logger.info("No guests to process")
+    
+    if failed_orders:
+        logger.error(f"{failed_orders} orders could not be processed - sync mark left unchanged")
+    elif advance_mark:
+        sync_state.advance(run_started, window_start)
 
 if __name__ == "__main__":
     print(f"Squarespace Orders Sync - {datetime.utcnow().isoformat()[:-6]}Z")
     if '--help' in sys.argv or '-h' in sys.argv:
         print("\nUsage: python3 getSquarespaceOrders.py [interval_minutes] [--mongo-only] [--debug-only] [--venue VENUE_NAME]")
         print("\nOptions:")
-        print("  interval_minutes  Time interval to fetch orders (default: from config)")
+        print("  interval_minutes  Time interval to fetch orders (default: since the last successful sync)")
         print("  --mongo-only      Save data only to MongoDB, skip Google Sheets")
         print("  --debug-only      Show order data without inserting to database or sheets")
         print("  --venue VENUE     Process only tickets from specified venue (case-insensitive)")
@@ -1,7 +1,9 @@
 import re
 from datetime import datetime, date
-from dateutil import parser
-from zoneinfo import ZoneInfo
+from showDate import parse_show_date
+
+# Time at the very end of a product name, e.g. "8pm" or "7:30pm"
+_PRODUCT_TIME_RE = re.compile(r"(\d{1,2}(:\d{2})?(am|pm))$", re.IGNORECASE)
 
 #def append_year_to_show_date(show_date):
 #    today = date.today()
@@ -17,25 +19,12 @@ from zoneinfo import ZoneInfo
 #    return f"{show_date} {year}"
 
 def append_year_to_show_date(show_date):
-    # If year already present (4-digit number), return as-is
-    if re.search(r'\b\d{4}\b', show_date):
-        return show_date
-    
-    # Get current date in PST/PDT
-    today = datetime.now(ZoneInfo("America/Los_Angeles")).date()
-    current_year = today.year
-    
-    # Parse show date (e.g., "Friday April 25th")
-    try:
-        date_obj = parser.parse(show_date, fuzzy=True, dayfirst=False)
-        show_month_day = date_obj.date().replace(year=current_year)
-    except ValueError:
+    """Return the worksheet title for a show date: the date plus the year of its next occurrence"""
+    # If year already present, sheet_title is the show date as-is
+    parsed = parse_show_date(show_date)
+    if parsed is None:
         raise ValueError(f"Invalid show date format: {show_date}. Expected 'Friday April 25th'.")
-    
-    # Compare with today
-    year = current_year if show_month_day >= today else current_year + 1
-    
-    return f"{show_date} {year}"
+    return parsed.sheet_title
 
 def get_city(string):
     venue = get_venue(string)
@@ -182,37 +171,14 @@ def convert_date_from_any_format(date_str):
     if not date_str:
         return None  # Handle empty strings
 
-    try:
-        # First, try to handle MM-DD-YYYY format explicitly (common for DoMORE)
-        if re.match(r'\d{2}-\d{2}-\d{4}', date_str):
-            month, day, year = date_str.split('-')
-            date_object = datetime(int(year), int(month), int(day))
-        else:
-            # Fallback to dateutil.parser for other formats
-            date_object = parser.parse(date_str)
-
-        day = date_object.day
-        month_names = [
-            'January', 'February', 'March', 'April', 'May', 'June',
-            'July', 'August', 'September', 'October', 'November', 'December'
-        ]
-        month = date_object.month
-        month_name = month_names[month - 1]
-
-        day_of_week = date_object.strftime('%A')  # Get the name of the day
-
-        # Add suffix to the day
-        if 4 <= day <= 20 or 24 <= day <= 30:
-            suffix = "th"
-        else:
-            suffix = ["st", "nd", "rd"][day % 10 - 1]
-
-        formatted_date = f"{day_of_week} {month_name} {day}{suffix}"
-        return formatted_date
-    except (ValueError, IndexError) as e:
-        print(f"Warning: Could not parse date '{date_str}': {e}")
+    # Handles MM-DD-YYYY (common for DoMORE), YYYY-MM-DD and written dates
+    show_date = parse_show_date(date_str)
+    if show_date is None or not show_date.date_found:
+        print(f"Warning: Could not parse date '{date_str}'")
         return None  # Skip non-date entries that cannot be parsed
 
+    return show_date.date_label  # e.g. "Friday April 25th"
+
 def format_time(time_str):
     """Convert time from 'HH:MM AM/PM' to 'H:MMam/pm' or 'Ham/pm' if minutes are '00'."""
     try:
@@ -263,15 +229,11 @@ def extract_time(product_name):
     Returns:
         The time in lowercase (e.g., "8pm" or "7:30pm"), or None if the time cannot be extracted.
     """
-    # Regular expression to capture time in the format "8pm", "7:30pm", etc.
-    time_regex = r"(\d{1,2}(:\d{2})?(am|pm))$"
-
-    # Match the regular expression against the product name.
-    match = re.search(time_regex, product_name, re.IGNORECASE)
-
-    # If the regular expression matches, return the captured time group in lowercase.
+    # Only a trailing am/pm time counts: names like "Palace - 10pm Special - Friday April 25th - 7:30pm"
+    # carry other times earlier on, and 24-hour times would change the worksheet name
+    match = _PRODUCT_TIME_RE.search(product_name)
     if match:
-        return match.group(0).strip().lower()
+        return match.group(1).lower()
     else:
         return None
 
@@ -300,7 +262,7 @@ def filter_guests_by_venue(guests, venue_filter):
     original_count = len(guests)
     
     for guest in guests:
-        guest_venue = guest.get('venue', '').lower() if guest.get('venue') else ''
+        guest_venue = guest.venue.lower() if guest.venue else ''
         if venue_filter in guest_venue or guest_venue in venue_filter:
             filtered_guests.append(guest)
     
@@ -0,0 +1,195 @@
+"""
+Shared rate limiting and retry for Google API calls (Sheets, Drive, Gmail)
+Every request takes tokens from a per-API token bucket sized to the per-user
+quota, and 429 / 5xx / rate-limit 403 responses are retried with jittered
+exponential backoff that honors Retry-After.
+
+gspread clients get this through RateLimitedHTTPClient and googleapiclient
+services through build_service(), so scripts never need their own sleeps.
+"""
+
+import json
+import random
+import logging
+import threading
+import time
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+from shared_config import load_project_config
+
+logger = logging.getLogger(__name__)
+
+# Default per-user quotas (units per minute); override with the GOOGLE_*_PER_MINUTE settings
+DEFAULT_QUOTAS = {
+    ("sheets", "read"): 60,
+    ("sheets", "write"): 60,
+    ("drive", "read"): 12000,
+    ("drive", "write"): 12000,
+    ("gmail", "read"): 15000,     # 250 quota units per second
+    ("gmail", "write"): 15000,
+}
+
+# Gmail charges quota units per method; most reads cost 5, sending costs 100
+GMAIL_READ_COST = 5
+GMAIL_SEND_COST = 100
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+MAX_RETRIES = 6
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 64.0
+
+HTTP_TIMEOUT = 120
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute"""
+
+    def __init__(self, rate_per_minute, burst_seconds=10):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available, then take them; returns seconds waited"""
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def drain(self):
+        """Empty the bucket after the server reported a rate limit"""
+        with self._lock:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def _configured_quotas():
+    config = load_project_config()
+    quotas = dict(DEFAULT_QUOTAS)
+    if config:
+        quotas[("sheets", "read")] = config["google_sheets_reads_per_minute"]
+        quotas[("sheets", "write")] = config["google_sheets_writes_per_minute"]
+        quotas[("drive", "read")] = quotas[("drive", "write")] = config["google_drive_requests_per_minute"]
+        quotas[("gmail", "read")] = quotas[("gmail", "write")] = config["gmail_units_per_minute"]
+    return quotas
+
+def get_bucket(api, kind):
+    """The process-wide bucket for an API ("sheets", "drive", "gmail") and kind ("read", "write")"""
+    key = (api, kind)
+    bucket = _buckets.get(key)
+    if bucket is None:
+        with _buckets_lock:
+            if not _buckets:
+                for quota_key, rate in _configured_quotas().items():
+                    _buckets[quota_key] = TokenBucket(rate)
+            bucket = _buckets.setdefault(key, TokenBucket(DEFAULT_QUOTAS.get(key, 60)))
+    return bucket
+
+def _parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+def _is_rate_limit_error(content):
+    """True if a 403 body carries a rate limit reason (Drive reports rate limits as 403)"""
+    try:
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", "replace")
+        error = json.loads(content).get("error", {}) if content else {}
+    except (ValueError, AttributeError):
+        return False
+    if error.get("status") == "RESOURCE_EXHAUSTED":
+        return True
+    return any(item.get("reason") in RATE_LIMIT_REASONS for item in error.get("errors", []))
+
+def retry_delay(status, retry_after, content, attempt):
+    """
+    Seconds to wait before retrying a failed response, or None if it should not be retried.
+    Uses Retry-After when the server sent one, else full-jitter exponential backoff.
+    """
+    if attempt >= MAX_RETRIES:
+        return None
+    if status not in RETRYABLE_STATUSES and not (status == 403 and _is_rate_limit_error(content)):
+        return None
+    retry_after = _parse_retry_after(retry_after)
+    if retry_after is not None:
+        return retry_after + random.uniform(0, BASE_BACKOFF)
+    return random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+
+def _wait_before_retry(api, kind, status, delay, attempt):
+    logger.warning(f"{api} {kind} request got HTTP {status}, retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+    if status in (403, 429):
+        get_bucket(api, kind).drain()
+    time.sleep(delay)
+
+def _request_kind(method):
+    return "read" if method.upper() in ("GET", "HEAD") else "write"
+
+class RateLimitedHTTPClient(HTTPClient):
+    """gspread HTTP client: pass as gspread.Client(auth=creds, http_client=RateLimitedHTTPClient)"""
+
+    def request(self, method, endpoint, *args, **kwargs):
+        api = "drive" if "/drive/" in endpoint else "sheets"
+        kind = _request_kind(method)
+        attempt = 0
+        while True:
+            get_bucket(api, kind).acquire()
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except APIError as e:
+                response = e.response
+                delay = retry_delay(response.status_code, response.headers.get("Retry-After"), response.text, attempt)
+                if delay is None:
+                    raise
+                _wait_before_retry(api, kind, response.status_code, delay, attempt)
+                attempt += 1
+
+class RateLimitedHttp:
+    """httplib2-compatible wrapper used by googleapiclient services from build_service()"""
+
+    def __init__(self, http, api):
+        self.http = http
+        self.api = api
+
+    def _cost(self, uri, method):
+        if self.api != "gmail":
+            return 1
+        return GMAIL_SEND_COST if method.upper() == "POST" and uri.rstrip("/").endswith("/send") else GMAIL_READ_COST
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        kind = _request_kind(method)
+        cost = self._cost(uri, method)
+        attempt = 0
+        while True:
+            get_bucket(self.api, kind).acquire(cost)
+            resp, content = self.http.request(uri, method, body=body, headers=headers, **kwargs)
+            delay = retry_delay(resp.status, resp.get("retry-after"), content, attempt)
+            if delay is None:
+                return resp, content
+            _wait_before_retry(self.api, kind, resp.status, delay, attempt)
+            attempt += 1
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+def build_service(api, version, credentials):
+    """googleapiclient.discovery.build() with rate limiting and retries on every request"""
+    http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+    return build(api, version, http=RateLimitedHttp(http, api))
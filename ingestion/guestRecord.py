@@ -0,0 +1,155 @@
+"""
+GuestRecord - the one guest shape emitted by every fetcher and consumed by both sinks
+Replaces the 18-slot positional guest arrays and the ad hoc guest dictionaries.
+"""
+
+import hashlib
+from datetime import datetime
+from showDate import parse_show_date, extract_show_time
+
+# Field order matches the legacy 18-element guest array, so from_array() can map by index
+GUEST_FIELDS = (
+    "venue", "show_date", "email", "source", "show_time", "ticket_type",
+    "first_name", "last_name", "tickets", "phone",
+    # Enhanced fields
+    "discount_code", "total_price", "order_id", "transaction_id",
+    "customer_id", "payment_method", "entry_code", "notes",
+)
+
+ENHANCED_FIELDS = GUEST_FIELDS[10:]
+
+# Worksheet columns A-I
+SHEET_HEADERS = ["venue", "date", "email", "source", "time", "type", "firstname", "lastname", "tickets"]
+
+def generate_row_hash(first_name, last_name, email, source, show_name):
+    """Generate hash from key fields, skipping empty ones"""
+    fields = [f for f in [first_name, last_name, email, source, show_name] if f]
+    return hashlib.md5(''.join(str(f).lower().strip() for f in fields).encode()).hexdigest()[:12]
+
+class GuestRecord:
+    """A single guest (one order line) for one show"""
+
+    __slots__ = GUEST_FIELDS
+
+    def __init__(self, venue='', show_date='', email='', source='', show_time=None, ticket_type='GA',
+                 first_name='', last_name='', tickets=1, phone='', discount_code=None, total_price=None,
+                 order_id=None, transaction_id=None, customer_id=None, payment_method=None,
+                 entry_code=None, notes=None):
+        self.venue = venue
+        self.show_date = show_date
+        self.email = email
+        self.source = source
+        # Time defaults to the one written in the show date (e.g. "Friday April 25th 8pm" -> "8pm")
+        self.show_time = show_time if show_time is not None else extract_show_time(show_date)
+        self.ticket_type = ticket_type
+        self.first_name = first_name
+        self.last_name = last_name
+        self.tickets = int(tickets) if tickets not in (None, '') else 1
+        self.phone = phone
+        self.discount_code = discount_code
+        self.total_price = total_price
+        self.order_id = order_id
+        self.transaction_id = transaction_id
+        self.customer_id = customer_id
+        self.payment_method = payment_method
+        self.entry_code = entry_code
+        self.notes = notes
+
+    @classmethod
+    def from_dict(cls, guest):
+        """Build from a legacy guest dictionary (unknown keys are ignored)"""
+        return cls(**{field: guest[field] for field in GUEST_FIELDS if field in guest})
+
+    @classmethod
+    def from_array(cls, row):
+        """Build from a legacy positional guest array (at least 9 elements)"""
+        values = dict(zip(GUEST_FIELDS, row))
+        if len(row) <= 9:
+            values["phone"] = None
+        return cls(**values)
+
+    @classmethod
+    def coerce(cls, guest):
+        """Return guest as a GuestRecord, converting legacy dicts/arrays; None if malformed"""
+        if isinstance(guest, cls):
+            return guest
+        if isinstance(guest, dict):
+            return cls.from_dict(guest)
+        if isinstance(guest, (list, tuple)) and len(guest) >= 9:
+            return cls.from_array(guest)
+        return None
+
+    @property
+    def show_key(self):
+        """Grouping key used by batch_data ("venue - show date")"""
+        return f"{self.venue} - {self.show_date}"
+
+    @property
+    def row_hash(self):
+        """Hash identifying this guest's worksheet row (see worksheetSnapshot.sheet_row_hash)"""
+        return generate_row_hash(self.first_name, self.last_name, self.email, self.source, self.show_key)
+
+    @property
+    def show_datetime(self):
+        """Venue-local show datetime, or None if the show date has no parseable date"""
+        show_date = parse_show_date(self.show_date)
+        if show_date is None or not show_date.date_found:
+            return None
+        return show_date.local_datetime
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in GUEST_FIELDS}
+
+    def copy(self):
+        return GuestRecord(**self.to_dict())
+
+    def to_mongo_doc(self, show_name=None):
+        """Contact document for the per-source guest_list_contacts collections"""
+        now = datetime.utcnow()
+        contact_doc = {
+            "venue": self.venue,
+            "show_date": self.show_date,
+            "show_datetime": self.show_datetime,
+            "email": self.email,
+            "source": self.source,
+            "show_time": self.show_time,
+            "ticket_type": self.ticket_type,
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+            "tickets": self.tickets,
+            "phone": self.phone,
+            "show_name": show_name if show_name is not None else self.show_key,
+            "row_hash": self.row_hash,
+            "added_to_mailerlite": False,
+            "mailerlite_added_date": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        for field in ENHANCED_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                contact_doc[field] = value
+        return contact_doc
+
+    def to_sheet_row(self):
+        """Worksheet row matching SHEET_HEADERS"""
+        return [
+            self.venue,
+            self.show_date,
+            self.email,
+            self.source,
+            extract_show_time(self.show_date),
+            self.ticket_type,
+            self.first_name,
+            self.last_name,
+            self.tickets
+        ]
+
+    def __eq__(self, other):
+        if not isinstance(other, GuestRecord):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in GUEST_FIELDS)
+
+    def __repr__(self):
+        return (f"GuestRecord({self.first_name} {self.last_name}, {self.source}, "
+                f"{self.venue} - {self.show_date}, tickets={self.tickets})")
@@ -0,0 +1,151 @@
+"""
+Shared HTTP client for the ticketing APIs (Eventbrite, Squarespace)
+One requests.Session per process with keep-alive connection pools, gzip,
+connect/read timeouts on every call, a per-host limit on concurrent requests,
+and retries with jittered exponential backoff (honoring Retry-After up to MAX_BACKOFF) on
+429 / 5xx responses and connection errors (only 429 for non-idempotent
+methods, which may already have taken effect). fan_out() runs independent lookups
+on a bounded thread pool.
+"""
+
+import random
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from shared_config import load_project_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_PER_HOST_CONCURRENCY = 4
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+
+class HttpClient:
+    """Pooled, rate-limited requests wrapper; safe to share between threads"""
+
+    def __init__(self, connect_timeout=None, read_timeout=None, max_retries=None, per_host_concurrency=None):
+        config = load_project_config()
+        self.timeout = (
+            connect_timeout or (config['http_connect_timeout'] if config else DEFAULT_CONNECT_TIMEOUT),
+            read_timeout or (config['http_read_timeout'] if config else DEFAULT_READ_TIMEOUT),
+        )
+        self.max_retries = max_retries if max_retries is not None else \
+            (config['http_max_retries'] if config else DEFAULT_MAX_RETRIES)
+        self.per_host_concurrency = per_host_concurrency or \
+            (config['http_per_host_concurrency'] if config else DEFAULT_PER_HOST_CONCURRENCY)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(10, self.per_host_concurrency))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = self._host_limits[host] = threading.BoundedSemaphore(self.per_host_concurrency)
+        return limit
+
+    def _retry_delay(self, method, response, attempt):
+        if attempt >= self.max_retries:
+            return None
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        if response is None and not idempotent:
+            return None
+        if response is not None:
+            if response.status_code not in RETRYABLE_STATUSES or (not idempotent and response.status_code != 429):
+                return None
+            try:
+                retry_after = max(0.0, float(response.headers.get('Retry-After')))
+            except (TypeError, ValueError):
+                retry_after = None
+            if retry_after is not None:
+                # Asked to wait longer than we ever back off: give the caller the response instead of stalling the run
+                if retry_after > MAX_BACKOFF:
+                    logger.warning(f"{urlsplit(response.url or '').netloc} asked to retry after {retry_after:.0f}s - giving up")
+                    return None
+                return retry_after + random.uniform(0, BASE_BACKOFF)
+        return random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request, retrying 429 / 5xx responses and connection errors.
+        Returns the final response (callers check status_code as before); raises
+        requests.RequestException if the connection never succeeds.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        limit = self._host_limit(url)
+        attempt = 0
+        while True:
+            response = None
+            try:
+                with limit:
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                delay = self._retry_delay(method, None, attempt)
+                if delay is None:
+                    raise
+                logger.warning(f"{method} {urlsplit(url).netloc} failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            else:
+                delay = self._retry_delay(method, response, attempt)
+                if delay is None:
+                    return response
+                logger.warning(f"{method} {urlsplit(url).netloc} got HTTP {response.status_code}, "
+                               f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_http_client():
+    """The process-wide HttpClient"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient()
+    return _client
+
+def fan_out(fn, items, max_workers=None):
+    """
+    fn(item) for every item on a bounded thread pool; results in item order.
+    An item whose call raises gets None (the error is logged).
+    """
+    items = list(items)
+    if not items:
+        return []
+    max_workers = max_workers or get_http_client().per_host_concurrency
+
+    def call(item):
+        try:
+            return fn(item)
+        except Exception as e:
+            logger.error(f"Error in {getattr(fn, '__name__', 'lookup')}({item}): {e}")
+            return None
+
+    if len(items) == 1 or max_workers <= 1:
+        return [call(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items)), thread_name_prefix="http-fan-out") as executor:
+        return list(executor.map(call, items))
@@ -3,14 +3,21 @@ from google.oauth2.service_account import Credentials
 import sys
 import os
 from shared_config import load_project_config, get_google_service_account_path
-from googleapiclient.discovery import build
 from gspread.exceptions import APIError, SpreadsheetNotFound, WorksheetNotFound
+from googleapiclient.errors import HttpError
 from datetime import datetime 
 import re  # Add this line
 import logging
-import hashlib
+import threading
 from addContactsToMongoDB import batch_add_contacts_to_mongodb, save_comprehensive_data_to_mongodb
 from getVenueAndDate import get_city, append_year_to_show_date
+from guestRecord import GuestRecord
+from worksheetSnapshot import WorksheetSnapshot, WORKSHEET_HEADERS, DATA_WIDTH, grid_rows_for
+from rowHashIndex import RowHashIndex, row_key
+from sheetsBatch import BatchUpdateBuilder
+from sheetDirectory import SheetDirectory
+from googleApiLimiter import RateLimitedHTTPClient, build_service
+from spreadsheetWriterPool import SpreadsheetWriterPool, DEFAULT_CONCURRENCY, DEFAULT_QUEUE_DEPTH
 
 # Load project configuration
 config = load_project_config()
@@ -18,13 +25,11 @@ config = load_project_config()
 # Setup logging
 logger = logging.getLogger(__name__)
 
-def _generate_row_hash(first_name, last_name, email, source, show_name):
-    """Generate hash from key fields, skipping empty ones"""
-    fields = [f for f in [first_name, last_name, email, source, show_name] if f]
-    return hashlib.md5(''.join(str(f).lower().strip() for f in fields).encode()).hexdigest()[:12]
+# googleapiclient services are not thread-safe, so each writer thread builds its own
+_thread_state = threading.local()
 
 def _setup_google_sheets_client():
-    """Initialize Google Sheets client and service"""
+    """Initialize Google Sheets client; returns (gc, creds)"""
     logger.info("Setting up Google Sheets client")
     
     google_creds_file = get_google_service_account_path()
@@ -35,13 +40,19 @@ def _setup_google_sheets_client():
         google_creds_file, 
         scopes=['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
     )
-    gc = gspread.Client(auth=creds)
-    service = build('sheets', 'v4', credentials=creds)
+    gc = gspread.Client(auth=creds, http_client=RateLimitedHTTPClient)
     logger.info("Google Sheets client initialized successfully")
-    return gc, service
+    return gc, creds
 
-def _get_or_create_sheet(gc, venue):
-    """Get existing sheet or create new one for venue"""
+def _thread_sheets_service(creds):
+    """Sheets API service for the calling thread, built on first use"""
+    service = getattr(_thread_state, 'service', None)
+    if service is None:
+        service = _thread_state.service = build_service('sheets', 'v4', creds)
+    return service
+
+def _get_or_create_sheet(directory, venue):
+    """Get existing sheet or create new one for venue; returns (sheet, sheet_title)"""
     sheet_title = get_city(venue) + "-" + venue
     logger.info(f"Processing sheet: {sheet_title}")
 
@@ -49,41 +60,38 @@ def _get_or_create_sheet(gc, venue):
         raise ValueError("Project configuration is not loaded (config is None).")
 
     try:
-        sheet = gc.open(sheet_title)
+        sheet = directory.open(sheet_title)
         logger.info(f"Found existing sheet: {sheet_title}")
     except gspread.exceptions.SpreadsheetNotFound:
         logger.info(f"Creating new sheet: {sheet_title}")
-        sheet = gc.create(sheet_title, folder_id=config["guest_list_folder_id"])
+        sheet = directory.gc.create(sheet_title, folder_id=config["guest_list_folder_id"])
+        directory.remember_spreadsheet(sheet_title, sheet)
         logger.info(f"Successfully created sheet: {sheet_title}")
 
-    return sheet
+    return sheet, sheet_title
 
-def _get_or_create_worksheet(sheet, show_date):
-    """Get existing worksheet or create new one for show date"""
+def _get_or_create_worksheet(directory, sheet_title, sheet, show_date, guest_count=0):
+    """
+    Get existing worksheet or create new one for show date, sized for guest_count guests;
+    returns (worksheet, created)
+    """
     show_date_plus_year = append_year_to_show_date(show_date)
     logger.info(f"Processing worksheet for date: {show_date_plus_year}")
     
     try:
-        worksheet = sheet.worksheet(show_date_plus_year)
+        worksheet = directory.worksheet(sheet_title, sheet, show_date_plus_year)
         logger.info(f"Found existing worksheet: {show_date_plus_year}")
+        return worksheet, False
     except gspread.WorksheetNotFound:
         logger.info(f"Creating new worksheet: {show_date_plus_year}")
-        worksheet = sheet.add_worksheet(show_date_plus_year, rows=100, cols=20)
+        worksheet = sheet.add_worksheet(show_date_plus_year, rows=grid_rows_for(guest_count), cols=20)
+        directory.remember_worksheet(sheet_title, sheet, worksheet)
         logger.info(f"Successfully created worksheet: {show_date_plus_year}")
-    
-    return worksheet
+        return worksheet, True
 
-def _setup_worksheet_headers(worksheet):
+def _setup_worksheet_headers(snapshot):
     """Setup headers for the worksheet"""
-    headers = ["venue", "date", "email", "source", "time", "type", "firstname", "lastname", "tickets", "total:"]
-    
-    if len(worksheet.get_all_values()) == 0:
-        worksheet.append_row(headers, 1)
-    else:
-        if worksheet.row_values(1) != headers:
-            worksheet.update('A1:J1', [headers])
-    
-    return headers
+    return snapshot.ensure_headers(WORKSHEET_HEADERS)
 
 def _get_column_definitions(headers):
     """Define column variables for formulas"""
@@ -97,246 +105,125 @@ def _get_column_definitions(headers):
     }
 
 def _create_formulas(columns):
-    """Create all formula strings"""
+    """Create all formula strings (open-ended ranges like I2:I, so they cover every guest row)"""
     formulas = {}
+    tickets = f'{columns["ticket_sales_column"]}2:{columns["ticket_sales_column"]}'
+    category = f'{columns["category_column"]}2:{columns["category_column"]}'
+    checkbox = f'{columns["checkbox_column"]}2:{columns["checkbox_column"]}'
     
     # Main formulas
-    formulas['sum_formula'] = f'=ARRAYFORMULA(SUM(VALUE({columns["ticket_sales_column"]}2:{columns["ticket_sales_column"]}100)))'
-    formulas['sum_formula_2'] = f'=SUM(ARRAYFORMULA(IF({columns["checkbox_column"]}2:{columns["checkbox_column"]}100=TRUE, VALUE({columns["ticket_sales_column"]}2:{columns["ticket_sales_column"]}100), 0)))'
+    formulas['sum_formula'] = f'=ARRAYFORMULA(SUM(VALUE({tickets})))'
+    formulas['sum_formula_2'] = f'=SUM(ARRAYFORMULA(IF({checkbox}=TRUE, VALUE({tickets}), 0)))'
     formulas['sum_formula_3'] = f'={columns["checked_in_column"]}1/{columns["total_tickets_column"]}1'
     formulas['sum_formula_4'] = 'Total Checked In'
     
     # Paid check-in formulas
-    formulas['paid_checkin_formula_1'] = f'=SUM(ARRAYFORMULA(IF(({columns["category_column"]}2:{columns["category_column"]}99<>"Guest List")*({columns["category_column"]}2:{columns["category_column"]}99<>"Industry"), VALUE({columns["ticket_sales_column"]}2:{columns["ticket_sales_column"]}99), 0)))'
-    formulas['paid_checkin_formula_2'] = f'=SUMPRODUCT(({columns["category_column"]}2:{columns["category_column"]}99<>"Guest List") * ({columns["category_column"]}2:{columns["category_column"]}99<>"Industry") * ({columns["checkbox_column"]}2:{columns["checkbox_column"]}99=TRUE) * VALUE({columns["ticket_sales_column"]}2:{columns["ticket_sales_column"]}99))'
+    formulas['paid_checkin_formula_1'] = f'=SUM(ARRAYFORMULA(IF(({category}<>"Guest List")*({category}<>"Industry"), VALUE({tickets}), 0)))'
+    formulas['paid_checkin_formula_2'] = f'=SUMPRODUCT(({category}<>"Guest List") * ({category}<>"Industry") * ({checkbox}=TRUE) * VALUE({tickets}))'
     formulas['paid_checkin_percentage_formula'] = f'={columns["checked_in_column"]}2/{columns["total_tickets_column"]}2'
     formulas['paid_checkin_label'] = 'Paid Check In'
     
     # Free list check-in formulas
-    formulas['freelist_checkin_formula_1'] = f'=SUM(ARRAYFORMULA(IF(({columns["category_column"]}2:{columns["category_column"]}99="Guest List")+({columns["category_column"]}2:{columns["category_column"]}99="Industry"), VALUE({columns["ticket_sales_column"]}2:{columns["ticket_sales_column"]}99), 0)))'
-    formulas['freelist_checkin_formula_2'] = f'=SUMPRODUCT((({columns["category_column"]}2:{columns["category_column"]}99="Guest List") + ({columns["category_column"]}2:{columns["category_column"]}99="Industry")) * ({columns["checkbox_column"]}2:{columns["checkbox_column"]}99=TRUE) * VALUE({columns["ticket_sales_column"]}2:{columns["ticket_sales_column"]}99))'
+    formulas['freelist_checkin_formula_1'] = f'=SUM(ARRAYFORMULA(IF(({category}="Guest List")+({category}="Industry"), VALUE({tickets}), 0)))'
+    formulas['freelist_checkin_formula_2'] = f'=SUMPRODUCT((({category}="Guest List") + ({category}="Industry")) * ({checkbox}=TRUE) * VALUE({tickets}))'
     formulas['freelist_checkin_percentage_formula'] = f'={columns["checked_in_column"]}3/{columns["total_tickets_column"]}3'
     formulas['freelist_checkin_label'] = 'Free List Check In'
     
     return formulas
 
-def _prepare_and_insert_data(worksheet, batch_data_for_show, headers):
-    """Prepare data and insert into worksheet"""
-    logger.info(f"Preparing to insert {len(batch_data_for_show)} rows")
-    
-    if len(worksheet.get_all_values()) == 0:
-        worksheet.append_row(headers, 1)
-        logger.info("Added headers to new worksheet")
-    
-    # Convert tickets column to integers
-    ticket_sales_column_number = ord(headers.index("tickets") + 65) - ord('A')
-    data_to_insert = batch_data_for_show
-    
-    for row in data_to_insert:
-        row[ticket_sales_column_number] = int(row[ticket_sales_column_number]) if row[ticket_sales_column_number] else 0
-    
-    worksheet.append_rows(data_to_insert, 2)
-    logger.info(f"Successfully inserted {len(data_to_insert)} rows")
-
-def _sort_data_by_firstname(worksheet, headers):
+def _sort_data_by_firstname(snapshot):
     """Sort worksheet data by first name"""
     try:
         logger.info("Sorting data by first name")
-        data_range = worksheet.get_all_values()
-        firstname_column = headers.index("firstname") + 1
-        
-        def capitalize_name(name):
-            return name.capitalize() if name else name
-        
-        # Capitalize first names and sort
-        for row in data_range[1:]:
-            row[firstname_column - 1] = capitalize_name(row[firstname_column - 1])
-        
-        data_range[1:] = sorted(data_range[1:], key=lambda row: row[firstname_column - 1])
-        worksheet.update('A2', data_range[1:])
-        logger.info(f"Successfully sorted {len(data_range) - 1} rows by first name")
+        snapshot.sort_by_firstname()
+        logger.info(f"Successfully sorted {len(snapshot.rows)} rows by first name")
         
     except Exception as e:
         logger.error(f"Error occurred while sorting: {e}")
 
-def _add_checkboxes(worksheet, service, sheet, columns):
+def _add_checkboxes(snapshot, builder, columns):
     """Add checkboxes to the worksheet"""
     try:
         logger.info("Adding checkboxes to worksheet")
-        all_values = worksheet.get_all_values()
-        total_rows = len(all_values)
         checkbox_column_number = ord(columns['checkbox_column']) - ord('A')
+        total_rows = len(snapshot.rows) + 1
         
         logger.debug(f"Checkbox column: {checkbox_column_number}, Total rows: {total_rows}")
         
-        checkboxvalues = [row[checkbox_column_number] for row in all_values[1:]]
-        
-        requests = []
-        for row_index in range(1, total_rows):
-            bool_value = checkboxvalues[row_index - 1] == 'TRUE'
-            requests.append({
-                "updateCells": {
-                    "range": {
-                        "sheetId": worksheet.id,
-                        "startRowIndex": row_index,
-                        "endRowIndex": row_index + 1,
-                        "startColumnIndex": checkbox_column_number,
-                        "endColumnIndex": checkbox_column_number + 1,
-                    },
-                    "rows": [{
-                        "values": [{
-                            "userEnteredValue": {"boolValue": bool_value},
-                            "dataValidation": {
-                                "condition": {"type": "BOOLEAN"},
-                                "showCustomUi": True
-                            }
-                        }]
-                    }],
-                    "fields": "userEnteredValue,dataValidation"
-                }
-            })
-        
-        if requests:
-            body = {"requests": requests}
-            service.spreadsheets().batchUpdate(spreadsheetId=sheet.id, body=body).execute()
-            logger.info(f"Successfully added {len(requests)} checkboxes")
+        # Checked states are written with the guest rows; this makes the column checkboxes
+        builder.set_checkbox_validation(snapshot.worksheet.id, 1, total_rows, checkbox_column_number)
             
     except Exception as e:
         logger.error(f"Error occurred while adding checkboxes: {e}")
 
-def _add_formulas(worksheet, formulas, columns):
+def _formula_block(formulas, has_guest_list):
+    """Rows of formulas written to the right of 'total:' (paid/free rows only when there is a guest list)"""
+    # Main formulas
+    formula_block = [
+        [formulas['sum_formula'], formulas['sum_formula_2'], formulas['sum_formula_3'], formulas['sum_formula_4']]
+    ]
+    
+    if has_guest_list:
+        logger.info("Guest List data detected - adding paid/free check-in formulas")
+        # Paid check-in formulas
+        formula_block.append([formulas['paid_checkin_formula_1'], formulas['paid_checkin_formula_2'],
+                              formulas['paid_checkin_percentage_formula'], formulas['paid_checkin_label']])
+        
+        # Free list check-in formulas
+        formula_block.append([formulas['freelist_checkin_formula_1'], formulas['freelist_checkin_formula_2'],
+                              formulas['freelist_checkin_percentage_formula'], formulas['freelist_checkin_label']])
+    else:
+        logger.info("No Guest List data - skipping paid/free formulas")
+    return formula_block
+
+def _add_formulas(snapshot, builder, formulas, columns):
     """Add calculation formulas to the worksheet"""
     try:
         logger.info("Adding calculation formulas")
-        cell = worksheet.find('total:')
-        logger.debug(f"Total cell location: row {cell.row}, col {cell.col}")
-        
-        # Add main formulas
-        worksheet.update_cell(cell.row, cell.col + 1, formulas['sum_formula'])
-        worksheet.update_cell(cell.row, cell.col + 2, formulas['sum_formula_2'])
-        worksheet.update_cell(cell.row, cell.col + 3, formulas['sum_formula_3'])
-        worksheet.update_cell(cell.row, cell.col + 4, formulas['sum_formula_4'])
+        cell_row, cell_col = snapshot.find('total:')
+        logger.debug(f"Total cell location: row {cell_row}, col {cell_col}")
         
         # Check if we have guest list data
-        category_column_number = ord(columns['category_column']) - ord('A') + 1
-        guest_list_values = worksheet.col_values(category_column_number)[1:]
+        guest_list_values = snapshot.column_values(columns['category_column'])
+        formula_block = _formula_block(formulas, any(value == "Guest List" for value in guest_list_values))
         
-        if any(value == "Guest List" for value in guest_list_values):
-            logger.info("Guest List data detected - adding paid/free check-in formulas")
-            # Add paid check-in formulas
-            worksheet.update_cell(cell.row + 1, cell.col + 1, formulas['paid_checkin_formula_1'])
-            worksheet.update_cell(cell.row + 1, cell.col + 2, formulas['paid_checkin_formula_2'])
-            worksheet.update_cell(cell.row + 1, cell.col + 3, formulas['paid_checkin_percentage_formula'])
-            worksheet.update_cell(cell.row + 1, cell.col + 4, formulas['paid_checkin_label'])
-            
-            # Add free list check-in formulas
-            worksheet.update_cell(cell.row + 2, cell.col + 1, formulas['freelist_checkin_formula_1'])
-            worksheet.update_cell(cell.row + 2, cell.col + 2, formulas['freelist_checkin_formula_2'])
-            worksheet.update_cell(cell.row + 2, cell.col + 3, formulas['freelist_checkin_percentage_formula'])
-            worksheet.update_cell(cell.row + 2, cell.col + 4, formulas['freelist_checkin_label'])
-        else:
-            logger.info("No Guest List data - skipping paid/free formulas")
-            
+        # The whole block goes out as a single updateCells to the right of 'total:'
+        builder.set_values(snapshot.worksheet.id, cell_row - 1, cell_col, formula_block)
         logger.info("Successfully added all formulas")
             
     except Exception as e:
         logger.error(f"Error occurred while adding formulas: {e}")
 
-def _cleanup_and_format(worksheet, service, sheet, columns):
+def _cleanup_and_format(snapshot, builder, columns):
     """Clean up old formulas and format columns"""
     try:
-        # Remove old formulas
-        end_column = chr(ord(columns['total_tickets_column']) + 3)
-        range_to_clear = f'{columns["total_tickets_column"]}4:{end_column}'
-        worksheet.batch_clear([range_to_clear])
+        sheet_id = snapshot.worksheet.id
+        
+        # Remove old formulas below the formula block (K4:N)
+        start_column = ord(columns['total_tickets_column']) - ord('A')
+        builder.clear_values(sheet_id, 3, None, start_column, start_column + 4)
         
         # Set percentage format
-        worksheet.format(f'{columns["percentage_checked_in_column"]}:{columns["percentage_checked_in_column"]}', {
-            "numberFormat": {
-                "type": "PERCENT",
-                "pattern": "0.00%"
-            }
-        })
+        percentage_column = ord(columns['percentage_checked_in_column']) - ord('A')
+        builder.set_number_format(sheet_id, percentage_column, {"type": "PERCENT", "pattern": "0.00%"})
         
         # Auto resize columns
-        requests = []
-        for col in range(worksheet.col_count):
-            requests.append({
-                'autoResizeDimensions': {
-                    'dimensions': {
-                        'sheetId': worksheet.id,
-                        'dimension': 'COLUMNS',
-                        'startIndex': col,
-                        'endIndex': col + 1
-                    }
-                }
-            })
-        
-        body = {'requests': requests}
-        service.spreadsheets().batchUpdate(spreadsheetId=sheet.id, body=body).execute()
+        builder.auto_resize_columns(sheet_id, 0, snapshot.worksheet.col_count)
         
     except Exception as e:
         print(f"An error occurred during cleanup and formatting: {e}")
 
 def insert_data_into_google_sheet(batch_data):
     """
-    Legacy function that converts old batch_data format to new intuitive format
-    and calls insert_guest_data_efficient.
+    Legacy entry point taking show-grouped guests; writes them in one SheetsSession.
     
     batch_data format: {
-        "Show Name": [
-            ["venue", "date", "email", "source", "time", "type", "firstname", "lastname", tickets],
-            ...
-        ]
+        "Show Name": [GuestRecord, ...]   (legacy 9-18 element guest arrays are also accepted)
     }
     """
-    logger.info(f"Converting legacy batch_data format for {len(batch_data)} shows")
-    
-    # Convert legacy format to new intuitive format
-    guest_data = []
-    
-    for show_name, guest_rows in batch_data.items():
-        logger.debug(f"Converting {len(guest_rows)} guests from show: {show_name}")
-        
-        for row in guest_rows:
-            # Convert array format to dictionary format
-            # Expected array: [venue, date, email, source, time, type, firstname, lastname, tickets]
-            if len(row) >= 9:
-                guest_dict = {
-                    "venue": row[0],
-                    "show_date": row[1],
-                    "email": row[2],
-                    "source": row[3],
-                    "first_name": row[6],
-                    "last_name": row[7],
-                    "tickets": int(row[8]) if row[8] else 1,
-                    "ticket_type": row[5] if len(row) > 5 else "GA"
-                }
-                # Preserve phone if present
-                if len(row) > 9 and row[9]:
-                    guest_dict["phone"] = row[9]
-                # Preserve total_price (index 11 per enhanced array spec)
-                if len(row) > 11 and row[11] is not None:
-                    guest_dict["total_price"] = row[11]
-                # Extract purchase time from notes pattern if present (notes at index 17)
-                if len(row) > 17 and isinstance(row[17], str) and "PurchaseTime:" in row[17]:
-                    try:
-                        # Split on 'PurchaseTime:' and take remainder
-                        pt_part = row[17].split("PurchaseTime:", 1)[1].strip()
-                        # Remove any leading separators
-                        pt_part = pt_part.lstrip(';').strip()
-                        if pt_part and pt_part.upper() != 'N/A':
-                            guest_dict["purchase_time"] = pt_part
-                    except Exception:
-                        pass
-                guest_data.append(guest_dict)
-            else:
-                logger.warning(f"Skipping malformed row with {len(row)} elements: {row}")
-    
-    logger.info(f"Converted {len(guest_data)} guests to new format")
-    
-    # Call the efficient function with converted data
-    insert_guest_data_efficient(guest_data)
+    with SheetsSession() as session:
+        session.add_shows(batch_data)
+    return session.committed
 
 # ============================================================================
 # NEW IMPROVED VERSION WITH INTUITIVE DATA STRUCTURE AND EFFICIENT OPERATIONS
@@ -346,89 +233,144 @@ def insert_guest_data_efficient(guest_data):
     """
     New improved function with intuitive data structure and efficient operations.
     
-    :param guest_data: List of guest dictionaries with the following structure:
+    :param guest_data: List of GuestRecords (guest dictionaries are also accepted), e.g.
     [
-        {
-            "venue": "Palace",
-            "show_date": "2025-08-15 8:30 PM", 
-            "email": "john@example.com",
-            "source": "Bucketlist",
-            "first_name": "John",
-            "last_name": "Doe", 
-            "tickets": 2,
-            "ticket_type": "GA",
-            "phone": "+1234567890",
+        GuestRecord(
+            venue="Palace",
+            show_date="Friday August 15th 8:30pm",
+            email="john@example.com",
+            source="Bucketlist",
+            first_name="John",
+            last_name="Doe",
+            tickets=2,
+            ticket_type="GA",
+            phone="+1234567890",
             # Optional enhanced fields
-            "discount_code": "EARLY20",
-            "total_price": 25.00,
-            "order_id": "BL123456",
-            "notes": "VIP guest"
-        },
+            discount_code="EARLY20",
+            total_price=25.00,
+            order_id="BL123456",
+            notes="VIP guest"
+        ),
         # ... more guests
     ]
+    :return: True if MongoDB and Google Sheets both committed every write
     """
     if not guest_data:
         logger.warning("No guest data provided")
-        return
-    
-    logger.info(f"Starting efficient guest data insertion for {len(guest_data)} guests")
-    
-    # Convert to comprehensive format and save to MongoDB (moved function)
-    save_comprehensive_data_to_mongodb(guest_data)
-    
-    # Group guests by venue and show date for efficient processing
-    grouped_data = _group_guests_by_venue_and_date(guest_data)
-    logger.info(f"Grouped data into {len(grouped_data)} venue/date combinations")
-    
-    # Setup Google Sheets client once
-    gc, service = _setup_google_sheets_client()
-    
-    # Process each venue/date combination efficiently
-    for venue_date_key, guests in grouped_data.items():
-        venue, show_date = venue_date_key
-        _process_venue_show_efficient(gc, service, venue, show_date, guests)
+        return True
     
-    logger.info("Efficient guest data insertion completed successfully")
+    with SheetsSession() as session:
+        session.add(guest_data)
+    return session.committed
 
+class SheetsSession:
+    """
+    Collects the guest writes of a whole run and writes them on exit:
+    MongoDB is saved once, guests are deduplicated per worksheet, the Sheets
+    clients are set up once, and every touched worksheet is read, updated and
+    finalized (sort, checkboxes, formulas, format) exactly once.
+    
+        with SheetsSession() as session:
+            for venue in batch_data:
+                session.add_shows(batch_data[venue])
+    """
 
-def _extract_time_from_date(show_date):
-    """Extract time portion from show date string"""
-    import re
-    # Try to extract time patterns:
-    # - "8:30 PM" or "8:30 AM" (with colon and minutes)
-    # - "8pm" or "8am" (without colon)
-    # - "20:30" (24-hour format)
-    time_patterns = [
-        r'(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm))',  # 8:30 PM format
-        r'(\d{1,2}(?:AM|PM|am|pm))',           # 8pm format
-        r'(\d{2}:\d{2})'                       # 20:30 format
-    ]
-    
-    for pattern in time_patterns:
-        time_match = re.search(pattern, show_date)
-        if time_match:
-            return time_match.group(1)
-    
-    return ''
+    def __init__(self):
+        self._guests = []           # every guest, for MongoDB
+        self._worksheets = {}       # (venue, date part) -> {row hash: GuestRecord}
+        self._clients = None        # (directory, row index, creds), set up on first flush
+        self.committed = True       # False once any MongoDB or Sheets write has failed
 
-def _group_guests_by_venue_and_date(guest_data):
-    """Group guests by venue and show date for efficient processing"""
-    grouped = {}
-    
-    for guest in guest_data:
-        venue = guest.get('venue', '')
-        show_date = guest.get('show_date', '')
+    def add(self, guest_data):
+        """Queue GuestRecords (or guest dictionaries) for writing"""
+        for guest in guest_data:
+            record = GuestRecord.coerce(guest)
+            if record is None:
+                logger.warning(f"Skipping malformed guest: {guest}")
+                continue
+            self._guests.append(record)
+            key = (record.venue, _extract_date_part(record.show_date))
+            self._worksheets.setdefault(key, {}).setdefault(row_key(record.to_sheet_row()), record)
+
+    def add_shows(self, batch_data):
+        """Queue show-grouped guests: {"Show Name": [GuestRecord or legacy array, ...]}"""
+        for show_name, guests in batch_data.items():
+            logger.debug(f"Collecting {len(guests)} guests from show: {show_name}")
+            self.add(guests)
+
+    def _setup_clients(self):
+        if self._clients is None:
+            # Spreadsheets and worksheets are looked up by cached ID
+            gc, creds = _setup_google_sheets_client()
+            self._clients = (SheetDirectory(gc), RowHashIndex(), creds)
+        return self._clients
+
+    def flush(self):
+        """
+        Write everything queued so far.
         
-        # Clean up the show date to extract just the date part for grouping
-        date_part = _extract_date_part(show_date)
-        key = (venue, date_part)
+        :return: True if MongoDB and every worksheet write succeeded
+        """
+        if not self._guests:
+            return True
+        guests, worksheets = self._guests, self._worksheets
+        self._guests, self._worksheets = [], {}
+        logger.info(f"Starting efficient guest data insertion for {len(guests)} guests")
+        committed, self.committed = self.committed, False   # stays False if anything below raises
         
-        if key not in grouped:
-            grouped[key] = []
+        # Save to MongoDB (moved function); Sheets are still written if it fails
+        try:
+            save_comprehensive_data_to_mongodb(guests, raise_on_error=True)
+        except Exception as e:
+            logger.error(f"MongoDB save failed: {e}")
+            committed = False
+        logger.info(f"Grouped data into {len(worksheets)} venue/date combinations")
         
-        grouped[key].append(guest)
-    
-    return grouped
+        directory, row_index, creds = self._setup_clients()
+        
+        # Venues (spreadsheets) are written in parallel; shows within a venue stay in order
+        concurrency = config['sheets_writer_concurrency'] if config else DEFAULT_CONCURRENCY
+        queue_depth = config['sheets_writer_queue_depth'] if config else DEFAULT_QUEUE_DEPTH
+        futures = []
+        with SpreadsheetWriterPool(concurrency, queue_depth) as pool:
+            for (venue, show_date), show_guests in worksheets.items():
+                futures.append(pool.submit(venue, _process_venue_show_threaded, directory, row_index, creds,
+                                           venue, show_date, list(show_guests.values())))
+        
+        failed = sum(1 for future in futures if future.exception() is not None or not future.result())
+        if failed:
+            logger.error(f"{failed} of {len(futures)} worksheet writes failed")
+            committed = False
+        else:
+            logger.info("Efficient guest data insertion completed successfully")
+        self.committed = committed
+        return committed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        elif issubclass(exc_type, Exception):
+            # Write what was collected even if the run failed part way - fetchers may
+            # already have marked those orders as processed. A second failure here is
+            # only logged so the original exception is the one that propagates.
+            logger.error(f"Run failed ({exc}) - writing the {len(self._guests)} guests collected so far")
+            try:
+                self.flush()
+            except Exception as e:
+                self.committed = False
+                logger.error(f"Could not write the collected guests: {e}")
+        else:
+            # KeyboardInterrupt / SystemExit: stop without touching MongoDB or Sheets
+            self.committed = False
+            logger.error(f"Run interrupted - {len(self._guests)} collected guests not written")
+        return False
+
+def _process_venue_show_threaded(directory, row_index, creds, venue, show_date, guests):
+    """Writer pool entry point: process one show with this thread's Sheets service"""
+    return _process_venue_show_efficient(directory, _thread_sheets_service(creds), venue, show_date, guests, row_index)
 
 def _extract_date_part(show_date):
     """Extract date part from show date string"""
@@ -441,95 +383,127 @@ def _extract_date_part(show_date):
     # If no standard format found, return the original
     return show_date
 
-def _process_venue_show_efficient(gc, service, venue, show_date, guests):
-    """Process a single venue/show combination efficiently"""
+def _process_venue_show_efficient(directory, service, venue, show_date, guests, row_index=None):
+    """Process a single venue/show combination efficiently; returns True if the write succeeded"""
     try:
         # Get or create sheet and worksheet
-        sheet = _get_or_create_sheet(gc, venue)
-        worksheet = _get_or_create_worksheet(sheet, show_date)
-        
-        # Setup headers and definitions
-        headers = _setup_worksheet_headers(worksheet)
-        columns = _get_column_definitions(headers)
-        formulas = _create_formulas(columns)
-        
-        # Convert guests to row format for Google Sheets
-        guest_rows = _convert_guests_to_rows(guests)
+        sheet, sheet_title = _get_or_create_sheet(directory, venue)
+        worksheet, created = _get_or_create_worksheet(directory, sheet_title, sheet, show_date, len(guests))
         
-        # Batch insert all data at once (more efficient)
-        _batch_insert_guest_data(worksheet, guest_rows, headers)
+        # Steady state: the row index says what is already there, so append without reading
+        if not created and row_index is not None:
+            entry = row_index.get(sheet.id, worksheet.id)
+            if entry is not None:
+                try:
+                    _append_new_guests(service, sheet, worksheet, entry, _convert_guests_to_rows(guests), row_index)
+                    print(f"Successfully processed {len(guests)} guests for {venue} on {show_date}")
+                    return True
+                except HttpError as e:
+                    # Worksheet changed under the index (deleted, renamed, ...) - fall back to a full read
+                    logger.info(f"Append to '{worksheet.title}' failed ({e}) - re-reading the worksheet")
+                    row_index.forget(sheet.id, worksheet.id)
+                    directory.forget_worksheet(sheet_title, worksheet.title)
+                    worksheet, created = _get_or_create_worksheet(directory, sheet_title, sheet, show_date, len(guests))
         
-        # Sort and format data
-        _sort_data_by_firstname(worksheet, headers)
-        
-        # Add interactive elements and formulas
-        _add_checkboxes(worksheet, service, sheet, columns)
-        _add_formulas(worksheet, formulas, columns)
-        
-        # Final cleanup and formatting
-        _cleanup_and_format(worksheet, service, sheet, columns)
+        # Read the worksheet once; everything below works on the snapshot
+        for attempt in range(2):
+            if created:
+                snapshot = WorksheetSnapshot.empty(worksheet)
+            else:
+                try:
+                    snapshot = WorksheetSnapshot.load(worksheet)
+                except APIError as e:
+                    # Cached worksheet was deleted or renamed by hand - look it up again
+                    logger.info(f"Cached worksheet '{worksheet.title}' could not be read ({e}) - refreshing")
+                    directory.forget_worksheet(sheet_title, worksheet.title)
+                    worksheet, created = _get_or_create_worksheet(directory, sheet_title, sheet, show_date, len(guests))
+                    snapshot = WorksheetSnapshot.empty(worksheet) if created else WorksheetSnapshot.load(worksheet)
+            
+            # Setup headers and definitions
+            headers = _setup_worksheet_headers(snapshot)
+            columns = _get_column_definitions(headers)
+            formulas = _create_formulas(columns)
+            
+            # Convert guests to row format for Google Sheets
+            guest_rows = _convert_guests_to_rows(guests)
+            
+            # Deduplicate and insert, then sort
+            _batch_insert_guest_data(snapshot, guest_rows)
+            _sort_data_by_firstname(snapshot)
+            
+            # Rows, checkboxes, formulas and formatting all go out in one batchUpdate
+            builder = BatchUpdateBuilder(sheet.id)
+            snapshot.push(builder, columns['checkbox_column'])
+            _add_checkboxes(snapshot, builder, columns)
+            _add_formulas(snapshot, builder, formulas, columns)
+            _cleanup_and_format(snapshot, builder, columns)
+            try:
+                builder.execute(service)
+                break
+            except HttpError as e:
+                if attempt:
+                    raise
+                # The cached grid size is stale (rows deleted by hand, ...) - retry once with fresh properties
+                logger.info(f"Write to '{worksheet.title}' failed ({e}) - retrying with fresh worksheet properties")
+                directory.forget_worksheet(sheet_title, worksheet.title)
+                worksheet, created = _get_or_create_worksheet(directory, sheet_title, sheet, show_date, len(guests))
+        if snapshot.grid_row_count != worksheet.row_count:
+            directory.remember_worksheet(sheet_title, sheet, worksheet, snapshot.grid_row_count)
+        if row_index is not None:
+            row_index.replace(sheet.id, worksheet.id, snapshot.rows)
         
         print(f"Successfully processed {len(guests)} guests for {venue} on {show_date}")
+        return True
         
     except Exception as e:
         print(f"Error processing {venue} on {show_date}: {e}")
+        return False
+
+def _append_new_guests(service, sheet, worksheet, entry, guest_rows, row_index):
+    """
+    Append the guests missing from a worksheet's row index in one batchUpdate, sorting
+    on the server; the worksheet is never read. Raises HttpError if the write fails.
+    """
+    firstname_index = WORKSHEET_HEADERS.index("firstname")
+    new_rows = []
+    for row in guest_rows:
+        key = row_key(row)
+        if key in entry["keys"]:
+            continue
+        entry["keys"].add(key)
+        row = list(row)
+        if isinstance(row[firstname_index], str):
+            row[firstname_index] = row[firstname_index].capitalize()
+        new_rows.append(row)
+    
+    if not new_rows:
+        print("No new guests to insert (all were duplicates)")
+        return
+    print(f"Inserted {len(new_rows)} unique guests (skipped {len(guest_rows) - len(new_rows)} duplicates)")
+    
+    builder = BatchUpdateBuilder(sheet.id)
+    builder.append_cells(worksheet.id, [row + [False] for row in new_rows], checkbox_column=DATA_WIDTH - 1)
+    builder.sort_range(worksheet.id, 1, None, 0, DATA_WIDTH, firstname_index)
+    # Formulas use open-ended ranges; they only change when the first Guest List row arrives
+    if not entry["has_guest_list"] and any(row[3] == "Guest List" for row in new_rows):
+        formulas = _create_formulas(_get_column_definitions(WORKSHEET_HEADERS))
+        builder.set_values(worksheet.id, 0, WORKSHEET_HEADERS.index("total:") + 1, _formula_block(formulas, True))
+    builder.auto_resize_columns(worksheet.id, 0, worksheet.col_count)
+    builder.execute(service)
+    row_index.add(sheet.id, worksheet.id, new_rows)
 
 def _convert_guests_to_rows(guests):
-    """Convert guest dictionaries to row arrays for Google Sheets"""
-    rows = []
-    
-    for guest in guests:
-        # Convert to the expected array format for Google Sheets
-        # [venue, date, email, source, time, type, firstname, lastname, tickets]
-        row = [
-            guest.get('venue', ''),
-            guest.get('show_date', ''),
-            guest.get('email', ''),
-            guest.get('source', ''),
-            _extract_time_from_date(guest.get('show_date', '')),
-            guest.get('ticket_type', 'GA'),
-            guest.get('first_name', ''),
-            guest.get('last_name', ''),
-            int(guest.get('tickets', 1))
-        ]
-        rows.append(row)
-    
-    return rows
+    """Convert GuestRecords to row arrays for Google Sheets"""
+    # [venue, date, email, source, time, type, firstname, lastname, tickets]
+    return [guest.to_sheet_row() for guest in guests]
 
-def _batch_insert_guest_data(worksheet, guest_rows, headers):
-    """Efficiently insert guest data in batch with deduplication"""
+def _batch_insert_guest_data(snapshot, guest_rows):
+    """Add guest rows to the snapshot, skipping rows already in the worksheet"""
     if not guest_rows:
         return
     
-    # Ensure headers exist
-    all_values = worksheet.get_all_values()
-    if len(all_values) == 0:
-        worksheet.append_row(headers, 1)
-        existing_rows = []
-    else:
-        existing_rows = all_values[1:]  # Skip header
-    
-    # Create hash set from existing rows
-    existing_hashes = set()
-    for row in existing_rows:
-        if len(row) >= 7:  # Ensure row has enough columns
-            show_name = f"{row[0]} - {row[1]}" if len(row) > 1 else ""
-            row_hash = _generate_row_hash(row[6] if len(row) > 6 else "", row[7] if len(row) > 7 else "", row[2] if len(row) > 2 else "", row[3] if len(row) > 3 else "", show_name)
-            existing_hashes.add(row_hash)
-    
-    # Filter out duplicates
-    unique_rows = []
-    for row in guest_rows:
-        if len(row) >= 7:
-            show_name = f"{row[0]} - {row[1]}" if len(row) > 1 else ""
-            row_hash = _generate_row_hash(row[6] if len(row) > 6 else "", row[7] if len(row) > 7 else "", row[2] if len(row) > 2 else "", row[3] if len(row) > 3 else "", show_name)
-            if row_hash not in existing_hashes:
-                unique_rows.append(row)
-                existing_hashes.add(row_hash)
-    
-    # Insert only unique rows
-    if unique_rows:
-        worksheet.append_rows(unique_rows)
-        print(f"Inserted {len(unique_rows)} unique guests (skipped {len(guest_rows) - len(unique_rows)} duplicates)")
+    inserted = snapshot.add_rows(guest_rows)
+    if inserted:
+        print(f"Inserted {inserted} unique guests (skipped {len(guest_rows) - inserted} duplicates)")
     else:
         print("No new guests to insert (all were duplicates)")
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Guest list folder maintenance: hide past shows and sort worksheets by date
+Lists the folder once, then for each spreadsheet reads the worksheet properties
+with one field-masked get, works out locally which worksheets to hide (archive)
+and how to reorder the visible ones, and sends everything as one batchUpdate.
+Spreadsheets are processed in parallel; all calls go through the shared
+Google API rate limiter.
+
+With MongoDB configured, a run only touches spreadsheets modified since the last
+successful run (the watermark), plus those holding a show that has just become
+old enough to hide.
+"""
+
+import sys
+import logging
+import threading
+from datetime import datetime, timedelta
+from google.oauth2.service_account import Credentials
+from shared_config import load_project_config, get_mongo_client, get_google_service_account_path
+from googleApiLimiter import build_service
+from driveFolder import list_folder_spreadsheets
+from spreadsheetWriterPool import SpreadsheetWriterPool, DEFAULT_CONCURRENCY
+from showDate import parse_show_date
+from sheetDirectory import SHEETS_DB
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+SHEET_PROPERTY_FIELDS = 'sheets.properties(sheetId,title,index,hidden)'
+
+MAINTENANCE_STATE_COLLECTION = "folder_maintenance"
+# Drive modifiedTime and our clock can disagree slightly; re-list a little before the watermark
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+_thread_state = threading.local()
+
+def parse_datetime_from_title(title):
+    """Show datetime from a worksheet title like "Wednesday October 9th 8pm 2025", or None"""
+    show_date = parse_show_date(title)
+    if show_date is None or not show_date.date_found or not show_date.time_text:
+        return None
+    return show_date.local_datetime
+
+def hide_cutoff(now=None):
+    """Worksheets for shows before midnight yesterday get hidden"""
+    now = now or datetime.now()
+    return datetime.combine(now.date() - timedelta(days=1), datetime.min.time())
+
+def hide_due_at(show_datetime):
+    """First time hide_cutoff() passes a show, i.e. when its worksheet becomes due for hiding"""
+    return datetime.combine(show_datetime.date() + timedelta(days=2), datetime.min.time())
+
+def plan_changes(sheets, cutoff, hide=True, sort=True):
+    """
+    batchUpdate requests that hide worksheets older than cutoff and put the
+    visible ones in date order (undated titles first), from
+    sheets: list of sheet properties ({"sheetId", "title", "index", "hidden"}).
+
+    :return: (requests, titles hidden, when the next visible worksheet is due for hiding or None)
+    """
+    requests = []
+    hidden_titles = []
+    visible = []
+    for props in sorted(sheets, key=lambda props: props.get('index', 0)):
+        if props.get('hidden', False):
+            continue
+        show_datetime = parse_datetime_from_title(props['title'])
+        if hide and show_datetime and show_datetime < cutoff:
+            requests.append({
+                "updateSheetProperties": {
+                    "properties": {"sheetId": props['sheetId'], "hidden": True},
+                    "fields": "hidden"
+                }
+            })
+            hidden_titles.append(props['title'])
+        else:
+            visible.append((props, show_datetime or datetime.min))
+
+    dated = [show_datetime for _, show_datetime in visible if show_datetime != datetime.min]
+    next_hide_at = hide_due_at(min(dated)) if hide and dated else None
+
+    if sort:
+        ordered = sorted(visible, key=lambda item: item[1])
+        if [props['sheetId'] for props, _ in ordered] != [props['sheetId'] for props, _ in visible]:
+            requests.extend({
+                "updateSheetProperties": {
+                    "properties": {"sheetId": props['sheetId'], "index": index},
+                    "fields": "index"
+                }
+            } for index, (props, _) in enumerate(ordered))
+    return requests, hidden_titles, next_hide_at
+
+def _thread_sheets_service(creds):
+    """Sheets API service for the calling thread, built on first use"""
+    service = getattr(_thread_state, 'service', None)
+    if service is None:
+        service = _thread_state.service = build_service('sheets', 'v4', creds)
+    return service
+
+def maintain_spreadsheet(service, spreadsheet, cutoff, hide=True, sort=True):
+    """
+    Hide and sort the worksheets of one spreadsheet ({"id", "name"}) with one
+    metadata get and at most one batchUpdate.
+
+    :return: Dict with worksheets hidden, whether the order changed and the next hide time
+    """
+    metadata = service.spreadsheets().get(spreadsheetId=spreadsheet['id'], fields=SHEET_PROPERTY_FIELDS).execute()
+    sheets = [sheet['properties'] for sheet in metadata.get('sheets', [])]
+    requests, hidden_titles, next_hide_at = plan_changes(sheets, cutoff, hide, sort)
+    reordered = len(requests) > len(hidden_titles)
+    if requests:
+        service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet['id'], body={"requests": requests}).execute()
+        logger.info(f"{spreadsheet['name']}: hid {len(hidden_titles)} worksheets"
+                    f"{', reordered worksheets' if reordered else ''}")
+    else:
+        logger.info(f"{spreadsheet['name']}: nothing to change")
+    return {"hidden": len(hidden_titles), "reordered": reordered, "next_hide_at": next_hide_at}
+
+def _maintain_spreadsheet_threaded(creds, spreadsheet, cutoff, hide, sort):
+    return maintain_spreadsheet(_thread_sheets_service(creds), spreadsheet, cutoff, hide, sort)
+
+class MaintenanceState:
+    """
+    Watermark of the last successful run per folder and mode, and per spreadsheet
+    the time its next visible show becomes due for hiding. Without MongoDB every
+    run processes the whole folder.
+    """
+
+    def __init__(self, collection=None):
+        self._collection = collection
+
+    def _get_collection(self):
+        if self._collection is None:
+            config = load_project_config()
+            if not config or not config["mongo_uri"]:
+                return None
+            self._collection = get_mongo_client(config["mongo_uri"])[SHEETS_DB][MAINTENANCE_STATE_COLLECTION]
+        return self._collection
+
+    def last_run(self, run_key):
+        """UTC start time of the last fully successful run, or None"""
+        try:
+            collection = self._get_collection()
+            doc = collection.find_one({"_id": run_key}) if collection is not None else None
+        except Exception as e:
+            logger.warning(f"Could not read maintenance watermark {run_key}: {e}")
+            return None
+        return doc.get("last_run") if doc else None
+
+    def set_last_run(self, run_key, started_at):
+        try:
+            collection = self._get_collection()
+            if collection is not None:
+                collection.update_one({"_id": run_key}, {"$set": {"last_run": started_at}}, upsert=True)
+        except Exception as e:
+            logger.error(f"Could not save maintenance watermark {run_key}: {e}")
+
+    def due_for_hiding(self, folder_id, now):
+        """Spreadsheets ({"id", "name"}) with a visible show that is due for hiding by now"""
+        try:
+            collection = self._get_collection()
+            if collection is None:
+                return []
+            return [{"id": doc["spreadsheet_id"], "name": doc["name"]}
+                    for doc in collection.find({"folder_id": folder_id, "next_hide_at": {"$lte": now}})]
+        except Exception as e:
+            logger.warning(f"Could not read hide schedule for folder {folder_id}: {e}")
+            return []
+
+    def set_next_hide(self, folder_id, spreadsheet, next_hide_at):
+        try:
+            collection = self._get_collection()
+            if collection is not None:
+                collection.update_one({"_id": f"sheet:{spreadsheet['id']}"}, {"$set": {
+                    "folder_id": folder_id,
+                    "spreadsheet_id": spreadsheet['id'],
+                    "name": spreadsheet['name'],
+                    "next_hide_at": next_hide_at,
+                }}, upsert=True)
+        except Exception as e:
+            logger.error(f"Could not save hide schedule for {spreadsheet['name']}: {e}")
+
+def _run_key(folder_id, hide, sort):
+    return f"run:{folder_id}:{'hide' if hide else ''}{'sort' if sort else ''}"
+
+def maintain_folder(folder_id, hide=True, sort=True, creds=None, concurrency=None, state=None, full=False):
+    """
+    Hide past shows and sort worksheets in the folder's spreadsheets: those modified
+    since the last successful run and those with a show due for hiding, or every
+    spreadsheet when full is set or there is no watermark yet.
+
+    :return: Dict with spreadsheets listed, updated and failed, and worksheets hidden
+    """
+    config = load_project_config()
+    if creds is None:
+        creds = Credentials.from_service_account_file(get_google_service_account_path(), scopes=SCOPES)
+    if concurrency is None:
+        concurrency = config["sheets_writer_concurrency"] if config else DEFAULT_CONCURRENCY
+    state = state or MaintenanceState()
+
+    started_at = datetime.utcnow()
+    run_key = _run_key(folder_id, hide, sort)
+    last_run = None if full else state.last_run(run_key)
+    modified_after = last_run - WATERMARK_OVERLAP if last_run else None
+    files = list_folder_spreadsheets(build_service('drive', 'v3', creds), folder_id, modified_after)
+    if hide and last_run:
+        listed = {spreadsheet['id'] for spreadsheet in files}
+        files += [spreadsheet for spreadsheet in state.due_for_hiding(folder_id, datetime.now())
+                  if spreadsheet['id'] not in listed]
+    logger.info(f"{len(files)} spreadsheets to maintain"
+                f"{f' (changed since {modified_after:%Y-%m-%d %H:%M} UTC or due for hiding)' if last_run else ''}")
+
+    cutoff = hide_cutoff()
+    summary = {"spreadsheets": len(files), "updated": 0, "failed": 0, "hidden": 0}
+
+    with SpreadsheetWriterPool(concurrency=concurrency) as pool:
+        for spreadsheet in files:
+            pool.submit(spreadsheet['id'], _maintain_spreadsheet_threaded, creds, spreadsheet, cutoff, hide, sort)
+        futures = pool.wait()
+
+    for spreadsheet, future in zip(files, futures):
+        if future.exception() is not None:
+            summary["failed"] += 1
+            continue
+        result = future.result()
+        summary["hidden"] += result["hidden"]
+        if result["hidden"] or result["reordered"]:
+            summary["updated"] += 1
+        if hide:
+            state.set_next_hide(folder_id, spreadsheet, result["next_hide_at"])
+
+    # Only move the watermark when every spreadsheet went through, so failures are retried
+    if not summary["failed"]:
+        state.set_last_run(run_key, started_at)
+    return summary
+
+def main():
+    """Run folder maintenance on the guest list folder"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage: python3 maintainGoogleSheets.py [--no-hide] [--no-sort] [--full]")
+        print("\nOptions:")
+        print("  --no-hide   Leave past shows visible")
+        print("  --no-sort   Leave the worksheet order alone")
+        print("  --full      Process every spreadsheet, not just those changed since the last run")
+        return
+
+    config = load_project_config()
+    if not config or not config["guest_list_folder_id"]:
+        print("Error: Could not load GUEST_LIST_FOLDER_ID from environment")
+        return
+
+    summary = maintain_folder(config["guest_list_folder_id"],
+                              hide='--no-hide' not in sys.argv, sort='--no-sort' not in sys.argv,
+                              full='--full' in sys.argv)
+    print(f"Updated {summary['updated']} of {summary['spreadsheets']} spreadsheets "
+          f"({summary['hidden']} worksheets hidden, {summary['failed']} failed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+MongoDB Index Management for the per-source contact collections
+Declares the indexes backing the duplicate checks in batch_add_contacts_to_mongodb,
+ensures them once per process (and once per deploy via a marker document),
+and reports duplicate queries that still fall back to collection scans.
+"""
+
+import sys
+import logging
+from datetime import datetime
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+from shared_config import get_mongo_config, get_mongo_client
+
+logger = logging.getLogger(__name__)
+
+CONTACTS_DB = "guest_list_contacts"
+
+# Marker documents record which INDEX_VERSION each collection was last ensured at.
+# Bump INDEX_VERSION whenever CONTACT_INDEXES changes so the next deploy re-applies it.
+INDEX_MARKER_COLLECTION = "_index_versions"
+INDEX_VERSION = 1
+
+# Error codes returned by createIndex
+DUPLICATE_KEY_ERROR = 11000
+INDEX_CONFLICT_ERRORS = (85, 86)  # IndexOptionsConflict, IndexKeySpecsConflict
+
+# Queries slower than this are reported even when they use an index
+SLOW_QUERY_MS = 100
+
+# Indexes required on every per-source contact collection, one per duplicate rule.
+# transaction_id is not unique on its own (Squarespace line items share their order's id),
+# so uniqueness is enforced per show, and only for non-empty ids.
+CONTACT_INDEXES = [
+    {
+        "name": "transaction_id_show_name_unique",
+        "keys": [("transaction_id", ASCENDING), ("show_name", ASCENDING)],
+        "unique": True,
+        "partialFilterExpression": {"transaction_id": {"$type": "string", "$gt": ""}},
+    },
+    {
+        "name": "transaction_id",
+        "keys": [("transaction_id", ASCENDING)],
+        "unique": False,
+        "partialFilterExpression": {"transaction_id": {"$exists": True}},
+    },
+    {
+        "name": "order_id",
+        "keys": [("order_id", ASCENDING)],
+        "unique": False,
+        "partialFilterExpression": {"order_id": {"$exists": True}},
+    },
+    {
+        "name": "email_show_name",
+        "keys": [
+            ("email", ASCENDING),
+            ("show_date", ASCENDING),
+            ("venue", ASCENDING),
+            ("first_name", ASCENDING),
+            ("last_name", ASCENDING),
+        ],
+        "unique": False,
+    },
+    {
+        # Matches worksheet rows back to contacts (check-in sync)
+        "name": "row_hash",
+        "keys": [("row_hash", ASCENDING)],
+        "unique": False,
+        "partialFilterExpression": {"row_hash": {"$exists": True}},
+    },
+]
+
+# Collections in guest_list_contacts that do not hold contacts
+NON_CONTACT_COLLECTIONS = {"show_rollups", "people", "sync_state"}
+
+# Collections already ensured by this process
+_ensured_collections = set()
+
+def _create_index(collection, index_spec):
+    """Create one declared index, falling back to non-unique if existing data has duplicates"""
+    options = {"name": index_spec["name"]}
+    if index_spec.get("partialFilterExpression"):
+        options["partialFilterExpression"] = index_spec["partialFilterExpression"]
+
+    try:
+        collection.create_index(index_spec["keys"], unique=index_spec["unique"], **options)
+        return True
+    except OperationFailure as e:
+        if e.code == DUPLICATE_KEY_ERROR and index_spec["unique"]:
+            logger.warning(f"Collection '{collection.name}' has duplicate {index_spec['keys'][0][0]} values - "
+                           f"creating non-unique index instead: {e.details.get('errmsg', e) if e.details else e}")
+            options["name"] = index_spec["name"].replace("_unique", "")
+            collection.create_index(index_spec["keys"], unique=False, **options)
+            return True
+        if e.code in INDEX_CONFLICT_ERRORS:
+            logger.warning(f"Index '{index_spec['name']}' on '{collection.name}' conflicts with an existing index: {e}")
+            return False
+        raise
+
+def ensure_contact_indexes(collection, force=False):
+    """
+    Ensure the duplicate-check indexes exist on a contact collection.
+    Runs at most once per process per collection, and skips index creation
+    when the marker document shows this INDEX_VERSION was already applied.
+
+    :param collection: pymongo Collection in guest_list_contacts
+    :param force: Re-create indexes even if the marker is current
+    """
+    if collection.name in _ensured_collections and not force:
+        return
+
+    markers = collection.database[INDEX_MARKER_COLLECTION]
+    try:
+        marker = markers.find_one({"_id": collection.name})
+        if not force and marker and marker.get("version") == INDEX_VERSION:
+            _ensured_collections.add(collection.name)
+            return
+
+        all_created = True
+        for index_spec in CONTACT_INDEXES:
+            all_created = _create_index(collection, index_spec) and all_created
+
+        if all_created:
+            markers.replace_one(
+                {"_id": collection.name},
+                {"_id": collection.name, "version": INDEX_VERSION, "ensured_at": datetime.utcnow()},
+                upsert=True
+            )
+        _ensured_collections.add(collection.name)
+        logger.info(f"Ensured {len(CONTACT_INDEXES)} indexes on collection '{collection.name}'")
+    except Exception as e:
+        # Missing indexes only cost speed, so never block ingestion on them
+        logger.error(f"Error ensuring indexes on '{collection.name}': {e}")
+
+def contact_collection_names(db):
+    """Names of the per-source contact collections in guest_list_contacts"""
+    return [
+        name for name in db.list_collection_names()
+        if not name.startswith("_") and not name.startswith("system.") and name not in NON_CONTACT_COLLECTIONS
+    ]
+
+def _sample_duplicate_queries(collection):
+    """Build one representative query per duplicate rule from existing documents"""
+    queries = []
+    transaction_doc = collection.find_one({"transaction_id": {"$exists": True}}, {"transaction_id": 1})
+    if transaction_doc:
+        queries.append(("transaction_id", {"transaction_id": transaction_doc["transaction_id"]}))
+
+    order_doc = collection.find_one({"order_id": {"$exists": True}}, {"order_id": 1})
+    if order_doc:
+        queries.append(("order_id", {"order_id": order_doc["order_id"]}))
+
+    name_doc = collection.find_one({}, {"email": 1, "show_date": 1, "venue": 1, "first_name": 1, "last_name": 1})
+    if name_doc:
+        queries.append(("email_show_name", {
+            field: name_doc.get(field) for field in ["email", "show_date", "venue", "first_name", "last_name"]
+        }))
+    return queries
+
+def _plan_stages(plan):
+    """Flatten the stage names of an explain() winning plan"""
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages.extend(_plan_stages(plan["inputStage"]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    if "queryPlan" in plan:
+        stages.extend(_plan_stages(plan["queryPlan"]))
+    return stages
+
+def explain_duplicate_queries(collection, slow_ms=SLOW_QUERY_MS):
+    """
+    Explain the duplicate-check queries against a collection and report any
+    that scan the whole collection or run slower than slow_ms.
+
+    :return: List of report dicts, one per problematic query
+    """
+    problems = []
+    for rule, query in _sample_duplicate_queries(collection):
+        explanation = collection.find(query).explain()
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(winning_plan)
+        stats = explanation.get("executionStats", {})
+        elapsed_ms = stats.get("executionTimeMillis", 0)
+
+        if "COLLSCAN" in stages or elapsed_ms > slow_ms:
+            problems.append({
+                "collection": collection.name,
+                "rule": rule,
+                "stages": stages,
+                "execution_ms": elapsed_ms,
+                "docs_examined": stats.get("totalDocsExamined"),
+            })
+            logger.warning(f"Slow duplicate query on '{collection.name}' ({rule}): stages={stages}, {elapsed_ms}ms")
+    return problems
+
+def main():
+    """Ensure indexes on every contact collection; --explain also reports unindexed queries"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage: python3 mongoIndexes.py [--force] [--explain]")
+        print("\nOptions:")
+        print("  --force     Re-create indexes even if the marker document is current")
+        print("  --explain   Explain duplicate-check queries and report collection scans")
+        return
+
+    mongo_config = get_mongo_config()
+    if not mongo_config or not mongo_config["mongo_uri"]:
+        print("Error: Could not load MongoDB configuration from environment")
+        return
+
+    db = get_mongo_client(mongo_config["mongo_uri"])[CONTACTS_DB]
+    problems = []
+    for collection_name in contact_collection_names(db):
+        ensure_contact_indexes(db[collection_name], force='--force' in sys.argv)
+        if '--explain' in sys.argv:
+            problems.extend(explain_duplicate_queries(db[collection_name]))
+
+    if '--explain' in sys.argv:
+        if problems:
+            for problem in problems:
+                print(f"UNINDEXED/SLOW: {problem}")
+        else:
+            print("All duplicate-check queries are index-backed")
+
+if __name__ == "__main__":
+    main()
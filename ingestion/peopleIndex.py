@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Cross-source buyer identity index
+Maintains the people collection in guest_list_contacts: one document per buyer,
+found by any of its normalized emails or E.164 phones, holding every
+(source, contact _id, show) the buyer appears in across the per-source collections,
+keyed by contact _id.
+batch_add_contacts_to_mongodb adds references as contacts are written;
+run this script with --rebuild to recompute it, or --lookup to find one buyer.
+"""
+
+import re
+import sys
+import logging
+from datetime import datetime
+from pymongo import ASCENDING, UpdateOne
+from shared_config import get_mongo_config, get_mongo_client
+from mongoIndexes import contact_collection_names
+
+logger = logging.getLogger(__name__)
+
+CONTACTS_DB = "guest_list_contacts"
+PEOPLE_COLLECTION = "people"
+# Rebuilds are written here and renamed over PEOPLE_COLLECTION (the "_" prefix keeps it out of contact_collection_names)
+REBUILD_COLLECTION = "_people_rebuild"
+
+# Phone numbers without a country code are assumed to be US/Canada
+DEFAULT_COUNTRY_CODE = "1"
+
+# Set once the people indexes have been ensured by this process
+_people_indexes_ensured = False
+
+_NON_DIGITS_RE = re.compile(r'\D')
+
+def normalize_email(email):
+    """Lowercased, trimmed email, or None if it is not an email address"""
+    if not email or not isinstance(email, str):
+        return None
+    email = email.strip().lower()
+    return email if "@" in email else None
+
+def normalize_phone(phone):
+    """Phone number in E.164 form (e.g. '+14155550100'), or None if it cannot be normalized"""
+    if not phone:
+        return None
+    phone = str(phone).strip()
+    digits = _NON_DIGITS_RE.sub('', phone)
+    if phone.startswith('+'):
+        return f"+{digits}" if 8 <= len(digits) <= 15 else None
+    if len(digits) == 10:
+        return f"+{DEFAULT_COUNTRY_CODE}{digits}"
+    if len(digits) == 11 and digits.startswith(DEFAULT_COUNTRY_CODE):
+        return f"+{digits}"
+    return None
+
+def person_id(email=None, phone=None):
+    """
+    _id for a new person: 'email:<email>' when an email is known, else 'phone:<E.164>',
+    else None. An existing person found by any email or phone keeps its own _id.
+    """
+    email = normalize_email(email)
+    if email:
+        return f"email:{email}"
+    phone = normalize_phone(phone)
+    if phone:
+        return f"phone:{phone}"
+    return None
+
+def add_person_ref(people_refs, contact_doc, source=None):
+    """
+    Accumulate a reference to a stored contact into
+    people_refs: {person _id: {"emails", "phones", "names", "contacts": {contact _id: ref}}}.
+    Contacts without an email or phone (e.g. DoMORE guest lists) are skipped.
+    """
+    email = normalize_email(contact_doc.get("email"))
+    phone = normalize_phone(contact_doc.get("phone"))
+    key = person_id(email, phone)
+    if key is None or contact_doc.get("_id") is None:
+        return
+
+    person = people_refs.setdefault(key, {"emails": set(), "phones": set(), "names": set(), "contacts": {}})
+    if email:
+        person["emails"].add(email)
+    if phone:
+        person["phones"].add(phone)
+    name = f"{contact_doc.get('first_name') or ''} {contact_doc.get('last_name') or ''}".strip()
+    if name:
+        person["names"].add(name)
+    # Keyed by contact, so a contact whose show changed replaces its old reference
+    person["contacts"][str(contact_doc["_id"])] = {
+        "source": source or contact_doc.get("source"),
+        "contact_id": contact_doc["_id"],
+        "show_name": contact_doc.get("show_name"),
+        "show_datetime": contact_doc.get("show_datetime"),
+    }
+
+def ensure_people_indexes(db, collection_name=PEOPLE_COLLECTION):
+    """Index the point lookups by email and phone (multikey over each person's arrays)"""
+    global _people_indexes_ensured
+    if collection_name == PEOPLE_COLLECTION:
+        _people_indexes_ensured = True
+    collection = db[collection_name]
+    collection.create_index([("emails", ASCENDING)], name="emails")
+    collection.create_index([("phones", ASCENDING)], name="phones")
+
+def _merge_people(db, people_refs, lookup=True):
+    """
+    Combine accumulated people that share an email or phone with a stored person
+    or with each other, so one buyer seen with and without an email stays one person.
+
+    :param lookup: Look up stored people (False when building into an empty collection)
+    :return: {target person _id: merged person}
+    """
+    clauses = []
+    if lookup:
+        emails = set().union(*(person["emails"] for person in people_refs.values()))
+        phones = set().union(*(person["phones"] for person in people_refs.values()))
+        if emails:
+            clauses.append({"emails": {"$in": sorted(emails)}})
+        if phones:
+            clauses.append({"phones": {"$in": sorted(phones)}})
+
+    # Identifier ('email:...' / 'phone:...') -> _id of the person that owns it
+    owners = {}
+    if clauses:
+        for doc in db[PEOPLE_COLLECTION].find({"$or": clauses}, {"emails": 1, "phones": 1}):
+            for email in doc.get("emails", []):
+                owners.setdefault(f"email:{email}", doc["_id"])
+            for phone in doc.get("phones", []):
+                owners.setdefault(f"phone:{phone}", doc["_id"])
+
+    merged = {}
+    # Email-keyed people first, so phone-only contacts attach to the buyer with that phone
+    for key in sorted(people_refs):
+        person = people_refs[key]
+        identifiers = [f"email:{email}" for email in sorted(person["emails"])] + \
+                      [f"phone:{phone}" for phone in sorted(person["phones"])]
+        target = next((owners[identifier] for identifier in identifiers if identifier in owners), key)
+        for identifier in identifiers:
+            owners.setdefault(identifier, target)
+        into = merged.setdefault(target, {"emails": set(), "phones": set(), "names": set(), "contacts": {}})
+        for field in ("emails", "phones", "names"):
+            into[field].update(person[field])
+        into["contacts"].update(person["contacts"])
+    return merged
+
+def apply_people_refs(db, people_refs):
+    """Upsert accumulated references into people with one lookup and one unordered bulk write"""
+    if not people_refs:
+        return 0
+    if not _people_indexes_ensured:
+        ensure_people_indexes(db)
+
+    operations = []
+    now = datetime.utcnow()
+    for key, person in _merge_people(db, people_refs).items():
+        update_fields = {f"contacts.{contact_id}": ref for contact_id, ref in person["contacts"].items()}
+        update_fields["updated_at"] = now
+        operations.append(UpdateOne(
+            {"_id": key},
+            {
+                "$addToSet": {
+                    "emails": {"$each": sorted(person["emails"])},
+                    "phones": {"$each": sorted(person["phones"])},
+                    "names": {"$each": sorted(person["names"])},
+                },
+                "$set": update_fields,
+                "$setOnInsert": {"created_at": now},
+            },
+            upsert=True
+        ))
+    db[PEOPLE_COLLECTION].bulk_write(operations, ordered=False)
+    return len(operations)
+
+def find_person(db, email=None, phone=None):
+    """Single indexed read of a buyer by email or phone; None if unknown"""
+    email = normalize_email(email)
+    if email:
+        person = db[PEOPLE_COLLECTION].find_one({"emails": email})
+        if person:
+            return person
+    phone = normalize_phone(phone)
+    if phone:
+        return db[PEOPLE_COLLECTION].find_one({"phones": phone})
+    return None
+
+def rebuild_people(db, contact_collections):
+    """
+    Recompute people from scratch by streaming every contact collection. The new
+    people are built in a separate collection and renamed into place, so readers
+    never see a partial or empty people collection.
+
+    :return: Number of people documents written
+    """
+    people_refs = {}
+    fields = {"email": 1, "phone": 1, "first_name": 1, "last_name": 1, "source": 1, "show_name": 1, "show_datetime": 1}
+    for collection_name in contact_collections:
+        for contact_doc in db[collection_name].find({}, fields):
+            add_person_ref(people_refs, contact_doc, collection_name)
+
+    now = datetime.utcnow()
+    people = []
+    for key, person in _merge_people(db, people_refs, lookup=False).items():
+        people.append({
+            "_id": key,
+            "emails": sorted(person["emails"]),
+            "phones": sorted(person["phones"]),
+            "names": sorted(person["names"]),
+            "contacts": person["contacts"],
+            "created_at": now,
+            "updated_at": now,
+        })
+
+    rebuild = db[REBUILD_COLLECTION]
+    rebuild.drop()
+    if people:
+        rebuild.insert_many(people, ordered=False)
+        ensure_people_indexes(db, REBUILD_COLLECTION)
+        rebuild.rename(PEOPLE_COLLECTION, dropTarget=True)
+    else:
+        db[PEOPLE_COLLECTION].delete_many({})
+    ensure_people_indexes(db)
+    return len(people)
+
+def main():
+    """Rebuild the people collection or look up one buyer"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if '--help' in sys.argv or '-h' in sys.argv or len(sys.argv) == 1:
+        print("Usage: python3 peopleIndex.py [--rebuild] [--lookup EMAIL_OR_PHONE]")
+        print("\nOptions:")
+        print("  --rebuild          Recompute the people collection from the contact collections")
+        print("  --lookup VALUE     Print every show a buyer appears in, by email or phone")
+        return
+
+    mongo_config = get_mongo_config()
+    if not mongo_config or not mongo_config["mongo_uri"]:
+        print("Error: Could not load MongoDB configuration from environment")
+        return
+
+    db = get_mongo_client(mongo_config["mongo_uri"])[CONTACTS_DB]
+
+    if '--rebuild' in sys.argv:
+        collections = contact_collection_names(db)
+        count = rebuild_people(db, collections)
+        print(f"Rebuilt {count} people from {len(collections)} contact collections")
+
+    if '--lookup' in sys.argv:
+        idx = sys.argv.index('--lookup')
+        value = sys.argv[idx + 1] if idx + 1 < len(sys.argv) else ''
+        person = find_person(db, email=value, phone=value)
+        if not person:
+            print(f"No buyer found for {value}")
+            return
+        print(f"{', '.join(person.get('names', []))} - {', '.join(person.get('emails', []) + person.get('phones', []))}")
+        for ref in person.get("contacts", {}).values():
+            print(f"  {ref.get('source')}: {ref.get('show_name')}")
+
+if __name__ == "__main__":
+    main()
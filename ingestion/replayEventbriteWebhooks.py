@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Local stub for the Eventbrite webhook receiver
+Posts recorded webhook payloads (JSON files holding one payload or a list of
+them), or payloads built for given order IDs, to a running
+eventbriteWebhooks.py, the way Eventbrite would. Run the receiver with
+--debug-only to see the extracted guests without writing anything.
+"""
+
+import sys
+import json
+import logging
+from shared_config import load_project_config
+from httpClient import get_http_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8085
+
+def order_payload(order_id, action="order.placed"):
+    """A webhook payload as Eventbrite sends it for an order"""
+    return {
+        "config": {"action": action, "endpoint_url": "", "user_id": "", "webhook_id": ""},
+        "api_url": f"https://www.eventbriteapi.com/v3/orders/{order_id}/",
+    }
+
+def load_payloads(path):
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+def replay(url, payloads):
+    """
+    POST each payload to url.
+
+    :return: Number of payloads the receiver did not accept
+    """
+    client = get_http_client()
+    rejected = 0
+    for payload in payloads:
+        action = (payload.get('config') or {}).get('action')
+        response = client.post(url, json=payload)
+        print(f"{action} {payload.get('api_url')}: HTTP {response.status_code} {response.text.strip()}")
+        if response.status_code != 200:
+            rejected += 1
+    return rejected
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if '--help' in sys.argv or '-h' in sys.argv or len(sys.argv) < 2:
+        print("Usage: python3 replayEventbriteWebhooks.py [PAYLOAD.json ...] [--order=ID ...] "
+              "[--action=order.updated] [--url=URL]")
+        print("\nOptions:")
+        print("  PAYLOAD.json   Recorded webhook payload (or list of payloads) to post")
+        print("  --order=ID     Post a payload for this Eventbrite order ID")
+        print("  --action=NAME  Action for --order payloads (default: order.placed)")
+        print("  --url=URL      Receiver URL (default: http://localhost:EVENTBRITE_WEBHOOK_PORT/eventbrite"
+              "?token=EVENTBRITE_WEBHOOK_TOKEN)")
+        return
+
+    config = load_project_config()
+    url = None
+    action = "order.placed"
+    order_ids = []
+    payloads = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('--url='):
+            url = arg.split('=', 1)[1]
+        elif arg.startswith('--action='):
+            action = arg.split('=', 1)[1]
+        elif arg.startswith('--order='):
+            order_ids.append(arg.split('=', 1)[1])
+        elif not arg.startswith('--'):
+            try:
+                payloads.extend(load_payloads(arg))
+            except (IOError, ValueError) as e:
+                print(f"Error: could not read payloads from {arg}: {e}")
+                sys.exit(1)
+    payloads.extend(order_payload(order_id, action) for order_id in order_ids)
+
+    if url is None:
+        port = config['eventbrite_webhook_port'] if config else DEFAULT_PORT
+        token = config['eventbrite_webhook_token'] if config else None
+        url = f"http://localhost:{port}/eventbrite" + (f"?token={token}" if token else "")
+
+    rejected = replay(url, payloads)
+    print(f"Posted {len(payloads)} webhooks ({rejected} rejected)")
+    sys.exit(1 if rejected else 0)
+
+if __name__ == "__main__":
+    main()
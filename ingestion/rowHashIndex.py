@@ -0,0 +1,154 @@
+"""
+RowHashIndex - keys of the guest rows already written to each worksheet
+Stored per (spreadsheet ID, sheetId) in MongoDB, so the Sheets writer can drop
+duplicate guests and append new ones without reading the worksheet first.
+An entry is trusted for ROW_INDEX_RECONCILE_HOURS after the worksheet was last
+read in full; after that the writer re-reads the worksheet and rebuilds the entry,
+which picks up rows edited or deleted by hand.
+"""
+
+import hmac
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta
+from shared_config import load_project_config, get_mongo_client
+from sheetDirectory import SHEETS_DB
+
+logger = logging.getLogger(__name__)
+
+ROW_INDEX_COLLECTION = "row_hashes"
+DEFAULT_RECONCILE_HOURS = 24
+# Holds the generated hash key when ROW_HASH_KEY is not configured
+SETTINGS_COLLECTION = "settings"
+ROW_HASH_KEY_SETTING = "row_hash_key"
+
+# Unit separator between fields, so ("ab", "c") and ("a", "bc") hash differently
+_FIELD_SEPARATOR = "\x1f"
+
+_row_hash_key = None
+
+def _stored_key(config):
+    """
+    The hash key stored in MongoDB, generated on first use, so an unset ROW_HASH_KEY
+    never falls back to a key anyone can read. Without MongoDB the key lasts one run.
+    """
+    key = secrets.token_hex(32)
+    try:
+        if not config or not config["mongo_uri"]:
+            raise RuntimeError("MONGO_URI not configured")
+        settings = get_mongo_client(config["mongo_uri"])[SHEETS_DB][SETTINGS_COLLECTION]
+        # $setOnInsert keeps the key of whichever process stored one first
+        settings.update_one({"_id": ROW_HASH_KEY_SETTING}, {"$setOnInsert": {"value": key}}, upsert=True)
+        key = settings.find_one({"_id": ROW_HASH_KEY_SETTING})["value"]
+        logger.warning(f"ROW_HASH_KEY is not set - using the key stored in {SHEETS_DB}.{SETTINGS_COLLECTION}")
+    except Exception as e:
+        logger.warning(f"ROW_HASH_KEY is not set and no key could be stored ({e}) - using a key for this run only")
+    return key
+
+def _key():
+    global _row_hash_key
+    if _row_hash_key is None:
+        config = load_project_config()
+        key = config["row_hash_key"] if config and config["row_hash_key"] else _stored_key(config)
+        _row_hash_key = key.encode()
+    return _row_hash_key
+
+def row_key(row):
+    """
+    Keyed hash (HMAC-SHA256) identifying a worksheet guest row by first name, last name,
+    email, source and show ([venue, date, email, source, time, type, firstname, lastname, ...])
+    """
+    def field(index):
+        return str(row[index]).lower().strip() if len(row) > index and row[index] is not None else ""
+    message = _FIELD_SEPARATOR.join([field(6), field(7), field(2), field(3), f"{field(0)} - {field(1)}"])
+    return hmac.new(_key(), message.encode(), hashlib.sha256).hexdigest()[:32]
+
+def _key_id():
+    """Fingerprint of the hash key, so entries hashed with another key are never trusted"""
+    return hmac.new(_key(), b"row-index", hashlib.sha256).hexdigest()[:8]
+
+def _has_guest_list(rows):
+    return any(len(row) > 3 and row[3] == "Guest List" for row in rows)
+
+class RowHashIndex:
+    """Per-worksheet row keys; safe to share between writer threads"""
+
+    def __init__(self, collection=None, reconcile_hours=None):
+        self._collection = collection
+        if reconcile_hours is None:
+            config = load_project_config()
+            reconcile_hours = config["row_index_reconcile_hours"] if config else DEFAULT_RECONCILE_HOURS
+        self.reconcile_after = timedelta(hours=reconcile_hours)
+
+    def _get_collection(self):
+        if self._collection is None:
+            config = load_project_config()
+            if not config or not config["mongo_uri"]:
+                return None
+            self._collection = get_mongo_client(config["mongo_uri"])[SHEETS_DB][ROW_INDEX_COLLECTION]
+        return self._collection
+
+    @staticmethod
+    def _id(spreadsheet_id, sheet_id):
+        return f"{spreadsheet_id}:{sheet_id}"
+
+    def get(self, spreadsheet_id, sheet_id):
+        """
+        The worksheet's entry as {"keys": set, "has_guest_list": bool}, or None if there
+        is none or it is due for reconciling (the caller should then read the worksheet).
+        """
+        try:
+            collection = self._get_collection()
+            doc = collection.find_one({"_id": self._id(spreadsheet_id, sheet_id)}) if collection is not None else None
+        except Exception as e:
+            logger.warning(f"Could not read row index for worksheet {sheet_id}: {e}")
+            return None
+        if not doc or doc.get("key_id") != _key_id() or not doc.get("reconciled_at"):
+            return None
+        if datetime.utcnow() - doc["reconciled_at"] > self.reconcile_after:
+            return None
+        return {"keys": set(doc.get("keys", [])), "has_guest_list": doc.get("has_guest_list", False)}
+
+    def replace(self, spreadsheet_id, sheet_id, rows):
+        """Rebuild an entry from every guest row of a worksheet that was just read in full"""
+        try:
+            collection = self._get_collection()
+            if collection is None:
+                return
+            now = datetime.utcnow()
+            collection.replace_one({"_id": self._id(spreadsheet_id, sheet_id)}, {
+                "_id": self._id(spreadsheet_id, sheet_id),
+                "spreadsheet_id": spreadsheet_id,
+                "sheet_id": sheet_id,
+                "key_id": _key_id(),
+                "keys": sorted({row_key(row) for row in rows}),
+                "has_guest_list": _has_guest_list(rows),
+                "reconciled_at": now,
+                "updated_at": now,
+            }, upsert=True)
+        except Exception as e:
+            logger.warning(f"Could not save row index for worksheet {sheet_id}: {e}")
+
+    def add(self, spreadsheet_id, sheet_id, rows):
+        """Record rows appended without reading the worksheet"""
+        update = {
+            "$addToSet": {"keys": {"$each": [row_key(row) for row in rows]}},
+            "$set": {"updated_at": datetime.utcnow()},
+        }
+        if _has_guest_list(rows):
+            update["$set"]["has_guest_list"] = True
+        try:
+            self._get_collection().update_one({"_id": self._id(spreadsheet_id, sheet_id)}, update)
+        except Exception as e:
+            # A stale entry would let the next run append these rows again
+            logger.warning(f"Could not update row index for worksheet {sheet_id}, dropping it: {e}")
+            self.forget(spreadsheet_id, sheet_id)
+
+    def forget(self, spreadsheet_id, sheet_id):
+        try:
+            collection = self._get_collection()
+            if collection is not None:
+                collection.delete_one({"_id": self._id(spreadsheet_id, sheet_id)})
+        except Exception as e:
+            logger.error(f"Could not drop row index for worksheet {sheet_id}: {e}")
@@ -6,7 +6,10 @@ Provides fool-proof configuration loading from environment variables
 
 import os
 import sys
+import atexit
+import threading
 from dotenv import load_dotenv
+from pymongo import MongoClient, monitoring
 import logging
 
 logger = logging.getLogger(__name__)
@@ -38,23 +41,47 @@ def load_project_config():
             # MongoDB Configuration
             'mongo_uri': os.getenv('MONGO_URI'),
             'partner_id': os.getenv('PARTNER_ID'),
+            'mongo_max_pool_size': int(os.getenv('MONGO_MAX_POOL_SIZE', 10)),
+            'mongo_min_pool_size': int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+            'mongo_connect_timeout_ms': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 10000)),
+            'mongo_server_selection_timeout_ms': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000)),
+            'mongo_socket_timeout_ms': int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 60000)),
             
             # Google Configuration
             'google_service_account_file': os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE'),
             'gmail_oauth_credentials_file': os.getenv('GMAIL_OAUTH_CREDENTIALS_FILE'),
             'gmail_token_path': os.getenv('GMAIL_TOKEN_PATH'),
             'guest_list_folder_id': os.getenv('GUEST_LIST_FOLDER_ID'),
+            'sheets_writer_concurrency': int(os.getenv('SHEETS_WRITER_CONCURRENCY', 4)),
+            'sheets_writer_queue_depth': int(os.getenv('SHEETS_WRITER_QUEUE_DEPTH', 32)),
+            'row_index_reconcile_hours': float(os.getenv('ROW_INDEX_RECONCILE_HOURS', 24)),
+            'row_hash_key': os.getenv('ROW_HASH_KEY'),
+            'google_sheets_reads_per_minute': int(os.getenv('GOOGLE_SHEETS_READS_PER_MINUTE', 60)),
+            'google_sheets_writes_per_minute': int(os.getenv('GOOGLE_SHEETS_WRITES_PER_MINUTE', 60)),
+            'google_drive_requests_per_minute': int(os.getenv('GOOGLE_DRIVE_REQUESTS_PER_MINUTE', 12000)),
+            'gmail_units_per_minute': int(os.getenv('GMAIL_UNITS_PER_MINUTE', 15000)),
             
             # API Keys
             'eventbrite_org_id': os.getenv('EVENTBRITE_ORGANIZATION_ID'),
             'eventbrite_token': os.getenv('EVENTBRITE_PRIVATE_TOKEN'),
             'squarespace_api_key': os.getenv('SQUARESPACE_API_KEY'),
+            'http_connect_timeout': float(os.getenv('HTTP_CONNECT_TIMEOUT', 5)),
+            'http_read_timeout': float(os.getenv('HTTP_READ_TIMEOUT', 30)),
+            'http_max_retries': int(os.getenv('HTTP_MAX_RETRIES', 5)),
+            'http_per_host_concurrency': int(os.getenv('HTTP_PER_HOST_CONCURRENCY', 4)),
+            'eventbrite_cache_file': os.getenv('EVENTBRITE_CACHE_FILE', os.path.join(project_root, 'cache', 'eventbrite_cache.json')),
+            'eventbrite_event_ttl_hours': float(os.getenv('EVENTBRITE_EVENT_TTL_HOURS', 24)),
+            'eventbrite_cache_max_events': int(os.getenv('EVENTBRITE_CACHE_MAX_EVENTS', 500)),
+            'eventbrite_webhook_port': int(os.getenv('EVENTBRITE_WEBHOOK_PORT', 8085)),
+            'eventbrite_webhook_token': os.getenv('EVENTBRITE_WEBHOOK_TOKEN'),
+            'eventbrite_webhook_queue_file': os.getenv('EVENTBRITE_WEBHOOK_QUEUE_FILE', os.path.join(project_root, 'cache', 'eventbrite_webhooks.sqlite3')),
             
             # Script Configuration
             'script_interval': int(os.getenv('SCRIPT_INTERVAL', 10)),
             'gmail_script_interval_hours': int(os.getenv('GMAIL_SCRIPT_INTERVAL_HOURS', 1)),
             'gmail_script_interval_hours_test': int(os.getenv('GMAIL_SCRIPT_INTERVAL_HOURS_TEST', 70)),
             'gmail_script_interval_minutes_fever': int(os.getenv('GMAIL_SCRIPT_INTERVAL_MINUTES_FEVER', 60)),
+            'sync_overlap_minutes': int(os.getenv('SYNC_OVERLAP_MINUTES', 5)),
             
             # Legacy config file path
             'bucketlist_config_file': os.getenv('BUCKETLIST_CONFIG_FILE'),
@@ -84,6 +111,88 @@ def get_mongo_config():
         'partner_id': config['partner_id'],
     }
 
+class _ConnectionCounter(monitoring.ConnectionPoolListener):
+    """Counts pooled connections opened (each one is a TCP + TLS handshake)"""
+
+    def __init__(self):
+        self.connections_created = 0
+
+    def connection_created(self, event):
+        self.connections_created += 1
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): pass
+    def connection_checked_out(self, event): pass
+    def connection_checked_in(self, event): pass
+
+# Process-wide MongoDB clients keyed by URI (normally just one)
+_mongo_clients = {}
+_mongo_clients_lock = threading.Lock()
+_connection_counter = _ConnectionCounter()
+_mongo_stats = {'clients_created': 0}
+
+def get_mongo_client(mongo_uri=None):
+    """
+    Get the shared, lazily-created MongoClient for this process.
+    Pool size and timeouts come from the MONGO_* environment settings.
+    The client is closed automatically at exit - callers must not close it.
+
+    :param mongo_uri: Optional URI override (defaults to MONGO_URI from .env)
+    """
+    # Fast path: reuse the existing client without reloading configuration
+    if mongo_uri in _mongo_clients:
+        return _mongo_clients[mongo_uri]
+
+    config = load_project_config()
+    if mongo_uri is None:
+        mongo_uri = config['mongo_uri'] if config else None
+    if not mongo_uri:
+        raise ValueError("MONGO_URI not found in configuration")
+
+    with _mongo_clients_lock:
+        client = _mongo_clients.get(mongo_uri)
+        if client is None:
+            client = MongoClient(
+                mongo_uri,
+                maxPoolSize=config['mongo_max_pool_size'] if config else 10,
+                minPoolSize=config['mongo_min_pool_size'] if config else 0,
+                connectTimeoutMS=config['mongo_connect_timeout_ms'] if config else 10000,
+                serverSelectionTimeoutMS=config['mongo_server_selection_timeout_ms'] if config else 10000,
+                socketTimeoutMS=config['mongo_socket_timeout_ms'] if config else 60000,
+                event_listeners=[_connection_counter]
+            )
+            _mongo_clients[mongo_uri] = client
+            _mongo_stats['clients_created'] += 1
+            logger.info("Created shared MongoDB client")
+        return client
+
+def get_mongo_connection_stats():
+    """Return how many clients and pooled connections this run has opened"""
+    return {
+        'clients_created': _mongo_stats['clients_created'],
+        'connections_created': _connection_counter.connections_created,
+    }
+
+def close_mongo_clients():
+    """Close every shared MongoDB client and log the run's connection counts"""
+    with _mongo_clients_lock:
+        if not _mongo_clients:
+            return
+        stats = get_mongo_connection_stats()
+        for client in _mongo_clients.values():
+            client.close()
+        _mongo_clients.clear()
+    logger.info(f"MongoDB connections this run: {stats['clients_created']} client(s), "
+                f"{stats['connections_created']} pooled connection(s) opened")
+
+atexit.register(close_mongo_clients)
+
 def get_google_service_account_path():
     """Get absolute path to Google service account file"""
     config = load_project_config()
@@ -0,0 +1,215 @@
+"""
+SheetDirectory - cached lookup of venue spreadsheets and show worksheets
+Maps "CITY-Venue" spreadsheet titles to spreadsheet IDs and (spreadsheet, worksheet
+title) to worksheet properties, persisted in MongoDB so warm runs open spreadsheets
+with open_by_key instead of a Drive search by title, and find worksheets without
+re-fetching spreadsheet metadata. Entries are dropped when Google returns 404.
+"""
+
+import logging
+import threading
+from datetime import datetime
+from http import HTTPStatus
+import gspread
+from gspread.exceptions import APIError, SpreadsheetNotFound, WorksheetNotFound
+from shared_config import get_mongo_config, get_mongo_client
+
+logger = logging.getLogger(__name__)
+
+SHEETS_DB = "google_sheets"
+SHEET_ID_COLLECTION = "sheet_ids"
+
+def _worksheet_properties(worksheet, row_count=None):
+    """The worksheet properties needed to rebuild a Worksheet without a metadata fetch"""
+    return {
+        "sheetId": worksheet.id,
+        "title": worksheet.title,
+        "index": worksheet.index,
+        "gridProperties": {
+            "rowCount": row_count if row_count is not None else worksheet.row_count,
+            "columnCount": worksheet.col_count,
+        },
+    }
+
+class _OpenedSpreadsheet(gspread.Spreadsheet):
+    """
+    A Spreadsheet that keeps the full metadata gspread fetches when opening it,
+    so the first worksheet lookup does not fetch it a second time
+    """
+
+    def fetch_sheet_metadata(self, params=None):
+        metadata = super().fetch_sheet_metadata(params)
+        if params is None and not hasattr(self, "opened_metadata"):
+            self.opened_metadata = metadata
+        return metadata
+
+class SheetDirectory:
+    """
+    Spreadsheet and worksheet lookups for one gspread client. Safe to share between
+    writer threads as long as each spreadsheet title is handled by one thread at a time.
+    """
+
+    def __init__(self, gc, collection=None):
+        self.gc = gc
+        self._collection = collection
+        self._entries = None        # title -> {"spreadsheet_id", "worksheets": {title: properties}}
+        self._spreadsheets = {}     # title -> opened Spreadsheet (one metadata fetch per run)
+        self._metadata_loaded = set()  # spreadsheet IDs whose full worksheet list was fetched this run
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        """Read the persisted cache once per process"""
+        if self._entries is not None:
+            return
+        with self._load_lock:
+            if self._entries is None:
+                self._load_entries()
+
+    def _load_entries(self):
+        entries = {}
+        try:
+            if self._collection is None:
+                mongo_config = get_mongo_config()
+                if not mongo_config or not mongo_config["mongo_uri"]:
+                    self._entries = entries
+                    return
+                self._collection = get_mongo_client(mongo_config["mongo_uri"])[SHEETS_DB][SHEET_ID_COLLECTION]
+            for doc in self._collection.find({}):
+                entries[doc["_id"]] = {
+                    "spreadsheet_id": doc.get("spreadsheet_id"),
+                    "worksheets": {ws["title"]: ws for ws in doc.get("worksheets", [])},
+                }
+            logger.info(f"Loaded {len(entries)} cached spreadsheet IDs")
+        except Exception as e:
+            # Without the cache every lookup falls back to Drive search and metadata reads
+            logger.warning(f"Could not load spreadsheet ID cache: {e}")
+            self._collection = None
+        self._entries = entries
+
+    def _save(self, title):
+        if self._collection is None:
+            return
+        entry = self._entries.get(title)
+        try:
+            if entry is None:
+                self._collection.delete_one({"_id": title})
+            else:
+                self._collection.replace_one({"_id": title}, {
+                    "_id": title,
+                    "spreadsheet_id": entry["spreadsheet_id"],
+                    "worksheets": list(entry["worksheets"].values()),
+                    "updated_at": datetime.utcnow(),
+                }, upsert=True)
+        except Exception as e:
+            logger.warning(f"Could not update spreadsheet ID cache for '{title}': {e}")
+
+    def _open_by_key(self, spreadsheet_id):
+        """gc.open_by_key, keeping the metadata fetched while opening"""
+        try:
+            return _OpenedSpreadsheet(self.gc.http_client, {"id": spreadsheet_id})
+        except APIError as e:
+            if e.response.status_code == HTTPStatus.NOT_FOUND:
+                raise SpreadsheetNotFound(e.response) from e
+            raise
+
+    def open(self, title):
+        """
+        Open a spreadsheet by title, by cached ID when known.
+
+        :raises SpreadsheetNotFound: if no spreadsheet has this title
+        """
+        if title in self._spreadsheets:
+            return self._spreadsheets[title]
+        self._load()
+
+        sheet = None
+        entry = self._entries.get(title)
+        if entry and entry.get("spreadsheet_id"):
+            try:
+                sheet = self._open_by_key(entry["spreadsheet_id"])
+            except SpreadsheetNotFound:
+                logger.info(f"Cached spreadsheet ID for '{title}' is gone - searching Drive")
+                self.forget(title)
+
+        if sheet is None:
+            # Drive search by title
+            found = next((f for f in self.gc.list_spreadsheet_files(title) if f["name"] == title), None)
+            if found is None:
+                raise SpreadsheetNotFound(title)
+            sheet = self._open_by_key(found["id"])
+            self.remember_spreadsheet(title, sheet)
+
+        self._spreadsheets[title] = sheet
+        return sheet
+
+    def remember_spreadsheet(self, title, sheet):
+        self._load()
+        entry = self._entries.get(title)
+        if entry is None or entry["spreadsheet_id"] != sheet.id:
+            self._entries[title] = {"spreadsheet_id": sheet.id, "worksheets": {}}
+            self._save(title)
+        self._spreadsheets[title] = sheet
+
+    def forget(self, title):
+        """Drop a spreadsheet and its worksheets from the cache (e.g. after a 404)"""
+        self._load()
+        self._spreadsheets.pop(title, None)
+        if self._entries.pop(title, None) is not None:
+            self._save(title)
+
+    def worksheet(self, sheet_title, sheet, worksheet_title):
+        """
+        Return a worksheet by title, from cached properties when known; otherwise the
+        spreadsheet's worksheet list is read once for the run, from the metadata
+        fetched when the spreadsheet was opened if it is still unused.
+
+        :raises WorksheetNotFound: if the spreadsheet has no worksheet with this title
+        """
+        self._load()
+        entry = self._entries.setdefault(sheet_title, {"spreadsheet_id": sheet.id, "worksheets": {}})
+        properties = entry["worksheets"].get(worksheet_title)
+        if properties is not None:
+            return gspread.Worksheet(sheet, dict(properties), sheet.id, sheet.client)
+
+        if sheet.id not in self._metadata_loaded:
+            self._metadata_loaded.add(sheet.id)
+            metadata = getattr(sheet, "opened_metadata", None)
+            if metadata is None:
+                metadata = sheet.fetch_sheet_metadata()
+            else:
+                sheet.opened_metadata = None  # Later lookups (e.g. after forget_worksheet) need fresh metadata
+            entry["worksheets"] = {}
+            for ws in metadata["sheets"]:
+                properties = ws["properties"]
+                grid = properties.get("gridProperties", {})
+                entry["worksheets"][properties["title"]] = {
+                    "sheetId": properties["sheetId"],
+                    "title": properties["title"],
+                    "index": properties.get("index", 0),
+                    "gridProperties": {"rowCount": grid.get("rowCount"), "columnCount": grid.get("columnCount")},
+                }
+            self._save(sheet_title)
+            if worksheet_title in entry["worksheets"]:
+                return gspread.Worksheet(sheet, dict(entry["worksheets"][worksheet_title]), sheet.id, sheet.client)
+
+        raise WorksheetNotFound(worksheet_title)
+
+    def remember_worksheet(self, sheet_title, sheet, worksheet, row_count=None):
+        """Record a created or resized worksheet"""
+        self._load()
+        entry = self._entries.setdefault(sheet_title, {"spreadsheet_id": sheet.id, "worksheets": {}})
+        properties = _worksheet_properties(worksheet, row_count)
+        if entry["worksheets"].get(worksheet.title) != properties:
+            entry["worksheets"][worksheet.title] = properties
+            self._save(sheet_title)
+
+    def forget_worksheet(self, sheet_title, worksheet_title):
+        """Drop one worksheet from the cache (e.g. after it was deleted or renamed by hand)"""
+        self._load()
+        entry = self._entries.get(sheet_title)
+        if entry and entry["worksheets"].pop(worksheet_title, None) is not None:
+            self._save(sheet_title)
+        # Let the next lookup fetch the current worksheet list
+        sheet = self._spreadsheets.get(sheet_title)
+        if sheet is not None:
+            self._metadata_loaded.discard(sheet.id)
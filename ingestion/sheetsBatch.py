@@ -0,0 +1,142 @@
+"""
+BatchUpdateBuilder - collects the Sheets API requests for one spreadsheet
+and sends them as a single spreadsheets.batchUpdate call.
+Row and column indexes are 0-based and end-exclusive, as in the Sheets API GridRange.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+def cell_data(value):
+    """CellData for a Python value: bool, number, '=formula' or text ('' or None clears the cell)"""
+    if value is None or value == '':
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    value = str(value)
+    if value.startswith('='):
+        return {"userEnteredValue": {"formulaValue": value}}
+    return {"userEnteredValue": {"stringValue": value}}
+
+class BatchUpdateBuilder:
+    """Request list for one spreadsheet"""
+
+    def __init__(self, spreadsheet_id):
+        self.spreadsheet_id = spreadsheet_id
+        self.requests = []
+
+    def __len__(self):
+        return len(self.requests)
+
+    @staticmethod
+    def grid_range(sheet_id, start_row, end_row, start_col, end_col):
+        grid = {"sheetId": sheet_id, "startRowIndex": start_row, "startColumnIndex": start_col}
+        if end_row is not None:
+            grid["endRowIndex"] = end_row
+        if end_col is not None:
+            grid["endColumnIndex"] = end_col
+        return grid
+
+    def append_rows(self, sheet_id, count):
+        """Grow the worksheet grid by count rows at the bottom"""
+        if count <= 0:
+            return
+        self.requests.append({
+            "appendDimension": {"sheetId": sheet_id, "dimension": "ROWS", "length": count}
+        })
+
+    def set_values(self, sheet_id, start_row, start_col, rows):
+        """Write a block of values (text stays text, like a RAW values update; '=' strings become formulas)"""
+        if not rows:
+            return
+        width = max(len(row) for row in rows)
+        self.requests.append({
+            "updateCells": {
+                "range": self.grid_range(sheet_id, start_row, start_row + len(rows), start_col, start_col + width),
+                "rows": [{"values": [cell_data(value) for value in row] + [{}] * (width - len(row))} for row in rows],
+                "fields": "userEnteredValue"
+            }
+        })
+
+    def append_cells(self, sheet_id, rows, checkbox_column=None):
+        """
+        Append rows after the last row with data, growing the grid as needed (no read
+        required); cells in checkbox_column get checkbox validation
+        """
+        if not rows:
+            return
+        checkbox = {"condition": {"type": "BOOLEAN"}, "showCustomUi": True}
+        row_data = []
+        for row in rows:
+            cells = [cell_data(value) for value in row]
+            if checkbox_column is not None and checkbox_column < len(cells):
+                cells[checkbox_column] = dict(cells[checkbox_column], dataValidation=checkbox)
+            row_data.append({"values": cells})
+        self.requests.append({
+            "appendCells": {
+                "sheetId": sheet_id,
+                "rows": row_data,
+                "fields": "userEnteredValue,dataValidation" if checkbox_column is not None else "userEnteredValue"
+            }
+        })
+
+    def sort_range(self, sheet_id, start_row, end_row, start_col, end_col, column, ascending=True):
+        """Sort rows of a range by one column on the server (blank rows sort last)"""
+        self.requests.append({
+            "sortRange": {
+                "range": self.grid_range(sheet_id, start_row, end_row, start_col, end_col),
+                "sortSpecs": [{"dimensionIndex": column, "sortOrder": "ASCENDING" if ascending else "DESCENDING"}]
+            }
+        })
+
+    def clear_values(self, sheet_id, start_row, end_row, start_col, end_col):
+        """Clear values in a range (end_row None means to the bottom of the sheet)"""
+        self.requests.append({
+            "updateCells": {
+                "range": self.grid_range(sheet_id, start_row, end_row, start_col, end_col),
+                "fields": "userEnteredValue"
+            }
+        })
+
+    def set_checkbox_validation(self, sheet_id, start_row, end_row, column):
+        """Turn a column range into checkboxes with one repeatCell"""
+        if end_row <= start_row:
+            return
+        self.requests.append({
+            "repeatCell": {
+                "range": self.grid_range(sheet_id, start_row, end_row, column, column + 1),
+                "cell": {"dataValidation": {"condition": {"type": "BOOLEAN"}, "showCustomUi": True}},
+                "fields": "dataValidation"
+            }
+        })
+
+    def set_number_format(self, sheet_id, column, number_format):
+        """Apply a numberFormat (e.g. {"type": "PERCENT", "pattern": "0.00%"}) to a whole column"""
+        self.requests.append({
+            "repeatCell": {
+                "range": self.grid_range(sheet_id, 0, None, column, column + 1),
+                "cell": {"userEnteredFormat": {"numberFormat": number_format}},
+                "fields": "userEnteredFormat.numberFormat"
+            }
+        })
+
+    def auto_resize_columns(self, sheet_id, start_col, end_col):
+        """Auto-resize a span of columns with one request"""
+        self.requests.append({
+            "autoResizeDimensions": {
+                "dimensions": {"sheetId": sheet_id, "dimension": "COLUMNS", "startIndex": start_col, "endIndex": end_col}
+            }
+        })
+
+    def execute(self, service):
+        """Send all collected requests in one batchUpdate; returns the API response (None if empty)"""
+        if not self.requests:
+            return None
+        body = {"requests": self.requests}
+        response = service.spreadsheets().batchUpdate(spreadsheetId=self.spreadsheet_id, body=body).execute()
+        logger.info(f"Sent {len(self.requests)} requests to spreadsheet {self.spreadsheet_id} in one batchUpdate")
+        self.requests = []
+        return response
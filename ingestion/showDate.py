@@ -0,0 +1,193 @@
+"""
+Canonical show date parsing
+One immutable ShowDate value type and a single cached parser for every show date
+format the ingestion scripts produce or read back from worksheet titles, e.g.
+"Friday April 25th 8pm", "Saturday December 6th 9pm 2025", "12-06-2025", "2025-08-15 8:30 PM".
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import datetime, date
+from functools import lru_cache
+from typing import Optional
+from zoneinfo import ZoneInfo
+from dateutil import parser
+
+# All venues are scheduled on Pacific time for year rollover purposes
+VENUE_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+# Shows without an explicit time are assumed to start at 9pm
+DEFAULT_SHOW_HOUR = 21
+
+# Distinct raw strings kept in the parse cache (one entry per show, not per guest)
+PARSE_CACHE_SIZE = 4096
+
+MONTH_NAMES = [
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December'
+]
+
+_MONTHS = {name.lower(): number for number, name in enumerate(MONTH_NAMES, start=1)}
+_MONTHS.update({name[:3].lower(): number for number, name in enumerate(MONTH_NAMES, start=1)})
+_MONTHS['sept'] = 9
+
+_ISO_DATE_RE = re.compile(r'(?<!\d)(\d{4})-(\d{2})-(\d{2})(?!\d)')
+_US_DATE_RE = re.compile(r'(?<![\d/-])(\d{1,2})[-/](\d{1,2})[-/](\d{4}|\d{2})(?![\d/-])')
+_MONTH_DAY_RE = re.compile(
+    r'\b(' + '|'.join(sorted(_MONTHS, key=len, reverse=True)) + r')\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b',
+    re.IGNORECASE
+)
+_YEAR_RE = re.compile(r'\b(\d{4})\b')
+_TIME_RE = re.compile(r'(?<![\d:])(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b', re.IGNORECASE)
+_24H_TIME_RE = re.compile(r'(?<!\d)(\d{2}):(\d{2})(?!\d)')
+
+def ordinal(day):
+    """Return day with its ordinal suffix (1st, 2nd, 3rd, 4th, 11th, 21st...)"""
+    if 11 <= day % 100 <= 13:
+        return f"{day}th"
+    return f"{day}{ {1: 'st', 2: 'nd', 3: 'rd'}.get(day % 10, 'th') }"
+
+def format_show_time(hour, minute):
+    """Format a 24-hour time as '8pm' or '7:30pm'"""
+    suffix = 'am' if hour < 12 else 'pm'
+    display_hour = hour % 12 or 12
+    return f"{display_hour}{suffix}" if minute == 0 else f"{display_hour}:{minute:02d}{suffix}"
+
+def format_date_label(dt):
+    """Format a date as 'Friday April 25th'"""
+    return f"{dt.strftime('%A')} {MONTH_NAMES[dt.month - 1]} {ordinal(dt.day)}"
+
+@dataclass(frozen=True)
+class ShowDate:
+    """
+    A parsed show date.
+
+    local_datetime is naive venue-local time; when the raw string has no year
+    the current year is assumed. sheet_title is the worksheet title for the
+    show: the raw string plus the year of the next occurrence when no year
+    was given. display is the canonical "Friday April 25th 8pm" form.
+    """
+    raw: str
+    local_datetime: datetime
+    sheet_title: str
+    display: str
+    time_text: str = ''     # Time exactly as written in the raw string ('' if none)
+    has_year: bool = False
+    date_found: bool = True  # False when only a time was found and today's date was assumed
+
+    @property
+    def date_label(self):
+        """Date without time, e.g. 'Friday April 25th'"""
+        return format_date_label(self.local_datetime)
+
+    @property
+    def time_label(self):
+        """Normalized time, e.g. '8pm' or '7:30pm' ('' when the raw string had no time)"""
+        if not self.time_text:
+            return ''
+        return format_show_time(self.local_datetime.hour, self.local_datetime.minute)
+
+def _find_date(raw):
+    """Return (year or None, month, day) from the precompiled patterns, or None"""
+    match = _ISO_DATE_RE.search(raw)
+    if match:
+        return int(match.group(1)), int(match.group(2)), int(match.group(3))
+
+    match = _US_DATE_RE.search(raw)
+    if match:
+        year = int(match.group(3))
+        return (year + 2000 if year < 100 else year), int(match.group(1)), int(match.group(2))
+
+    match = _MONTH_DAY_RE.search(raw)
+    if match:
+        year_match = _YEAR_RE.search(raw)
+        year = int(year_match.group(1)) if year_match else None
+        return year, _MONTHS[match.group(1).lower()], int(match.group(2))
+
+    return None
+
+def _find_time(raw):
+    """Return (hour, minute, matched text) or None"""
+    match = _TIME_RE.search(raw)
+    if match:
+        hour = int(match.group(1))
+        minute = int(match.group(2) or 0)
+        am_pm = match.group(3).lower()
+        if am_pm == 'pm' and hour != 12:
+            hour += 12
+        elif am_pm == 'am' and hour == 12:
+            hour = 0
+        return hour, minute, match.group(0)
+
+    match = _24H_TIME_RE.search(raw)
+    if match:
+        return int(match.group(1)), int(match.group(2)), match.group(0)
+
+    return None
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_show_date_cached(raw, today):
+    date_found = True
+    found_date = _find_date(raw)
+    found_time = _find_time(raw)
+
+    if found_date is None:
+        # Rare free-form strings: fall back to dateutil once per distinct string.
+        # Year 1 in the result means dateutil found no date at all.
+        try:
+            fuzzy = parser.parse(raw, fuzzy=True, default=datetime(1, 1, 1, DEFAULT_SHOW_HOUR))
+        except (ValueError, OverflowError):
+            return None
+        if fuzzy.year == 1 and fuzzy.month == 1 and fuzzy.day == 1:
+            date_found = False
+            found_date = (None, today.month, today.day)
+        else:
+            found_date = (fuzzy.year if fuzzy.year != 1 else None, fuzzy.month, fuzzy.day)
+        if found_time is None and (fuzzy.hour, fuzzy.minute) != (DEFAULT_SHOW_HOUR, 0):
+            found_time = (fuzzy.hour, fuzzy.minute, '')
+
+    year, month, day = found_date
+    hour, minute, time_text = found_time if found_time else (DEFAULT_SHOW_HOUR, 0, '')
+
+    try:
+        if year is None:
+            # Sheet titles roll forward to the next occurrence of the date
+            next_year = today.year if date(today.year, month, day) >= today else today.year + 1
+            sheet_title = f"{raw} {next_year}"
+            local_datetime = datetime(today.year, month, day, hour, minute)
+        else:
+            sheet_title = raw
+            local_datetime = datetime(year, month, day, hour, minute)
+    except ValueError:
+        return None
+
+    time_label = format_show_time(hour, minute) if time_text else ''
+    return ShowDate(
+        raw=raw,
+        local_datetime=local_datetime,
+        sheet_title=sheet_title,
+        display=f"{format_date_label(local_datetime)} {time_label}".strip(),
+        time_text=time_text,
+        has_year=year is not None,
+        date_found=date_found,
+    )
+
+def parse_show_date(raw) -> Optional[ShowDate]:
+    """
+    Parse any show date string into a ShowDate.
+    Results are cached by raw string, so repeated guests of one show parse once.
+
+    :return: ShowDate, or None if the string cannot be parsed
+    """
+    if not raw or not isinstance(raw, str):
+        return None
+    today = datetime.now(VENUE_TIMEZONE).date()
+    return _parse_show_date_cached(raw, today)
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def extract_show_time(raw) -> str:
+    """Return the time exactly as written in a string (e.g. '8:30 PM', '8pm'), or ''"""
+    if not raw or not isinstance(raw, str):
+        return ''
+    found_time = _find_time(raw)
+    return found_time[2] if found_time else ''
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Per-show sales rollups
+Maintains the show_rollups collection in guest_list_contacts: one document per
+venue + show datetime with ticket, revenue and order totals per source.
+batch_add_contacts_to_mongodb applies $inc deltas as contacts are written;
+run this script with --rebuild to recompute every rollup from the contact collections.
+"""
+
+import sys
+import logging
+from datetime import datetime
+from pymongo import ASCENDING, UpdateOne
+from shared_config import get_mongo_config, get_mongo_client
+from mongoIndexes import contact_collection_names
+
+logger = logging.getLogger(__name__)
+
+CONTACTS_DB = "guest_list_contacts"
+ROLLUP_COLLECTION = "show_rollups"
+# Rebuilds are written here and renamed over ROLLUP_COLLECTION (the "_" prefix keeps it out of contact_collection_names)
+REBUILD_COLLECTION = "_show_rollups_rebuild"
+
+# Set once the rollup index has been ensured by this process
+_rollup_indexes_ensured = False
+
+# Fields read from contact documents when computing rollups
+ROLLUP_SOURCE_FIELDS = {"venue": 1, "show_date": 1, "show_datetime": 1, "source": 1, "tickets": 1, "total_price": 1}
+
+def _as_number(value):
+    """Tickets/prices are stored as numbers by most sources but as strings by some"""
+    if value is None or value == '':
+        return 0
+    try:
+        return float(str(value).replace('$', '').replace(',', '')) if isinstance(value, str) else value
+    except ValueError:
+        return 0
+
+def _source_field(source):
+    """Source name as a safe field name (MongoDB paths cannot contain dots)"""
+    return (source or "contacts").strip().replace(".", "_").replace("$", "_") or "contacts"
+
+def rollup_key(contact_doc):
+    """
+    Return (rollup _id, identifying fields) for the show a contact belongs to.
+    Shows are keyed by venue + show datetime; contacts without a parseable
+    datetime fall back to the raw show date string.
+    """
+    venue = (contact_doc.get("venue") or "").strip()
+    show_datetime = contact_doc.get("show_datetime")
+    if isinstance(show_datetime, datetime):
+        rollup_id = f"{venue} | {show_datetime.strftime('%Y-%m-%d %H:%M')}"
+    else:
+        show_datetime = None
+        rollup_id = f"{venue} | {contact_doc.get('show_date') or ''}"
+    return rollup_id, {"venue": venue, "show_datetime": show_datetime}
+
+def add_contact_delta(deltas, contact_doc, existing_doc=None):
+    """
+    Accumulate the rollup change caused by a contact write into
+    deltas: {rollup_id: {"fields", "show_date", "inc"}}.
+
+    :param contact_doc: The contact as stored after the write
+    :param existing_doc: The contact as stored before the write (None for a new contact)
+    """
+    def _add(doc, sign):
+        rollup_id, fields = rollup_key(doc)
+        delta = deltas.setdefault(rollup_id, {"fields": fields, "show_date": doc.get("show_date"), "inc": {}})
+        source = _source_field(doc.get("source"))
+        for name, value in (("tickets", _as_number(doc.get("tickets"))),
+                            ("revenue", _as_number(doc.get("total_price"))),
+                            ("orders", 1)):
+            for path in (f"sources.{source}.{name}", f"totals.{name}"):
+                delta["inc"][path] = delta["inc"].get(path, 0) + sign * value
+
+    if existing_doc is not None:
+        _add(existing_doc, -1)
+    _add(contact_doc, 1)
+
+def apply_rollup_deltas(db, deltas):
+    """Apply accumulated deltas to show_rollups with one unordered bulk write"""
+    operations = []
+    now = datetime.utcnow()
+    for rollup_id, delta in deltas.items():
+        inc = {path: value for path, value in delta["inc"].items() if value}
+        if not inc:
+            continue
+        operations.append(UpdateOne(
+            {"_id": rollup_id},
+            {
+                "$inc": inc,
+                "$set": {"show_date": delta["show_date"], "updated_at": now},
+                "$setOnInsert": delta["fields"],
+            },
+            upsert=True
+        ))
+    if operations:
+        if not _rollup_indexes_ensured:
+            ensure_rollup_indexes(db)
+        db[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+    return len(operations)
+
+def ensure_rollup_indexes(db, collection_name=ROLLUP_COLLECTION):
+    """Index the (venue, show_datetime) lookup used by dashboards and sheet totals"""
+    global _rollup_indexes_ensured
+    if collection_name == ROLLUP_COLLECTION:
+        _rollup_indexes_ensured = True
+    db[collection_name].create_index([("venue", ASCENDING), ("show_datetime", ASCENDING)], name="venue_show_datetime")
+
+def get_show_rollup(db, venue, show_datetime):
+    """Single indexed read of one show's totals, e.g. get_show_rollup(db, "Palace", datetime(2025, 4, 25, 21))"""
+    return db[ROLLUP_COLLECTION].find_one({"venue": venue, "show_datetime": show_datetime})
+
+def rebuild_show_rollups(db, contact_collections):
+    """
+    Recompute show_rollups from scratch by streaming every contact collection. The new
+    rollups are built in a separate collection and renamed into place, so readers
+    never see a partial or empty show_rollups.
+
+    :param contact_collections: Names of the per-source contact collections
+    :return: Number of rollup documents written
+    """
+    deltas = {}
+    for collection_name in contact_collections:
+        for contact_doc in db[collection_name].find({}, ROLLUP_SOURCE_FIELDS):
+            if not contact_doc.get("source"):
+                contact_doc["source"] = collection_name
+            add_contact_delta(deltas, contact_doc)
+
+    now = datetime.utcnow()
+    rollups = []
+    for rollup_id, delta in deltas.items():
+        rollup = {"_id": rollup_id, **delta["fields"], "show_date": delta["show_date"], "updated_at": now}
+        for path, value in delta["inc"].items():
+            group, name, *rest = path.split(".")
+            target = rollup.setdefault(group, {})
+            if rest:
+                target = target.setdefault(name, {})
+                name = rest[0]
+            target[name] = value
+        rollups.append(rollup)
+
+    rebuild = db[REBUILD_COLLECTION]
+    rebuild.drop()
+    if rollups:
+        rebuild.insert_many(rollups, ordered=False)
+        ensure_rollup_indexes(db, REBUILD_COLLECTION)
+        rebuild.rename(ROLLUP_COLLECTION, dropTarget=True)
+    else:
+        db[ROLLUP_COLLECTION].delete_many({})
+    ensure_rollup_indexes(db)
+    return len(rollups)
+
+def main():
+    """Rebuild or inspect the show_rollups collection"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if '--help' in sys.argv or '-h' in sys.argv or len(sys.argv) == 1:
+        print("Usage: python3 showRollups.py [--rebuild] [--venue VENUE]")
+        print("\nOptions:")
+        print("  --rebuild       Recompute all show rollups from the contact collections")
+        print("  --venue VENUE   Print the rollups for one venue")
+        return
+
+    mongo_config = get_mongo_config()
+    if not mongo_config or not mongo_config["mongo_uri"]:
+        print("Error: Could not load MongoDB configuration from environment")
+        return
+
+    db = get_mongo_client(mongo_config["mongo_uri"])[CONTACTS_DB]
+
+    if '--rebuild' in sys.argv:
+        collections = contact_collection_names(db)
+        count = rebuild_show_rollups(db, collections)
+        print(f"Rebuilt {count} show rollups from {len(collections)} contact collections")
+
+    if '--venue' in sys.argv:
+        idx = sys.argv.index('--venue')
+        venue = sys.argv[idx + 1] if idx + 1 < len(sys.argv) else ''
+        for rollup in db[ROLLUP_COLLECTION].find({"venue": venue}).sort("show_datetime", ASCENDING):
+            totals = rollup.get("totals", {})
+            print(f"{rollup.get('show_date')}: {totals.get('tickets', 0)} tickets, "
+                  f"${totals.get('revenue', 0):.2f}, {totals.get('orders', 0)} orders")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+SpreadsheetWriterPool - runs Sheets writes for different spreadsheets in parallel
+Work is submitted under a key (the spreadsheet title). Work for one key runs in
+submission order, one item at a time, so writes to a spreadsheet never race;
+different keys run concurrently on a thread pool. submit() blocks once
+queue_depth items are waiting, so a producer cannot run far ahead of the API.
+"""
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_QUEUE_DEPTH = 32
+
+class SpreadsheetWriterPool:
+    """Thread pool with per-key (per-spreadsheet) ordering"""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, queue_depth=DEFAULT_QUEUE_DEPTH):
+        self.concurrency = max(1, concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="sheets-writer")
+        self._slots = threading.BoundedSemaphore(max(1, queue_depth))
+        self._lock = threading.Lock()
+        self._queues = {}       # key -> deque of (future, fn, args, kwargs) not yet started
+        self._futures = []
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) to run after all earlier work for key.
+
+        :return: Future for the call's result
+        """
+        self._slots.acquire()
+        future = Future()
+        with self._lock:
+            queue = self._queues.get(key)
+            start_drain = queue is None
+            if start_drain:
+                queue = self._queues[key] = deque()
+            queue.append((future, fn, args, kwargs))
+            self._futures.append(future)
+        if start_drain:
+            self._executor.submit(self._drain, key)
+        return future
+
+    def _drain(self, key):
+        """Run the work queued for key in order until its queue is empty"""
+        while True:
+            with self._lock:
+                queue = self._queues[key]
+                if not queue:
+                    del self._queues[key]
+                    return
+                future, fn, args, kwargs = queue.popleft()
+            self._slots.release()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                logger.error(f"Sheets write for '{key}' failed: {e}")
+                future.set_exception(e)
+
+    def wait(self):
+        """Block until everything submitted so far has finished"""
+        with self._lock:
+            futures = list(self._futures)
+            self._futures = []
+        wait(futures)
+        return futures
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Check-in sync from the venue spreadsheets back to MongoDB
+Reads the checkbox column (J) of every visible worksheet in the guest list folder
+and sets checked_in / checked_in_at on the matching contact documents, matched by
+row hash plus venue and show date. Each spreadsheet costs one metadata read and one values.batchGet, and
+only spreadsheets whose Drive modifiedTime changed since the last sync are read.
+"""
+
+import sys
+import logging
+from datetime import datetime
+from google.oauth2.service_account import Credentials
+from pymongo import UpdateOne, UpdateMany
+from shared_config import load_project_config, get_mongo_client, get_google_service_account_path
+from googleApiLimiter import build_service
+from driveFolder import list_folder_spreadsheets
+from guestRecord import generate_row_hash
+from mongoIndexes import contact_collection_names, ensure_contact_indexes
+from sheetDirectory import SHEETS_DB
+from worksheetSnapshot import DATA_WIDTH, sheet_row_hash
+
+logger = logging.getLogger(__name__)
+
+CONTACTS_DB = "guest_list_contacts"
+SYNC_STATE_COLLECTION = "checkin_sync"
+
+CHECKBOX_INDEX = DATA_WIDTH - 1     # column J
+
+def _setup_google_services():
+    scopes = ['https://www.googleapis.com/auth/spreadsheets.readonly', 'https://www.googleapis.com/auth/drive.readonly']
+    creds = Credentials.from_service_account_file(get_google_service_account_path(), scopes=scopes)
+    return build_service('drive', 'v3', creds), build_service('sheets', 'v4', creds)
+
+def _quote_sheet_title(title):
+    return "'" + title.replace("'", "''") + "'"
+
+def read_guest_rows(sheets_service, spreadsheet_id):
+    """Guest rows (A-J) of every visible worksheet, read with one values.batchGet"""
+    metadata = sheets_service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        fields='sheets.properties(title,hidden)'
+    ).execute()
+    titles = [sheet['properties']['title'] for sheet in metadata.get('sheets', [])
+              if not sheet['properties'].get('hidden', False)]
+    if not titles:
+        return []
+
+    response = sheets_service.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=[f"{_quote_sheet_title(title)}!A2:J" for title in titles],
+        valueRenderOption='UNFORMATTED_VALUE'
+    ).execute()
+    rows = []
+    for value_range in response.get('valueRanges', []):
+        rows.extend(value_range.get('values', []))
+    return rows
+
+def collect_check_ins(rows, check_ins=None):
+    """
+    Accumulate check-in state from worksheet rows into
+    check_ins: {contact collection: {(row hash, venue, show date): checked}}.
+    A row is checked if any row with the same key is ticked.
+    """
+    check_ins = {} if check_ins is None else check_ins
+    for row in rows:
+        if len(row) < 7:
+            continue
+        source = str(row[3]).strip() if row[3] else ''
+        checkbox = row[CHECKBOX_INDEX] if len(row) > CHECKBOX_INDEX else False
+        checked = checkbox is True or str(checkbox).upper() == 'TRUE'
+        by_key = check_ins.setdefault(source or "contacts", {})
+        key = (sheet_row_hash([str(value) for value in row]), str(row[0]), str(row[1]))
+        by_key[key] = by_key.get(key, False) or checked
+    return check_ins
+
+def apply_check_ins(db, check_ins, now=None, collection_names=None):
+    """
+    Write check-in state onto contacts with one unordered bulk write per collection.
+    Only contacts whose state changed are modified; checked_in_at keeps the time
+    a contact was first seen checked in. Sources that are not an existing contact
+    collection (hand-typed rows like "Walk-in") are skipped.
+
+    :return: Number of contact documents modified
+    """
+    now = now or datetime.utcnow()
+    modified = 0
+    known_collections = set(collection_names if collection_names is not None else contact_collection_names(db))
+    for collection_name, by_key in check_ins.items():
+        if collection_name not in known_collections:
+            logger.info(f"Skipping {len(by_key)} rows with source '{collection_name}' - no such contact collection")
+            continue
+        operations = []
+        for (row_hash, venue, show_date), checked in by_key.items():
+            # The 12-character hash alone can collide across shows, so the show must match too
+            match = {"row_hash": row_hash, "venue": venue, "show_date": show_date}
+            if checked:
+                operations.append(UpdateMany({**match, "checked_in": {"$ne": True}},
+                                             {"$set": {"checked_in": True, "checked_in_at": now}}))
+            else:
+                operations.append(UpdateMany({**match, "checked_in": True},
+                                             {"$set": {"checked_in": False, "checked_in_at": None}}))
+        if operations:
+            ensure_contact_indexes(db[collection_name])
+            result = db[collection_name].bulk_write(operations, ordered=False)
+            modified += result.modified_count
+    return modified
+
+def backfill_row_hashes(db, contact_collections):
+    """
+    Set row_hash on contacts written before it was stored.
+
+    :return: Number of contacts updated
+    """
+    updated = 0
+    fields = {"first_name": 1, "last_name": 1, "email": 1, "source": 1, "venue": 1, "show_date": 1}
+    for collection_name in contact_collections:
+        operations = []
+        for doc in db[collection_name].find({"row_hash": {"$exists": False}}, fields):
+            row_hash = generate_row_hash(doc.get("first_name"), doc.get("last_name"), doc.get("email"),
+                                         doc.get("source"), f"{doc.get('venue')} - {doc.get('show_date')}")
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"row_hash": row_hash}}))
+        if operations:
+            updated += db[collection_name].bulk_write(operations, ordered=False).modified_count
+            logger.info(f"Backfilled row_hash on {len(operations)} contacts in '{collection_name}'")
+    return updated
+
+def sync_check_ins(db, state_collection, drive_service, sheets_service, folder_id, force=False):
+    """
+    Sync check-ins from every spreadsheet changed since its last sync.
+
+    :return: Dict with spreadsheets listed/read and contacts modified
+    """
+    last_synced = {doc["_id"]: doc.get("modified_time") for doc in state_collection.find({})}
+    summary = {"spreadsheets": 0, "read": 0, "contacts_modified": 0}
+    collection_names = contact_collection_names(db)
+    for spreadsheet in list_folder_spreadsheets(drive_service, folder_id):
+        summary["spreadsheets"] += 1
+        if not force and last_synced.get(spreadsheet["id"]) == spreadsheet.get("modifiedTime"):
+            continue
+        try:
+            rows = read_guest_rows(sheets_service, spreadsheet["id"])
+            modified = apply_check_ins(db, collect_check_ins(rows), collection_names=collection_names)
+            state_collection.replace_one({"_id": spreadsheet["id"]}, {
+                "_id": spreadsheet["id"],
+                "name": spreadsheet["name"],
+                "modified_time": spreadsheet.get("modifiedTime"),
+                "synced_at": datetime.utcnow(),
+            }, upsert=True)
+            summary["read"] += 1
+            summary["contacts_modified"] += modified
+            logger.info(f"{spreadsheet['name']}: {len(rows)} rows read, {modified} contacts updated")
+        except Exception as e:
+            # Leave the watermark alone so the next run retries this spreadsheet
+            logger.error(f"Error syncing check-ins from {spreadsheet['name']}: {e}")
+    return summary
+
+def main():
+    """Sync check-ins from the guest list folder"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage: python3 syncCheckIns.py [--force] [--backfill-hashes]")
+        print("\nOptions:")
+        print("  --force             Read every spreadsheet, even if unchanged since the last sync")
+        print("  --backfill-hashes   Set row_hash on older contacts first (needed once)")
+        return
+
+    config = load_project_config()
+    if not config or not config["mongo_uri"]:
+        print("Error: Could not load MongoDB configuration from environment")
+        return
+
+    client = get_mongo_client(config["mongo_uri"])
+    db = client[CONTACTS_DB]
+
+    if '--backfill-hashes' in sys.argv:
+        count = backfill_row_hashes(db, contact_collection_names(db))
+        print(f"Backfilled row_hash on {count} contacts")
+
+    drive_service, sheets_service = _setup_google_services()
+    summary = sync_check_ins(db, client[SHEETS_DB][SYNC_STATE_COLLECTION], drive_service, sheets_service,
+                             config["guest_list_folder_id"], force='--force' in sys.argv)
+    print(f"Read {summary['read']} of {summary['spreadsheets']} spreadsheets, "
+          f"updated check-ins on {summary['contacts_modified']} contacts")
+
+if __name__ == "__main__":
+    main()
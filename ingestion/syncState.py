@@ -0,0 +1,93 @@
+"""
+SyncState - per-source high-water marks for the order fetchers
+Each source (Eventbrite, Squarespace, Fever, DoMORE) stores the point up to
+which its orders are known to be in both MongoDB and Google Sheets. A run
+fetches from that mark (less a small overlap, since upstream timestamps and
+our clock can disagree) instead of a fixed look-back window, so a late or
+skipped cron run misses nothing, and the mark only moves after both sinks
+committed the run's writes.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from shared_config import load_project_config, get_mongo_client
+
+logger = logging.getLogger(__name__)
+
+CONTACTS_DB = "guest_list_contacts"
+SYNC_STATE_COLLECTION = "sync_state"
+DEFAULT_OVERLAP_MINUTES = 5
+
+class SyncState:
+    """The stored high-water mark (a naive UTC datetime) of one source"""
+
+    def __init__(self, source, collection=None, overlap_minutes=None):
+        self.source = source
+        self._collection = collection
+        if overlap_minutes is None:
+            config = load_project_config()
+            overlap_minutes = config['sync_overlap_minutes'] if config else DEFAULT_OVERLAP_MINUTES
+        self.overlap = timedelta(minutes=overlap_minutes)
+        self._mark = None
+        self._loaded = False
+
+    def _get_collection(self):
+        if self._collection is None:
+            config = load_project_config()
+            if not config or not config["mongo_uri"]:
+                return None
+            self._collection = get_mongo_client(config["mongo_uri"])[CONTACTS_DB][SYNC_STATE_COLLECTION]
+        return self._collection
+
+    def mark(self):
+        """The last committed high-water mark, or None before the first successful run"""
+        if not self._loaded:
+            try:
+                collection = self._get_collection()
+                doc = collection.find_one({"_id": self.source}) if collection is not None else None
+                self._mark = doc.get("high_water") if doc else None
+            except Exception as e:
+                logger.error(f"Could not read sync state for {self.source}: {e}")
+                self._mark = None
+            self._loaded = True
+        return self._mark
+
+    def fetch_from(self):
+        """Where the next fetch should start (the mark less the overlap), or None if there is no mark"""
+        mark = self.mark()
+        return mark - self.overlap if mark else None
+
+    def advance(self, high_water, fetched_from):
+        """
+        Record high_water once the run's writes committed. Ignored if the run's
+        window started after the stored mark (a short manual window would
+        otherwise skip the orders in between); the mark never moves backwards.
+
+        :return: True if the stored mark was updated
+        """
+        mark = self.mark()
+        if mark is not None and fetched_from > mark:
+            logger.info(f"Not advancing {self.source} sync mark: window started at {fetched_from}, after the mark {mark}")
+            return False
+        try:
+            collection = self._get_collection()
+            if collection is None:
+                return False
+            collection.update_one({"_id": self.source}, {
+                "$max": {"high_water": high_water},
+                "$set": {"updated_at": datetime.utcnow()},
+            }, upsert=True)
+        except Exception as e:
+            logger.error(f"Could not save sync state for {self.source}: {e}")
+            return False
+        self._mark = max(high_water, mark) if mark else high_water
+        logger.info(f"{self.source} sync mark advanced to {self._mark}")
+        return True
+
+def epoch_seconds(utc_datetime):
+    """Unix time of a naive UTC datetime (for Gmail's after: operator)"""
+    return int((utc_datetime - datetime(1970, 1, 1)).total_seconds())
+
+def from_epoch_millis(millis):
+    """Naive UTC datetime of a Unix time in milliseconds (Gmail's internalDate)"""
+    return datetime(1970, 1, 1) + timedelta(milliseconds=int(millis))
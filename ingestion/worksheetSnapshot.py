@@ -0,0 +1,149 @@
+"""
+WorksheetSnapshot - one read of a show worksheet, edited locally, written back once
+Header setup, dedup, insert, sort and the lookups needed for checkboxes and
+formulas all work on the in-memory values instead of re-reading the worksheet;
+push() adds the write to the show's BatchUpdateBuilder.
+"""
+
+import logging
+from guestRecord import SHEET_HEADERS, generate_row_hash
+from rowHashIndex import row_key
+
+logger = logging.getLogger(__name__)
+
+# Columns A-J: guest columns plus the check-in checkbox column, headed "total:"
+WORKSHEET_HEADERS = SHEET_HEADERS + ["total:"]
+DATA_WIDTH = len(WORKSHEET_HEADERS)
+
+# Grid rows for a new worksheet, and spare rows added whenever a worksheet has to grow,
+# so later runs adding a few guests don't need another resize
+MIN_GRID_ROWS = 100
+GRID_HEADROOM_ROWS = 50
+
+def grid_rows_for(guest_count):
+    """Grid rows for a worksheet holding guest_count guests plus the header row"""
+    return max(MIN_GRID_ROWS, guest_count + 1 + GRID_HEADROOM_ROWS)
+
+def sheet_row_hash(row):
+    """
+    Contact row_hash of a worksheet row ([venue, date, email, source, time, type, firstname, lastname, ...]);
+    dedup within the sheets uses the keyed rowHashIndex.row_key instead
+    """
+    show_name = f"{row[0]} - {row[1]}" if len(row) > 1 else ""
+    return generate_row_hash(row[6] if len(row) > 6 else "", row[7] if len(row) > 7 else "",
+                             row[2] if len(row) > 2 else "", row[3] if len(row) > 3 else "", show_name)
+
+class WorksheetSnapshot:
+    """The guest rows (columns A-J) of one worksheet"""
+
+    def __init__(self, worksheet, values):
+        self.worksheet = worksheet
+        self.values = values
+        self.header = values[0][:DATA_WIDTH] if values else []
+        # Rows with any guest data; formula-only rows (K-N) are not guest rows
+        self.rows = [self._data_row(row) for row in values[1:] if any(cell != '' for cell in row[:DATA_WIDTH])]
+        self.original_row_count = max(len(values) - 1, 0)
+        self.grid_row_count = worksheet.row_count
+        self.dirty = False
+
+    @classmethod
+    def load(cls, worksheet):
+        """Read the worksheet once"""
+        return cls(worksheet, worksheet.get_all_values())
+
+    @classmethod
+    def empty(cls, worksheet):
+        """Snapshot of a newly created worksheet (no read needed)"""
+        return cls(worksheet, [])
+
+    @staticmethod
+    def _data_row(row):
+        row = list(row[:DATA_WIDTH])
+        return row + [''] * (DATA_WIDTH - len(row))
+
+    def ensure_headers(self, headers=WORKSHEET_HEADERS):
+        if self.header != headers:
+            self.header = list(headers)
+            self.dirty = True
+        return self.header
+
+    def add_rows(self, guest_rows):
+        """
+        Append guest rows that are not already in the worksheet (by row key).
+
+        :return: Number of rows added
+        """
+        existing_keys = {row_key(row) for row in self.rows if len(row) >= 7}
+        added = 0
+        for row in guest_rows:
+            if len(row) < 7:
+                continue
+            key = row_key(row)
+            if key not in existing_keys:
+                self.rows.append(self._data_row(row))
+                existing_keys.add(key)
+                added += 1
+        if added:
+            self.dirty = True
+        return added
+
+    def sort_by_firstname(self):
+        """Capitalize first names and sort guest rows by them"""
+        firstname_index = WORKSHEET_HEADERS.index("firstname")
+        for row in self.rows:
+            name = row[firstname_index]
+            if isinstance(name, str) and name and name != name.capitalize():
+                row[firstname_index] = name.capitalize()
+                self.dirty = True
+        sorted_rows = sorted(self.rows, key=lambda row: str(row[firstname_index]))
+        if sorted_rows != self.rows:
+            self.rows = sorted_rows
+            self.dirty = True
+
+    def column_values(self, column_letter):
+        """Guest-row values of one column (A-J)"""
+        index = ord(column_letter) - ord('A')
+        return [row[index] for row in self.rows]
+
+    def checkbox_values(self, column_letter):
+        """Checked state of each guest row's checkbox"""
+        return [value is True or value == 'TRUE' for value in self.column_values(column_letter)]
+
+    def find(self, value):
+        """(row, col) of the first cell equal to value, 1-based, or None"""
+        if self.header and value in self.header:
+            return 1, self.header.index(value) + 1
+        for row_index, row in enumerate(self.rows, start=2):
+            if value in row:
+                return row_index, row.index(value) + 1
+        return None
+
+    def push(self, builder, checkbox_column=None):
+        """
+        Add the header and guest rows to builder as one updateCells (growing the grid
+        first, with headroom, if needed). The checkbox column is written as booleans.
+
+        :return: True if a write was added
+        """
+        if not self.dirty:
+            return False
+        checkbox_index = ord(checkbox_column) - ord('A') if checkbox_column else None
+        rows = []
+        for row in self.rows:
+            row = list(row)
+            if checkbox_index is not None:
+                row[checkbox_index] = row[checkbox_index] is True or row[checkbox_index] == 'TRUE'
+            rows.append(row)
+
+        values = [self.header] + rows
+        # Blank out rows left over when empty rows were compacted away
+        values += [[''] * DATA_WIDTH] * (self.original_row_count - len(self.rows))
+        if len(values) > self.grid_row_count:
+            grid_rows = max(len(values), grid_rows_for(len(self.rows)))
+            builder.append_rows(self.worksheet.id, grid_rows - self.grid_row_count)
+            self.grid_row_count = grid_rows
+        builder.set_values(self.worksheet.id, 0, 0, values)
+        self.original_row_count = len(self.rows)
+        self.dirty = False
+        logger.info(f"Queued {len(self.rows)} guest rows for worksheet '{self.worksheet.title}'")
+        return True